@@ -4,6 +4,17 @@ from flask_cors import CORS
 import os
 from dotenv import load_dotenv
 from src.utils.rate_limiter import limiter, RATE_LIMITS
+from src.utils.cache import user_cache
+from src.utils.profile_cache import profile_cache
+from src.utils.responses import init_response_layer
+from src.utils.auth import token_verifier
+from src.utils.bulkhead import bulkheads, default_bulkhead_sizes, default_read_reserve
+from src.utils.load_shedding import ai_load_shedder
+from src.utils.image_pool import image_pool
+from src.utils.readiness import readiness
+from src.utils.serving import serving_capacity
+from src.utils.timing import server_timing
+from src.utils.metrics import metrics, requires_metrics_token
 
 load_dotenv(override=True)
 
@@ -23,9 +34,87 @@ def create_app():
     app.config['SUPABASE_URL'] = os.getenv('SUPABASE_URL')
     app.config['SUPABASE_JWT_SECRET'] = os.getenv('SUPABASE_JWT_SECRET')
 
+    # Asymmetric JWT signing keys: a local JWKS file, or the project's JWKS endpoint
+    app.config['SUPABASE_JWKS_FILE'] = os.getenv('SUPABASE_JWKS_FILE')
+    app.config['SUPABASE_JWKS_URL'] = os.getenv('SUPABASE_JWKS_URL') or (
+        f"{app.config['SUPABASE_URL'].rstrip('/')}/auth/v1/.well-known/jwks.json"
+        if app.config['SUPABASE_URL'] else None
+    )
+    app.config['AUTH_CACHE_MAX_ENTRIES'] = int(os.getenv('AUTH_CACHE_MAX_ENTRIES', 10000))
+
     # Rate limiter configuration
-    app.config["RATELIMIT_STORAGE_URI"] = os.getenv("REDIS_URL", "memory://")
+    # With Redis, hits are counted locally and synced every
+    # RATELIMIT_SYNC_INTERVAL seconds; each process may hold up to
+    # RATELIMIT_MAX_UNSYNCED_HITS unsynced hits per key (0 = always sync)
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url and os.getenv("RATELIMIT_HYBRID", "true").lower() == "true":
+        app.config["RATELIMIT_STORAGE_URI"] = f"hybrid+{redis_url}"
+        app.config["RATELIMIT_STORAGE_OPTIONS"] = {
+            "sync_interval": float(os.getenv("RATELIMIT_SYNC_INTERVAL", 1.0)),
+            "max_unsynced_hits": int(os.getenv("RATELIMIT_MAX_UNSYNCED_HITS", 5))
+        }
+    else:
+        app.config["RATELIMIT_STORAGE_URI"] = redis_url or "memory://"
     app.config["RATELIMIT_DEFAULT"] = "10000 per hour"
+    # Turned off by the load test (benchmarks/load_test.py)
+    app.config["RATELIMIT_ENABLED"] = os.getenv("RATELIMIT_ENABLED", "true").lower() == "true"
+
+    # Per-user response cache configuration. Without Redis the cache is
+    # only used with one worker, since a write in one worker cannot
+    # invalidate the entries cached in another worker's memory
+    app.config['WEB_CONCURRENCY'] = int(os.getenv('WEB_CONCURRENCY', 1))
+    app.config['CACHE_REDIS_URL'] = os.getenv('REDIS_URL')
+    app.config['CACHE_TTL_SECONDS'] = int(os.getenv('CACHE_TTL_SECONDS', 300))
+    app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', 2048))
+
+    # Per-process profile cache configuration
+    app.config['PROFILE_CACHE_TTL_SECONDS'] = int(os.getenv('PROFILE_CACHE_TTL_SECONDS', 30))
+    app.config['PROFILE_CACHE_MAX_ENTRIES'] = int(os.getenv('PROFILE_CACHE_MAX_ENTRIES', 4096))
+
+    # Bulkhead configuration: per-category concurrency and queue limits,
+    # defaulting to a share of the worker's serving capacity
+    app.config['BULKHEAD_CAPACITY'] = serving_capacity()
+    app.config['BULKHEAD_QUEUE_TIMEOUT'] = float(os.getenv('BULKHEAD_QUEUE_TIMEOUT', 10))
+    app.config['BULKHEAD_READ_RESERVE'] = int(
+        os.getenv('BULKHEAD_READ_RESERVE', default_read_reserve(app.config['BULKHEAD_CAPACITY']))
+    )
+    app.config['BULKHEADS'] = {
+        category: (
+            int(os.getenv(f'BULKHEAD_{category}_CONCURRENCY', max_concurrent)),
+            int(os.getenv(f'BULKHEAD_{category}_QUEUE', max_queue))
+        )
+        for category, (max_concurrent, max_queue)
+        in default_bulkhead_sizes(app.config['BULKHEAD_CAPACITY']).items()
+    }
+
+    # AI load shedding: reject AI requests whose expected wait for a slot,
+    # from the queue and the moving average of Gemini latency, exceeds the SLO
+    app.config['AI_WAIT_SLO_SECONDS'] = float(os.getenv('AI_WAIT_SLO_SECONDS', 20))
+    app.config['UPSTREAM_LATENCY_ALPHA'] = float(os.getenv('UPSTREAM_LATENCY_ALPHA', 0.2))
+    app.config['UPSTREAM_LATENCY_INITIAL_SECONDS'] = float(os.getenv('UPSTREAM_LATENCY_INITIAL_SECONDS', 5))
+
+    # Image processing pool: worker processes and queued or running tasks
+    app.config['IMAGE_WORKERS'] = int(os.getenv('IMAGE_WORKERS', 2))
+    app.config['IMAGE_MAX_PENDING'] = int(os.getenv('IMAGE_MAX_PENDING', 16))
+
+    # Seconds the /ready dependency probe results are reused
+    app.config['READY_PROBE_INTERVAL'] = int(os.getenv('READY_PROBE_INTERVAL', 10))
+    app.config['READY_PROBE_TIMEOUT'] = float(os.getenv('READY_PROBE_TIMEOUT', 5))
+
+    # Server-Timing header and per-request timing log line, off by default
+    # since the header names the tables each request touched
+    app.config['SERVER_TIMING_ENABLED'] = os.getenv('SERVER_TIMING_ENABLED', 'false').lower() == 'true'
+    app.config['SERVER_TIMING_LOG'] = os.getenv('SERVER_TIMING_LOG', 'true').lower() == 'true'
+
+    # Prometheus metrics. /metrics and /bulkhead-info are only served with
+    # METRICS_TOKEN set, as a bearer token
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+
+    # Response compression configuration
+    app.config['COMPRESSION_MIN_SIZE'] = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+    app.config['COMPRESSION_GZIP_LEVEL'] = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+    app.config['COMPRESSION_BROTLI_QUALITY'] = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))
 
     # CORS configuration for frontend
     CORS(app,
@@ -38,9 +127,35 @@ def create_app():
              }
          })
 
+    # Per-request phase timing and metrics, before the extensions they time
+    server_timing.init_app(app)
+    metrics.init_app(app)
+
+    # Load the JWT verification keys
+    token_verifier.init_app(app)
+
     # Initialize rate limiter
     limiter.init_app(app)
 
+    # Initialize per-user response cache
+    user_cache.init_app(app)
+
+    # Initialize per-process profile cache
+    profile_cache.init_app(app)
+
+    # Initialize per-category bulkhead pools
+    bulkheads.init_app(app)
+    ai_load_shedder.init_app(app)
+
+    # Configure the image processing pool, started per worker by gunicorn
+    image_pool.init_app(app)
+
+    # Warm-up and dependency probes, warm-up started per worker by gunicorn
+    readiness.init_app(app)
+
+    # Fast JSON serialization, MessagePack negotiation and compression
+    init_response_layer(app)
+
     api = Api(app)
 
     # Import the centralized auth decorator
@@ -58,8 +173,15 @@ def create_app():
     # Example public route
     @app.route('/health')
     def health_check():
+        """Liveness check, does not touch any dependency"""
         return jsonify({'status': 'healthy'})
 
+    # Readiness check: warm-up finished and required dependencies reachable
+    @app.route('/ready')
+    def ready_check():
+        status = readiness.status()
+        return jsonify(status), 200 if status['status'] == 'ready' else 503
+
     # Rate limit info endpoint
     @app.route('/rate-limit-info')
     def rate_limit_info():
@@ -71,19 +193,47 @@ def create_app():
             }
         })
 
+    # Bulkhead pool metrics endpoint
+    @app.route('/bulkhead-info')
+    @requires_metrics_token
+    def bulkhead_info():
+        """Get the concurrency, queue depth and wait times of each pool"""
+        return jsonify({
+            'capacity': bulkheads.capacity,
+            'budget': bulkheads.budget_stats(),
+            'pools': bulkheads.stats(),
+            'load_shedding': ai_load_shedder.stats()
+        })
+
+    # Prometheus metrics endpoint
+    @app.route('/metrics')
+    @requires_metrics_token
+    def metrics_endpoint():
+        """Request, upstream, cache and pool metrics of this process"""
+        if not metrics.enabled:
+            return jsonify({'error': 'Metrics are disabled'}), 404
+        return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
     # Register your blueprints here
     from src.routes.consumed import blp as consumed_blp
     from src.routes.user_operations import blp as user_operations_blp
     from src.routes.user_profiles import blp as user_profiles_blp
+    from src.routes.dashboard import blp as dashboard_blp
     api.register_blueprint(consumed_blp)
     api.register_blueprint(user_operations_blp)
     api.register_blueprint(user_profiles_blp)
+    api.register_blueprint(dashboard_blp)
+
+    # Register maintenance CLI commands
+    from src.commands import register_commands
+    register_commands(app)
 
     return app
 
 app = create_app()
 
 if __name__ == '__main__':
+    readiness.start_warmup()
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_ENV') != 'production'
     app.run(port=port, debug=debug, host='0.0.0.0')
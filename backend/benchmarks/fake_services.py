@@ -0,0 +1,603 @@
+"""
+Local Supabase and Gemini Stand-Ins
+
+A single HTTP server that answers the calls the backend makes, so it can
+be load tested on a laptop with no network:
+
+- PostgREST (/rest/v1): in-memory tables with the filters, ordering,
+  paging, upserts and counts the app uses, and the update_streak and
+  update_profile_targets functions of sql/
+- Storage (/storage/v1): upload, download, signed URLs and removal
+- Auth (/auth/v1/.well-known/jwks.json): a JWKS with one EC key
+- Gemini's OpenAI-compatible API (/v1): chat completions with a
+  configurable latency, error rate and response shapes
+
+The server runs in its own process so it does not compete with the load
+generator for the GIL. GET /_fake/stats returns request counts by route.
+
+Run on its own, e.g. to point a dev server at it:
+
+    python benchmarks/fake_services.py --port 54321 --gemini-latency-ms 2000
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+# Unique constraints, see sql/user_profiles.sql and sql/streaks.sql
+UNIQUE_COLUMNS = {
+    'user_profiles': [('user_id',)],
+    'user_streaks': [('user_id', 'streak_date')],
+}
+
+# Query parameters that are not column filters
+RESERVED_PARAMS = ('select', 'order', 'limit', 'offset', 'on_conflict', 'columns')
+
+# Keep the streak bitmap in sync with sql/streaks.sql
+STREAK_BITMAP_DAYS = 62
+
+FAKE_FOODS = [
+    {'name': 'Grilled Chicken Salad', 'emoji': '🥗', 'protein': 32, 'carbs': 12, 'fats': 14, 'calories': 310},
+    {'name': 'Spaghetti Bolognese', 'emoji': '🍝', 'protein': 28, 'carbs': 75, 'fats': 18, 'calories': 570},
+    {'name': 'Avocado Toast', 'emoji': '🥑', 'protein': 9, 'carbs': 34, 'fats': 21, 'calories': 360},
+    {'name': 'Salmon with Rice', 'emoji': '🍣', 'protein': 35, 'carbs': 60, 'fats': 16, 'calories': 520},
+    {'name': 'Greek Yogurt Bowl', 'emoji': '🥣', 'protein': 18, 'carbs': 40, 'fats': 8, 'calories': 300},
+]
+
+
+def parse_weights(spec: str) -> dict:
+    """Parse 'a=3,b=1' into {'a': 3.0, 'b': 1.0}"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, weight = item.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ===== PostgREST filters =====
+
+def coerce(stored, raw: str):
+    """Convert a filter value to the type of the stored value"""
+    if isinstance(stored, bool):
+        return raw.lower() == 'true'
+    if isinstance(stored, (int, float)):
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+    return raw
+
+
+def compare(stored, operator: str, raw: str) -> bool:
+    if operator == 'is':
+        return {'null': stored is None, 'true': stored is True, 'false': stored is False}.get(raw.lower(), False)
+    if operator == 'in':
+        values = [value.strip().strip('"') for value in raw.strip('()').split(',')]
+        return stored is not None and str(stored) in values
+    # Like SQL, comparisons with NULL are never true
+    if stored is None:
+        return False
+
+    value = coerce(stored, raw)
+    try:
+        if operator == 'eq':
+            return stored == value
+        if operator == 'neq':
+            return stored != value
+        if operator == 'gt':
+            return stored > value
+        if operator == 'gte':
+            return stored >= value
+        if operator == 'lt':
+            return stored < value
+        if operator == 'lte':
+            return stored <= value
+    except TypeError:
+        return str(stored) < str(value) if operator in ('lt', 'lte') else False
+    raise ValueError(f"Unsupported operator: {operator}")
+
+
+def split_top_level(expression: str):
+    """Split a logic tree expression on the commas outside parentheses"""
+    parts, depth, current = [], 0, ''
+    for char in expression:
+        if char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+            continue
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def parse_condition(column: str, condition: str):
+    """Build a row predicate from a filter such as created_at=gte.2024-01-01"""
+    negate = condition.startswith('not.')
+    if negate:
+        condition = condition[len('not.'):]
+    operator, _, raw = condition.partition('.')
+    raw = raw.strip('"')
+
+    def predicate(row):
+        return compare(row.get(column), operator, raw) != negate
+    return predicate
+
+
+def parse_logic(combine, expression: str):
+    """Build a row predicate from or=(...) / and=(...) logic trees"""
+    predicates = []
+    for part in split_top_level(expression.strip()[1:-1]):
+        if part.startswith(('and(', 'or(')):
+            name, _, rest = part.partition('(')
+            predicates.append(parse_logic(all if name == 'and' else any, '(' + rest))
+        else:
+            column, _, condition = part.partition('.')
+            predicates.append(parse_condition(column, condition))
+    return lambda row: combine(predicate(row) for predicate in predicates)
+
+
+def parse_filters(params):
+    predicates = []
+    for key, value in params:
+        if key in RESERVED_PARAMS:
+            continue
+        if key in ('or', 'and'):
+            predicates.append(parse_logic(any if key == 'or' else all, value))
+        else:
+            predicates.append(parse_condition(key, value))
+    return lambda row: all(predicate(row) for predicate in predicates)
+
+
+def sort_rows(rows, order: str):
+    # Sort by the last key first, the sort is stable
+    for term in reversed(order.split(',')):
+        column, _, direction = term.partition('.')
+        descending = direction.startswith('desc')
+        rows.sort(key=lambda row: (row.get(column) is None, row.get(column) or 0), reverse=descending)
+    return rows
+
+
+def project(row, select: str):
+    if not select or select == '*':
+        return dict(row)
+    return {column: row.get(column) for column in select.split(',')}
+
+
+# ===== In-memory stores =====
+
+class Database:
+    """Tables as lists of rows, guarded by one lock like a serialized database"""
+
+    def __init__(self):
+        self.tables = {}
+        self.lock = threading.Lock()
+
+    def rows(self, table: str):
+        return self.tables.setdefault(table, [])
+
+    def find_conflict(self, table: str, record: dict, columns):
+        for row in self.rows(table):
+            if all(row.get(column) == record.get(column) for column in columns):
+                return row
+        return None
+
+    def insert(self, table: str, records, on_conflict=None, merge=False):
+        """Insert rows, merging them into existing rows on conflict when merge is set"""
+        written = []
+        for record in records:
+            conflict_sets = [tuple(on_conflict.split(','))] if on_conflict else UNIQUE_COLUMNS.get(table, [])
+            existing = None
+            for columns in conflict_sets + [('id',)]:
+                if all(record.get(column) is not None for column in columns):
+                    existing = self.find_conflict(table, record, columns) or existing
+            if existing is not None:
+                if not merge:
+                    raise ValueError(f'duplicate key value violates unique constraint on "{table}"')
+                existing.update(record)
+                written.append(existing)
+                continue
+
+            row = {'id': str(uuid.uuid4()), 'created_at': now_iso(), **record}
+            self.rows(table).append(row)
+            written.append(row)
+        return written
+
+    def update_streak(self, user_id: str, today: str, now: str) -> dict:
+        """In-memory version of update_streak in sql/streaks.sql"""
+        profile = next((row for row in self.rows('user_profiles') if row.get('user_id') == user_id), None)
+        if profile is None:
+            return {'status': 'profile_not_found'}
+
+        previous_streak = profile.get('streak') or 0
+        last_date = date.fromisoformat(profile['streak_update_date'][:10]) if profile.get('streak_update_date') else None
+        bitmap = profile.get('streak_bitmap') or 0
+        today_date = date.fromisoformat(today)
+
+        if last_date is not None and last_date >= today_date:
+            return {'status': 'already_updated', 'streak': previous_streak}
+
+        gap = (today_date - last_date).days if last_date is not None else None
+        new_streak = previous_streak + 1 if gap == 1 else 1
+        if gap is None or gap >= STREAK_BITMAP_DAYS:
+            bitmap = 1
+        else:
+            bitmap = ((bitmap << gap) | 1) & ((1 << STREAK_BITMAP_DAYS) - 1)
+
+        profile.update(streak=new_streak, streak_bitmap=bitmap, updated_at=now, streak_update_date=now)
+        if self.find_conflict('user_streaks', {'user_id': user_id, 'streak_date': today}, ('user_id', 'streak_date')) is None:
+            self.insert('user_streaks', [{'user_id': user_id, 'streak_date': today}])
+
+        return {'status': 'updated', 'streak': new_streak, 'previous_streak': previous_streak, 'streak_bitmap': bitmap}
+
+    def update_profile_targets(self, targets: list, now: str) -> list:
+        """In-memory version of update_profile_targets in sql/user_profiles.sql"""
+        profiles = {row.get('user_id'): row for row in self.rows('user_profiles')}
+        updated = []
+        for target in targets:
+            profile = profiles.get(target['user_id'])
+            if profile is None or profile.get('updated_at') != target.get('updated_at'):
+                continue
+            profile.update({column: target[column] for column in
+                            ('daily_calories', 'daily_protein_g', 'daily_carbs_g', 'daily_fats_g')})
+            profile['updated_at'] = now
+            updated.append(profile['user_id'])
+        return updated
+
+
+class GeminiSettings:
+    """Behaviour of the fake chat completions endpoint"""
+
+    def __init__(self, latency_ms=1500.0, jitter_ms=500.0, error_rate=0.0, shapes='json=1'):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.shapes = parse_weights(shapes)
+
+    def delay(self) -> float:
+        return max(0.0, random.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)) / 1000
+
+    def content(self) -> str:
+        shape = random.choices(list(self.shapes), weights=list(self.shapes.values()))[0]
+        food = json.dumps(random.choice(FAKE_FOODS), ensure_ascii=False)
+        if shape == 'fenced':
+            return f"```json\n{food}\n```"
+        if shape == 'invalid':
+            return "I'm sorry, I can't identify the food in this image."
+        return food
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Large enough for the load test's concurrency
+    request_queue_size = 256
+
+
+class FakeServices:
+    """The stand-in server and its state"""
+
+    def __init__(self, host='127.0.0.1', port=0, db_latency_ms=10.0, storage_latency_ms=30.0, gemini=None):
+        self.db = Database()
+        self.objects = {}
+        self.gemini = gemini or GeminiSettings()
+        self.db_latency = db_latency_ms / 1000
+        self.storage_latency = storage_latency_ms / 1000
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+        self.jwks = self._make_jwks()
+
+        handler = type('Handler', (FakeRequestHandler,), {'services': self})
+        self.server = FakeServer((host, port), handler)
+
+    @staticmethod
+    def _make_jwks() -> dict:
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from jwt.algorithms import ECAlgorithm
+
+        public_key = ec.generate_private_key(ec.SECP256R1()).public_key()
+        jwk = ECAlgorithm.to_jwk(public_key, as_dict=True)
+        jwk.update(kid='fake-es256', alg='ES256', use='sig')
+        return {'keys': [jwk]}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, route: str):
+        with self.stats_lock:
+            self.stats[route] += 1
+
+    def start(self):
+        """Serve from a background thread"""
+        threading.Thread(target=self.server.serve_forever, name='fake-services', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    services = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # ===== Helpers =====
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def read_json(self):
+        body = self.read_body()
+        return json.loads(body) if body else None
+
+    def send(self, status: int, body=None, content_type='application/json', headers=None):
+        if isinstance(body, (dict, list)):
+            payload = json.dumps(body).encode()
+        elif isinstance(body, str):
+            payload = body.encode()
+        else:
+            payload = body or b''
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def prefer(self) -> dict:
+        values = {}
+        for item in self.headers.get('Prefer', '').split(','):
+            name, _, value = item.strip().partition('=')
+            if name:
+                values[name] = value
+        return values
+
+    def route(self):
+        parts = urlsplit(self.path)
+        return unquote(parts.path), parse_qsl(parts.query, keep_blank_values=True)
+
+    def dispatch(self, method: str):
+        path, params = self.route()
+        try:
+            if path.startswith('/rest/v1/rpc/'):
+                self.services.count('rpc')
+                return self.handle_rpc(path[len('/rest/v1/rpc/'):])
+            if path.startswith('/rest/v1/'):
+                self.services.count(f"rest {method}")
+                return self.handle_rest(method, path[len('/rest/v1/'):], params)
+            if path.startswith('/storage/v1/'):
+                self.services.count(f"storage {method}")
+                return self.handle_storage(method, path[len('/storage/v1/'):])
+            if path == '/auth/v1/.well-known/jwks.json':
+                self.services.count('jwks')
+                return self.send(200, self.services.jwks)
+            if path == '/v1/chat/completions' and method == 'POST':
+                return self.handle_chat_completion()
+            if path == '/v1/models':
+                self.services.count('gemini models')
+                return self.send(200, {'object': 'list', 'data': [{'id': 'gemini-2.0-flash', 'object': 'model'}]})
+            if path == '/_fake/stats':
+                with self.services.stats_lock:
+                    return self.send(200, dict(self.services.stats))
+            self.send(404, {'message': f'Not found: {method} {path}'})
+        except Exception as e:
+            self.send(400, {'code': 'PGRST000', 'message': str(e), 'details': None, 'hint': None})
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PATCH(self):
+        self.dispatch('PATCH')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    # ===== PostgREST =====
+
+    def handle_rest(self, method: str, table: str, params):
+        time.sleep(self.services.db_latency)
+        query = dict(params)
+        prefer = self.prefer()
+        body = self.read_json() if method in ('POST', 'PATCH') else None
+        matches = parse_filters(params)
+        db = self.services.db
+
+        with db.lock:
+            if method == 'GET':
+                rows = sort_rows([row for row in db.rows(table) if matches(row)], query.get('order', ''))
+                total = len(rows)
+                offset = int(query.get('offset', 0))
+                range_header = self.headers.get('Range')
+                if range_header:
+                    start, _, end = range_header.partition('-')
+                    offset, limit = int(start), int(end) - int(start) + 1
+                else:
+                    limit = int(query['limit']) if 'limit' in query else None
+                rows = rows[offset:offset + limit if limit is not None else None]
+                status = 200
+            elif method == 'POST':
+                records = body if isinstance(body, list) else [body]
+                try:
+                    rows = db.insert(table, records, query.get('on_conflict'),
+                                     merge=prefer.get('resolution') == 'merge-duplicates')
+                except ValueError as e:
+                    return self.send(409, {'code': '23505', 'message': str(e), 'details': None, 'hint': None})
+                total, offset, status = len(rows), 0, 201
+            elif method == 'PATCH':
+                rows = [row for row in db.rows(table) if matches(row)]
+                for row in rows:
+                    row.update(body or {})
+                total, offset, status = len(rows), 0, 200
+            else:
+                rows = [row for row in db.rows(table) if matches(row)]
+                db.tables[table] = [row for row in db.rows(table) if not matches(row)]
+                total, offset, status = len(rows), 0, 200
+
+            payload = [project(row, query.get('select')) for row in rows]
+
+        headers = {
+            'Content-Range': f"{offset}-{offset + len(payload) - 1 if payload else offset}/"
+                             f"{total if prefer.get('count') else '*'}"
+        }
+        if method != 'GET' and prefer.get('return') != 'representation':
+            return self.send(204 if status == 200 else status, b'', headers=headers)
+        self.send(status, payload, headers=headers)
+
+    def handle_rpc(self, function: str):
+        time.sleep(self.services.db_latency)
+        args = self.read_json() or {}
+        db = self.services.db
+        with db.lock:
+            if function == 'update_streak':
+                result = db.update_streak(args['p_user_id'], args['p_today'], args['p_now'])
+            elif function == 'update_profile_targets':
+                result = db.update_profile_targets(args['p_targets'], args['p_now'])
+            else:
+                return self.send(404, {'code': 'PGRST202', 'message': f'Could not find the function {function}'})
+        self.send(200, result)
+
+    # ===== Storage =====
+
+    def handle_storage(self, method: str, path: str):
+        time.sleep(self.services.storage_latency)
+        objects = self.services.objects
+
+        if method == 'POST' and path.startswith('object/sign/'):
+            target = path[len('object/sign/'):]
+            body = self.read_json() or {}
+            expires_in = body.get('expiresIn', 3600)
+            if 'paths' in body:
+                return self.send(200, [
+                    {'path': name, 'error': None if f"{target}/{name}" in objects else 'Object not found',
+                     'signedURL': f"/object/sign/{target}/{name}?token=fake&expires={expires_in}"}
+                    for name in body['paths']
+                ])
+            if target not in objects:
+                return self.send(400, {'statusCode': '404', 'error': 'not_found', 'message': 'Object not found'})
+            return self.send(200, {'signedURL': f"/object/sign/{target}?token=fake&expires={expires_in}"})
+
+        if path.startswith('object/authenticated/'):
+            path = 'object/' + path[len('object/authenticated/'):]
+        if not path.startswith('object/'):
+            return self.send(404, {'message': f'Not found: {path}'})
+        target = path[len('object/'):]
+
+        if method == 'POST':
+            body = self.read_body()
+            content_type = self.headers.get('Content-Type', '')
+            content, file_type = body, content_type
+            if content_type.startswith('multipart/form-data'):
+                message = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {content_type}\r\n\r\n".encode() + body
+                )
+                for part in message.iter_parts():
+                    if part.get_param('name', header='content-disposition') == 'file':
+                        content, file_type = part.get_payload(decode=True), part.get_content_type()
+            if target in objects and self.headers.get('x-upsert', 'false') != 'true':
+                return self.send(400, {'statusCode': '409', 'error': 'Duplicate', 'message': 'The resource already exists'})
+            objects[target] = (content, file_type)
+            return self.send(200, {'Key': target, 'Id': str(uuid.uuid4())})
+
+        if method == 'GET':
+            if target not in objects:
+                return self.send(400, {'statusCode': '404', 'error': 'not_found', 'message': 'Object not found'})
+            content, file_type = objects[target]
+            return self.send(200, content, content_type=file_type)
+
+        if method == 'DELETE':
+            body = self.read_json() or {}
+            removed = []
+            for prefix in body.get('prefixes', []):
+                if objects.pop(f"{target}/{prefix}", None) is not None:
+                    removed.append({'name': prefix})
+            return self.send(200, removed)
+
+        self.send(405, {'message': f'Method not allowed: {method}'})
+
+    # ===== Gemini =====
+
+    def handle_chat_completion(self):
+        self.read_body()
+        gemini = self.services.gemini
+        time.sleep(gemini.delay())
+
+        if random.random() < gemini.error_rate:
+            self.services.count('gemini error')
+            return self.send(503, {'error': {'code': 503, 'message': 'The model is overloaded.', 'status': 'UNAVAILABLE'}})
+
+        self.services.count('gemini completion')
+        self.send(200, {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': 'gemini-2.0-flash',
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': gemini.content()},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 1290, 'completion_tokens': 40, 'total_tokens': 1330}
+        })
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the stand-in options, shared with load_test.py"""
+    parser.add_argument('--db-latency-ms', type=float, default=10.0,
+                        help='Added latency of each PostgREST call')
+    parser.add_argument('--storage-latency-ms', type=float, default=30.0,
+                        help='Added latency of each Storage call')
+    parser.add_argument('--gemini-latency-ms', type=float, default=1500.0,
+                        help='Mean latency of a chat completion')
+    parser.add_argument('--gemini-jitter-ms', type=float, default=500.0,
+                        help='Chat completion latency varies uniformly by this much')
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0,
+                        help='Share of chat completions answered with a 503')
+    parser.add_argument('--gemini-shapes', default='json=1',
+                        help='Weights of the response shapes json, fenced (```json) and invalid')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=54321)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    services = FakeServices(
+        args.host, args.port, args.db_latency_ms, args.storage_latency_ms,
+        GeminiSettings(args.gemini_latency_ms, args.gemini_jitter_ms, args.gemini_error_rate, args.gemini_shapes)
+    )
+    print(f"Fake services listening on {services.url}", flush=True)
+    try:
+        services.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        services.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+Image Pipeline Benchmark
+
+Measures the CPU time and memory of each image path of POST /consumed and
+POST /edit_with_ai (see src/utils/image_pool.py) on a generated corpus of
+phone-sized photos, and flags regressions against a stored baseline.
+
+Each variant runs in a fresh process, so its peak RSS is its own. Stages
+are timed separately (decode, convert, resize, encode, base64), and the
+app's own function is timed end to end as `total`. jpeg_resized is not a
+path of the app: it shows what downscaling before the encodes would save.
+
+Run from the backend directory:
+
+    python benchmarks/image_pipeline.py
+    python benchmarks/image_pipeline.py --sizes large --variants jpeg,webp_passthrough
+    python benchmarks/image_pipeline.py --update-baseline
+
+Timings depend on the machine; record the baseline on the machine that
+compares against it.
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(BACKEND_DIR, 'benchmarks', 'baselines', 'image_pipeline.json')
+
+# Phone photo resolutions: compressed by the app, 3 MP and a 12 MP camera
+SIZES = {
+    'small': (960, 1280),
+    'medium': (1536, 2048),
+    'large': (3024, 4032),
+}
+
+# Variant: (uploaded format, image mode, app function)
+VARIANTS = {
+    'webp_passthrough': ('WEBP', 'RGB', 'prepare_upload'),
+    'jpeg': ('JPEG', 'RGB', 'prepare_upload'),
+    'png': ('PNG', 'RGB', 'prepare_upload'),
+    'png_rgba': ('PNG', 'RGBA', 'prepare_upload'),
+    'gif_palette': ('GIF', 'P', 'prepare_upload'),
+    'edit_with_ai': ('WEBP', 'RGB', 'prepare_prompt_image'),
+    'jpeg_resized': ('JPEG', 'RGB', 'prepare_upload'),
+}
+
+# Long edge of jpeg_resized, the largest Gemini uses without downscaling
+RESIZE_LONG_EDGE = 1536
+
+# Same limit as POST /consumed
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+# A result regresses when it exceeds the baseline by the tolerance and
+# by the floor, so noise on fast stages is not flagged
+TIME_FLOOR_MS = 2.0
+RSS_FLOOR_MB = 4.0
+
+
+def generate_photo(size, mode: str, seed: int):
+    """A reproducible photo-like image: smooth shapes plus fine grain"""
+    from PIL import Image, ImageFilter
+
+    width, height = size
+    rng = random.Random(seed)
+
+    def noise(scale: int):
+        small = (max(1, width // scale), max(1, height // scale))
+        count = small[0] * small[1] * 3
+        data = rng.getrandbits(8 * count).to_bytes(count, 'little')
+        return Image.frombytes('RGB', small, data).resize(size, Image.BICUBIC)
+
+    image = Image.blend(noise(64), noise(8), 0.3)
+    image = Image.blend(image, noise(1), 0.08).filter(ImageFilter.SMOOTH)
+    if mode == 'RGBA':
+        image.putalpha(Image.linear_gradient('L').resize(size))
+    elif mode == 'P':
+        image = image.quantize(256)
+    return image
+
+
+def build_corpus(directory: str, sizes, variants) -> dict:
+    """Write the input file of each (variant, size), returns their paths"""
+    corpus = {}
+    for size_name in sizes:
+        for variant in variants:
+            image_format, mode, _ = VARIANTS[variant]
+            path = os.path.join(directory, f"{variant}-{size_name}.{image_format.lower()}")
+            image = generate_photo(SIZES[size_name], mode, seed=hash_seed(size_name, mode))
+            if variant == 'edit_with_ai':
+                # The stored photo, encoded like an upload
+                from src.utils.image_pool import STORAGE_WEBP_QUALITY
+                image.save(path, format='WEBP', quality=STORAGE_WEBP_QUALITY)
+            else:
+                image.save(path, format=image_format, **({'quality': 85} if image_format in ('JPEG', 'WEBP') else {}))
+            corpus[(variant, size_name)] = path
+    return corpus
+
+
+def hash_seed(*parts) -> int:
+    # hash() of str is salted per process, this is not
+    return sum((index + 1) * ord(char) for index, char in enumerate(':'.join(parts)))
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss survives exec on Linux, so a worker would report the peak
+    # of the driver that built the corpus; VmHWM starts over
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# ===== Worker (one process per variant and size) =====
+
+def time_stages(variant: str, content: bytes) -> dict:
+    from PIL import Image
+    from src.utils.image_pool import PROMPT_WEBP_QUALITY, STORAGE_WEBP_QUALITY
+
+    stages = {}
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        stages[name] = (time.perf_counter() - start) * 1000
+        return result
+
+    def encode(image, quality):
+        buffered = io.BytesIO()
+        image.save(buffered, format='WEBP', quality=quality)
+        return buffered.getvalue()
+
+    def decode():
+        image = Image.open(io.BytesIO(content))
+        image.load()
+        return image
+
+    image = timed('decode', decode)
+    image = timed('convert', lambda: image.convert('RGB') if image.mode in ('RGBA', 'P') else image)
+    if variant == 'jpeg_resized':
+        def resize():
+            resized = image.copy()
+            resized.thumbnail((RESIZE_LONG_EDGE, RESIZE_LONG_EDGE), Image.LANCZOS)
+            return resized
+        image = timed('resize', resize)
+    if VARIANTS[variant][2] == 'prepare_upload' and variant != 'webp_passthrough':
+        timed('encode_store', lambda: encode(image, STORAGE_WEBP_QUALITY))
+    prompt = timed('encode_prompt', lambda: encode(image, PROMPT_WEBP_QUALITY))
+    timed('base64', lambda: base64.b64encode(prompt).decode('utf-8'))
+    return stages
+
+
+def run_app_function(variant: str, content: bytes):
+    from src.utils import image_pool
+
+    if variant == 'jpeg_resized':
+        # Not an app path, time the stages instead
+        return None
+    if VARIANTS[variant][2] == 'prepare_prompt_image':
+        prompt = image_pool.prepare_prompt_image(content)
+        stored = content
+    else:
+        stored, prompt = image_pool.prepare_upload(content, variant == 'webp_passthrough')
+    return stored, prompt, base64.b64encode(prompt)
+
+
+def worker(variant: str, path: str, repeat: int) -> dict:
+    # Load Pillow and its codecs before the baseline RSS
+    from PIL import Image, WebPImagePlugin  # noqa: F401
+    import src.utils.image_pool  # noqa: F401
+
+    with open(path, 'rb') as image_file:
+        content = image_file.read()
+    rss_before = peak_rss_mb()
+
+    totals, stage_runs, output = [], [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = run_app_function(variant, content)
+        totals.append((time.perf_counter() - start) * 1000)
+        stage_runs.append(time_stages(variant, content))
+
+    stages = {name: statistics.median(run[name] for run in stage_runs) for name in stage_runs[0]}
+    result = {
+        'input_kb': round(len(content) / 1024, 1),
+        'stages_ms': {name: round(value, 2) for name, value in stages.items()},
+        'total_ms': round(statistics.median(totals) if output is not None else sum(stages.values()), 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_growth_mb': round(peak_rss_mb() - rss_before, 1),
+    }
+    if output is not None:
+        stored, prompt, encoded = output
+        result.update(stored_kb=round(len(stored) / 1024, 1), prompt_kb=round(len(prompt) / 1024, 1),
+                      base64_kb=round(len(encoded) / 1024, 1))
+    return result
+
+
+# ===== Driver =====
+
+def run_worker(variant: str, path: str, repeat: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', variant, path, '--repeat', str(repeat)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def machine_info() -> dict:
+    import PIL
+
+    return {
+        'system': platform.system(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+    }
+
+
+def compare(results: dict, baseline: dict, time_tolerance: float, rss_tolerance: float):
+    """List the results that regressed against the baseline"""
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get('results', {}).get(key)
+        if previous is None:
+            continue
+        checks = [('total_ms', result['total_ms'], previous['total_ms'], time_tolerance, TIME_FLOOR_MS)]
+        checks += [
+            (f"{stage}_ms", value, previous['stages_ms'][stage], time_tolerance, TIME_FLOOR_MS)
+            for stage, value in result['stages_ms'].items() if stage in previous['stages_ms']
+        ]
+        checks.append(('peak_rss_mb', result['peak_rss_mb'], previous['peak_rss_mb'], rss_tolerance, RSS_FLOOR_MB))
+        for metric, value, before, tolerance, floor in checks:
+            if value > before * (1 + tolerance) and value - before > floor:
+                regressions.append(f"{key} {metric}: {before} -> {value} (+{(value / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_results(results: dict):
+    stage_names = ['decode', 'convert', 'resize', 'encode_store', 'encode_prompt', 'base64']
+    header = (f"{'variant/size':<28}{'input KB':>10}" + ''.join(f"{name:>14}" for name in stage_names)
+              + f"{'total ms':>10}{'peak MB':>9}{'growth MB':>11}")
+    print(header)
+    print('-' * len(header))
+    for key, result in results.items():
+        stages = ''.join(
+            f"{result['stages_ms'][name]:>14.2f}" if name in result['stages_ms'] else f"{'-':>14}"
+            for name in stage_names
+        )
+        print(f"{key:<28}{result['input_kb']:>10.0f}{stages}{result['total_ms']:>10.2f}"
+              f"{result['peak_rss_mb']:>9.1f}{result['rss_growth_mb']:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(SIZES), help='Comma separated sizes to run')
+    parser.add_argument('--variants', default=','.join(VARIANTS), help='Comma separated variants to run')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of each variant, the median is reported')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline file')
+    parser.add_argument('--update-baseline', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help='Allowed slowdown, 0.25 = 25%%')
+    parser.add_argument('--rss-tolerance', type=float, default=0.20, help='Allowed peak RSS growth')
+    parser.add_argument('--worker', nargs=2, metavar=('VARIANT', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    if args.worker:
+        print(json.dumps(worker(args.worker[0], args.worker[1], args.repeat)))
+        return 0
+
+    sizes = [size for size in args.sizes.split(',') if size]
+    variants = [variant for variant in args.variants.split(',') if variant]
+    unknown = [name for name in sizes if name not in SIZES] + [name for name in variants if name not in VARIANTS]
+    if unknown:
+        raise SystemExit(f"Unknown sizes or variants: {', '.join(unknown)}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = build_corpus(directory, sizes, variants)
+        for (variant, size_name), path in corpus.items():
+            if os.path.getsize(path) > MAX_UPLOAD_BYTES and variant != 'edit_with_ai':
+                print(f"Skipping {variant}/{size_name}: over the upload size limit")
+                continue
+            results[f"{variant}/{size_name}"] = run_worker(variant, path, args.repeat)
+
+    print_results(results)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump({'machine': machine_info(), 'repeat': args.repeat, 'results': results},
+                      baseline_file, indent=2, ensure_ascii=False)
+            baseline_file.write('\n')
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}, run with --update-baseline to record one")
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get('machine') != machine_info():
+        print(f"\nWarning: the baseline was recorded on another machine: {baseline.get('machine')}")
+
+    regressions = compare(results, baseline, args.time_tolerance, args.rss_tolerance)
+    if regressions:
+        print("\nFAIL: regressions against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
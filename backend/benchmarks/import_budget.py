@@ -0,0 +1,100 @@
+"""
+Cold Start Import Budget
+
+Measures how long `import app` takes in a fresh interpreter (with
+python -X importtime) and how long until the first request is served,
+then fails if the import exceeds the budget or loads a dependency that
+is meant to be imported on first use.
+
+Run from the backend directory, e.g. before a release or in CI:
+
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py --budget-ms 600 --top 15
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Default budget for `import app`, in milliseconds
+DEFAULT_BUDGET_MS = 800
+
+# Heavy packages that must only be imported on first use
+DEFERRED_MODULES = ('pandas', 'numpy', 'PIL', 'openai', 'supabase', 'gotrue', 'postgrest', 'storage3', 'httpx')
+
+FIRST_REQUEST_SCRIPT = """
+import time
+start = time.perf_counter()
+import app
+app.app.test_client().get('/health')
+print(time.perf_counter() - start)
+"""
+
+
+def run_python(args, env):
+    return subprocess.run(
+        [sys.executable, *args], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+
+
+def parse_importtime(stderr: str):
+    """Parse -X importtime output into (module, self_us, cumulative_us) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='Maximum time for `import app`')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest imports to show')
+    parser.add_argument('--runs', type=int, default=3, help='Runs to take the best time of')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('SUPABASE_URL', 'http://localhost:54321')
+    env.setdefault('SUPABASE_JWT_SECRET', 'import-budget')
+
+    import_ms = []
+    rows = []
+    for _ in range(args.runs):
+        rows = parse_importtime(run_python(['-X', 'importtime', '-c', 'import app'], env).stderr)
+        import_ms.append(next(cumulative for name, _, cumulative in rows if name == 'app') / 1000)
+
+    first_request_ms = min(
+        float(run_python(['-c', FIRST_REQUEST_SCRIPT], env).stdout.split()[-1]) * 1000
+        for _ in range(args.runs)
+    )
+
+    print(f"import app:         {min(import_ms):8.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"first /health:      {first_request_ms:8.1f} ms")
+    print("\nSlowest imports (cumulative):")
+    for name, _, cumulative in sorted(rows, key=lambda row: -row[2])[1:args.top + 1]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    loaded = {name.split('.')[0] for name, _, _ in rows}
+    eager = [module for module in DEFERRED_MODULES if module in loaded]
+
+    failed = False
+    if min(import_ms) > args.budget_ms:
+        print(f"\nFAIL: import app took {min(import_ms):.1f} ms, budget is {args.budget_ms:.0f} ms")
+        failed = True
+    if eager:
+        print(f"\nFAIL: imported at startup, should be deferred: {', '.join(eager)}")
+        failed = True
+    if not failed:
+        print("\nOK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
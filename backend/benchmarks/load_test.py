@@ -0,0 +1,404 @@
+"""
+Offline Load Test
+
+Starts the app under gunicorn against the stand-ins of
+benchmarks/fake_services.py, seeds users with profiles and meals, then
+drives a weighted mix of uploads, dashboard reads, edits and streak
+updates from concurrent clients. Reports throughput, status codes and
+p50/p95/p99 latency per endpoint. Needs no network, so capacity changes
+can be compared on a laptop.
+
+Run from the backend directory:
+
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --users 100 --concurrency 48 --duration 60
+    python benchmarks/load_test.py --mix dashboard=1,upload=1 --gemini-latency-ms 4000
+    python benchmarks/load_test.py --serving-mode async --json results.json
+
+Rate limits are off by default (RATELIMIT_ENABLED=false), since a few
+seeded users would hit them long before the server's capacity.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import jwt
+
+from fake_services import add_arguments, parse_weights
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.join(BACKEND_DIR, 'benchmarks')
+
+JWT_SECRET = 'load-test-jwt-secret-with-at-least-32-bytes'
+
+# Weights of the operations in the default workload, roughly what the
+# mobile app sends: mostly reads, one photo upload per few dashboard views
+DEFAULT_MIX = ('dashboard=40,daily_summary=15,recently_eaten=10,profile=5,'
+               'upload=10,edit=10,edit_with_ai=2,streak=8')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def make_token(user_id: str, role: str = 'authenticated') -> str:
+    now = int(time.time())
+    return jwt.encode({
+        'sub': user_id,
+        'email': f"{user_id[:8]}@load.test",
+        'role': role,
+        'aud': 'authenticated',
+        'iat': now,
+        'exp': now + 6 * 3600
+    }, JWT_SECRET, algorithm='HS256')
+
+
+def make_photo(size: int) -> bytes:
+    """A noisy JPEG photo, which costs about as much to re-encode as a real one"""
+    from PIL import Image
+
+    image = Image.merge('RGB', [Image.effect_noise((size, size), 48) for _ in range(3)])
+    buffered = io.BytesIO()
+    image.save(buffered, format='JPEG', quality=85)
+    return buffered.getvalue()
+
+
+def wait_until(url: str, timeout: float, expect=200):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code == expect:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{url} did not answer {expect} within {timeout:.0f}s")
+
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+# ===== Setup =====
+
+def start_fake_services(args) -> tuple:
+    port = free_port()
+    command = [
+        sys.executable, os.path.join(BENCHMARKS_DIR, 'fake_services.py'), '--port', str(port),
+        '--db-latency-ms', str(args.db_latency_ms),
+        '--storage-latency-ms', str(args.storage_latency_ms),
+        '--gemini-latency-ms', str(args.gemini_latency_ms),
+        '--gemini-jitter-ms', str(args.gemini_jitter_ms),
+        '--gemini-error-rate', str(args.gemini_error_rate),
+        '--gemini-shapes', args.gemini_shapes,
+    ]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR)
+    url = f"http://127.0.0.1:{port}"
+    wait_until(f"{url}/_fake/stats", 15)
+    return process, url
+
+
+def seed(fake_url: str, users: int, meals_per_user: int, photo: bytes) -> dict:
+    """Create profiles, today's meals and their photos; returns the meal ids by user"""
+    meals = {}
+    profiles = []
+    foods = []
+    now = datetime.now(timezone.utc)
+    with httpx.Client(base_url=fake_url, timeout=30) as client:
+        for _ in range(users):
+            user_id = str(uuid.uuid4())
+            profiles.append({
+                'user_id': user_id,
+                'gender': 'female',
+                'activity_level': 'moderately_active',
+                'tracking_difficulty': 'easy',
+                'experience_level': 'beginner',
+                'height_unit': 'cm',
+                'height_value': 168,
+                'weight_unit': 'kg',
+                'weight_value': 64,
+                'date_of_birth': '1994-05-12',
+                'main_goal': 'maintain_weight',
+                'dietary_preference': 'classic',
+                'daily_calories': 2100,
+                'daily_protein_g': 120,
+                'daily_carbs_g': 240,
+                'daily_fats_g': 70,
+                'onboarding_completed': True,
+                'streak': 3,
+                'streak_bitmap': 7,
+                'streak_update_date': (now - timedelta(days=1)).isoformat(),
+                'updated_at': now.isoformat(),
+            })
+            meals[user_id] = []
+            for index in range(meals_per_user):
+                food_id = str(uuid.uuid4())
+                photo_path = f"{user_id}/seed-{index}.webp"
+                client.post(f"/storage/v1/object/food-images/{photo_path}", content=photo,
+                            headers={'Content-Type': 'image/jpeg'}).raise_for_status()
+                foods.append({
+                    'id': food_id,
+                    'user_id': user_id,
+                    'name': 'Seeded Meal',
+                    'emoji': '🍽️',
+                    'protein': 25.0,
+                    'carbs': 50.0,
+                    'fats': 15.0,
+                    'calories': 435.0,
+                    'portion': 1.0,
+                    'photo_path': photo_path,
+                    'created_at': (now - timedelta(minutes=30 * (index + 1))).isoformat(),
+                })
+                meals[user_id].append(food_id)
+
+        client.post('/rest/v1/user_profiles', json=profiles).raise_for_status()
+        if foods:
+            client.post('/rest/v1/foods_consumed', json=foods).raise_for_status()
+    return meals
+
+
+def start_app(args, fake_url: str) -> tuple:
+    port = free_port()
+    env = dict(os.environ)
+    # Stay offline: no Redis unless one is given explicitly
+    env.pop('REDIS_URL', None)
+    if args.redis_url:
+        env['REDIS_URL'] = args.redis_url
+    env.update({
+        'PORT': str(port),
+        'FLASK_ENV': 'production',
+        'SUPABASE_URL': fake_url,
+        'SUPABASE_SERVICE_ROLE_KEY': make_token('service-role', role='service_role'),
+        'SUPABASE_JWT_SECRET': JWT_SECRET,
+        'GEMINI_API_KEY': 'load-test',
+        'GEMINI_BASE_URL': f"{fake_url}/v1/",
+        'RATELIMIT_ENABLED': 'true' if args.rate_limits else 'false',
+        'SERVING_MODE': args.serving_mode,
+        'WEB_CONCURRENCY': str(args.workers),
+    })
+    if args.threads:
+        env['GUNICORN_THREADS'] = str(args.threads)
+    env.pop('SUPABASE_JWKS_FILE', None)
+    env.pop('SUPABASE_JWKS_URL', None)
+
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:app', '-c', 'gunicorn.conf.py'],
+        cwd=BACKEND_DIR, env=env,
+        stdout=None if args.verbose else subprocess.DEVNULL,
+        stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    wait_until(f"{url}/ready", 60)
+    return process, url
+
+
+def stop(process):
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# ===== Workload =====
+
+class Workload:
+    """The operations of the mix, each returning the endpoint it called and the response"""
+
+    def __init__(self, meals: dict, photo: bytes):
+        self.meals = meals
+        self.photo = photo
+        self.tokens = {user_id: make_token(user_id) for user_id in meals}
+        self.lock = threading.Lock()
+
+    def meal_of(self, user_id: str):
+        with self.lock:
+            return random.choice(self.meals[user_id]) if self.meals[user_id] else None
+
+    def dashboard(self, client, user_id):
+        return 'GET /dashboard', client.get('/dashboard')
+
+    def daily_summary(self, client, user_id):
+        return 'GET /daily_nutrition_summary', client.get('/daily_nutrition_summary')
+
+    def recently_eaten(self, client, user_id):
+        return 'GET /recently_eaten', client.get('/recently_eaten')
+
+    def profile(self, client, user_id):
+        return 'GET /user_profiles', client.get('/user_profiles')
+
+    def upload(self, client, user_id):
+        response = client.post('/consumed', files={'photo': ('meal.jpg', self.photo, 'image/jpeg')})
+        if response.status_code == 200:
+            with self.lock:
+                self.meals[user_id].append(response.json()['data']['database_record']['id'])
+        return 'POST /consumed', response
+
+    def edit(self, client, user_id):
+        payload = {'food_id': self.meal_of(user_id), 'portion': random.choice([0.5, 1, 1.5, 2])}
+        return 'PUT /edit_consumed_food', client.put('/edit_consumed_food', json=payload)
+
+    def edit_with_ai(self, client, user_id):
+        payload = {'food_id': self.meal_of(user_id), 'text_description': 'Large portion, extra olive oil'}
+        return 'POST /edit_with_ai', client.post('/edit_with_ai', json=payload)
+
+    def streak(self, client, user_id):
+        return 'POST /update_streak', client.post('/update_streak')
+
+
+def run_load(args, app_url: str, workload: Workload) -> tuple:
+    mix = parse_weights(args.mix)
+    unknown = [name for name in mix if not hasattr(Workload, name)]
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(unknown)}")
+    operations, weights = [getattr(workload, name) for name in mix], list(mix.values())
+    users = list(workload.meals)
+
+    results = []
+    results_lock = threading.Lock()
+    start = time.monotonic()
+    measure_from = start + args.warmup
+    deadline = measure_from + args.duration
+
+    def client_loop():
+        with httpx.Client(base_url=app_url, timeout=args.timeout) as client:
+            while time.monotonic() < deadline:
+                user_id = random.choice(users)
+                client.headers['Authorization'] = f"Bearer {workload.tokens[user_id]}"
+                operation = random.choices(operations, weights=weights)[0]
+                began = time.monotonic()
+                try:
+                    endpoint, response = operation(client, user_id)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    endpoint, status = operation.__name__, type(e).__name__
+                elapsed = time.monotonic() - began
+                if began >= measure_from:
+                    with results_lock:
+                        results.append((endpoint, status, elapsed))
+                if args.think_ms:
+                    time.sleep(random.expovariate(1000 / args.think_ms))
+
+    threads = [threading.Thread(target=client_loop, daemon=True) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    measured = min(time.monotonic(), deadline) - measure_from
+    return results, measured
+
+
+# ===== Report =====
+
+def summarize(results, seconds: float) -> dict:
+    by_endpoint = defaultdict(list)
+    for endpoint, status, elapsed in results:
+        by_endpoint[endpoint].append((status, elapsed))
+    by_endpoint['TOTAL'] = [(status, elapsed) for _, status, elapsed in results]
+
+    summary = {}
+    for endpoint, samples in by_endpoint.items():
+        latencies = sorted(elapsed * 1000 for _, elapsed in samples)
+        statuses = Counter(str(status) for status, _ in samples)
+        summary[endpoint] = {
+            'requests': len(samples),
+            'throughput_rps': round(len(samples) / seconds, 2) if seconds > 0 else 0.0,
+            'ok': sum(count for status, count in statuses.items() if status.startswith('2')),
+            'statuses': dict(sorted(statuses.items())),
+            'p50_ms': round(percentile(latencies, 0.50), 1),
+            'p95_ms': round(percentile(latencies, 0.95), 1),
+            'p99_ms': round(percentile(latencies, 0.99), 1),
+            'max_ms': round(latencies[-1], 1) if latencies else 0.0,
+        }
+    return summary
+
+
+def print_report(summary: dict, seconds: float):
+    print(f"\nMeasured {seconds:.1f}s\n")
+    header = f"{'endpoint':<32}{'reqs':>7}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses"
+    print(header)
+    print('-' * len(header))
+    endpoints = sorted(name for name in summary if name != 'TOTAL') + ['TOTAL']
+    for endpoint in endpoints:
+        row = summary[endpoint]
+        statuses = ' '.join(f"{status}:{count}" for status, count in row['statuses'].items())
+        print(f"{endpoint:<32}{row['requests']:>7}{row['throughput_rps']:>9.1f}{row['p50_ms']:>10.1f}"
+              f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}  {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=50, help='Seeded users')
+    parser.add_argument('--meals-per-user', type=int, default=4, help="Seeded meals of today per user")
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds of load before measuring')
+    parser.add_argument('--think-ms', type=float, default=0, help='Mean pause of a client between requests')
+    parser.add_argument('--timeout', type=float, default=120, help='Client timeout in seconds')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Weights of the operations')
+    parser.add_argument('--image-size', type=int, default=1024, help='Side of the uploaded photos in pixels')
+    parser.add_argument('--serving-mode', choices=('threads', 'async'), default=os.getenv('SERVING_MODE', 'threads'))
+    parser.add_argument('--workers', type=int, default=1, help='Gunicorn workers (WEB_CONCURRENCY)')
+    parser.add_argument('--threads', type=int, help='GUNICORN_THREADS, defaults to the app default')
+    parser.add_argument('--rate-limits', action='store_true', help='Keep rate limiting on')
+    parser.add_argument('--redis-url', help='Use this Redis for the cache and rate limits')
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help="Show the app's output")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    photo = make_photo(args.image_size)
+    fake_process, fake_url = start_fake_services(args)
+    app_process = None
+    try:
+        meals = seed(fake_url, args.users, args.meals_per_user, photo)
+        app_process, app_url = start_app(args, fake_url)
+        print(f"App on {app_url} ({args.serving_mode}, {args.workers} worker(s)), "
+              f"stand-ins on {fake_url}, {args.concurrency} clients")
+
+        results, seconds = run_load(args, app_url, Workload(meals, photo))
+        summary = summarize(results, seconds)
+        print_report(summary, seconds)
+
+        upstream = httpx.get(f"{fake_url}/_fake/stats").json()
+        print(f"\nStand-in calls: {json.dumps(upstream, sort_keys=True)}")
+
+        if args.json:
+            with open(args.json, 'w') as results_file:
+                json.dump({
+                    'settings': vars(args),
+                    'seconds': round(seconds, 2),
+                    'endpoints': summary,
+                    'upstream_calls': upstream
+                }, results_file, indent=2)
+            print(f"Results written to {args.json}")
+    finally:
+        if app_process is not None:
+            stop(app_process)
+        stop(fake_process)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
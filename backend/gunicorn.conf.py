@@ -0,0 +1,46 @@
+"""
+Gunicorn configuration
+
+SERVING_MODE selects how requests are served:
+- threads (default): sync workers with GUNICORN_THREADS threads each
+- async: gevent workers. Sockets are cooperative, so each worker holds up
+  to WORKER_CONNECTIONS requests in flight while they wait on Gemini and
+  Supabase. CPU-bound image work runs on CPU_WORKERS OS threads per worker
+  (see src/utils/serving.py).
+
+In threads mode image work runs in IMAGE_WORKERS processes per worker
+(see src/utils/image_pool.py), started when the worker boots.
+"""
+
+import os
+
+from src.utils.serving import serving_capacity, serving_mode
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+timeout = 600
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+
+if serving_mode() == 'async':
+    worker_class = 'gevent'
+    worker_connections = serving_capacity()
+else:
+    threads = serving_capacity()
+
+
+def post_worker_init(worker):
+    if serving_mode() == 'async':
+        from gevent import get_hub
+        get_hub().threadpool.maxsize = int(os.getenv('CPU_WORKERS', 4))
+
+    # Warm the image processing processes before the first upload
+    from src.utils.image_pool import image_pool
+    image_pool.start()
+
+    # Open the connections to Supabase and Gemini in the background
+    from src.utils.readiness import readiness
+    readiness.start_warmup()
+
+
+def worker_exit(server, worker):
+    from src.utils.image_pool import image_pool
+    image_pool.shutdown()
@@ -0,0 +1,99 @@
+-- Streak functions
+--
+-- Run in the Supabase SQL editor. Safe to re-run.
+
+-- At most one streak record per user and day. Concurrent updates before
+-- this constraint may have recorded a day twice: keep one row per day
+-- (the physically first) so the constraint can be added.
+BEGIN;
+DELETE FROM user_streaks a
+ USING user_streaks b
+ WHERE a.user_id = b.user_id
+   AND a.streak_date = b.streak_date
+   AND a.ctid > b.ctid;
+ALTER TABLE user_streaks DROP CONSTRAINT IF EXISTS user_streaks_user_id_streak_date_key;
+ALTER TABLE user_streaks ADD CONSTRAINT user_streaks_user_id_streak_date_key UNIQUE (user_id, streak_date);
+COMMIT;
+
+-- Rolling bitmap of goal hit days: bit 0 is the day of streak_update_date,
+-- bit i the day i days before it. Covers 62 days so it fits a BIGINT
+-- without touching the sign bit.
+ALTER TABLE user_profiles ADD COLUMN IF NOT EXISTS streak_bitmap BIGINT;
+
+-- Backfill the bitmap from user_streaks
+UPDATE user_profiles p
+   SET streak_bitmap = COALESCE((
+        SELECT bit_or(1::BIGINT << (p.streak_update_date::DATE - s.streak_date))
+          FROM user_streaks s
+         WHERE s.user_id = p.user_id
+           AND s.streak_date <= p.streak_update_date::DATE
+           AND s.streak_date > p.streak_update_date::DATE - 62
+       ), 0)
+ WHERE p.streak_update_date IS NOT NULL;
+
+-- Atomic streak update used by POST /update_streak.
+--
+-- Locks the profile row, so concurrent calls for the same user are
+-- serialized and only the first one on a given day updates the streak.
+-- Returns the new state as JSON:
+--   {"status": "updated", "streak": 5, "previous_streak": 4, "streak_bitmap": 31}
+--   {"status": "already_updated", "streak": 5}
+--   {"status": "profile_not_found"}
+CREATE OR REPLACE FUNCTION update_streak(p_user_id UUID, p_today DATE, p_now TIMESTAMPTZ)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_previous_streak INTEGER;
+    v_last_date DATE;
+    v_new_streak INTEGER;
+    v_bitmap BIGINT;
+BEGIN
+    SELECT COALESCE(streak, 0), streak_update_date::DATE, COALESCE(streak_bitmap, 0)
+      INTO v_previous_streak, v_last_date, v_bitmap
+      FROM user_profiles
+     WHERE user_id = p_user_id
+       FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('status', 'profile_not_found');
+    END IF;
+
+    IF v_last_date IS NOT NULL AND v_last_date >= p_today THEN
+        RETURN jsonb_build_object('status', 'already_updated', 'streak', v_previous_streak);
+    END IF;
+
+    -- Consecutive day increments the streak, a gap starts a new one
+    v_new_streak := CASE WHEN v_last_date = p_today - 1 THEN v_previous_streak + 1 ELSE 1 END;
+
+    -- Re-anchor the bitmap on today and set today's bit
+    IF v_last_date IS NULL OR p_today - v_last_date >= 62 THEN
+        v_bitmap := 1;
+    ELSE
+        v_bitmap := ((v_bitmap << (p_today - v_last_date)) | 1) & ((1::BIGINT << 62) - 1);
+    END IF;
+
+    UPDATE user_profiles
+       SET streak = v_new_streak,
+           streak_bitmap = v_bitmap,
+           updated_at = p_now,
+           streak_update_date = p_now
+     WHERE user_id = p_user_id;
+
+    INSERT INTO user_streaks (user_id, streak_date)
+    VALUES (p_user_id, p_today)
+    ON CONFLICT (user_id, streak_date) DO NOTHING;
+
+    RETURN jsonb_build_object(
+        'status', 'updated',
+        'streak', v_new_streak,
+        'previous_streak', v_previous_streak,
+        'streak_bitmap', v_bitmap
+    );
+END;
+$$;
+
+-- Called by the backend with the service role key only. It takes any
+-- user's ID, so it must not be reachable through /rpc with the anon key.
+REVOKE EXECUTE ON FUNCTION update_streak(UUID, DATE, TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION update_streak(UUID, DATE, TIMESTAMPTZ) TO service_role;
@@ -0,0 +1,42 @@
+-- User profile constraints
+--
+-- Run in the Supabase SQL editor. Safe to re-run.
+
+-- One profile per user. Also the conflict target of the profile upsert
+-- in POST /user_profiles.
+ALTER TABLE user_profiles DROP CONSTRAINT IF EXISTS user_profiles_user_id_key;
+ALTER TABLE user_profiles ADD CONSTRAINT user_profiles_user_id_key UNIQUE (user_id);
+
+-- Batch target update used by `flask --app app recalculate-targets`.
+--
+-- Writes only the daily target columns, and skips profiles whose
+-- updated_at differs from the value the job read, so a profile edited
+-- since then keeps the edit (the next run recalculates it). Takes a JSON
+-- array of
+--   {"user_id": ..., "updated_at": ..., "daily_calories": 2100,
+--    "daily_protein_g": 150.0, "daily_carbs_g": 210.0, "daily_fats_g": 70.0}
+-- and returns the user_id of each updated profile as a JSON array.
+CREATE OR REPLACE FUNCTION update_profile_targets(p_targets JSONB, p_now TIMESTAMPTZ)
+RETURNS JSONB
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE user_profiles p
+           SET daily_calories = t.daily_calories,
+               daily_protein_g = t.daily_protein_g,
+               daily_carbs_g = t.daily_carbs_g,
+               daily_fats_g = t.daily_fats_g,
+               updated_at = p_now
+          FROM jsonb_to_recordset(p_targets) AS t(
+                   user_id UUID, updated_at TIMESTAMPTZ, daily_calories INTEGER,
+                   daily_protein_g NUMERIC, daily_carbs_g NUMERIC, daily_fats_g NUMERIC)
+         WHERE p.user_id = t.user_id
+           AND p.updated_at IS NOT DISTINCT FROM t.updated_at
+     RETURNING p.user_id
+    )
+    SELECT COALESCE(jsonb_agg(user_id), '[]'::JSONB) FROM updated;
+$$;
+
+-- Called by the recalculate-targets job with the service role key only
+REVOKE EXECUTE ON FUNCTION update_profile_targets(JSONB, TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION update_profile_targets(JSONB, TIMESTAMPTZ) TO service_role;
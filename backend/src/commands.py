@@ -0,0 +1,141 @@
+"""
+CLI Commands
+
+Maintenance jobs run through the Flask CLI, e.g. from a scheduled
+Railway cron service:
+
+    flask --app app reset-stale-streaks
+    flask --app app recalculate-targets
+"""
+
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+import click
+from flask.cli import with_appcontext
+
+from src.utils.cache import user_cache
+from src.utils.streaks import reset_stale_streaks
+from src.utils.nutrition_calculator import NutritionCalculator, PROFILE_TARGET_COLUMNS, has_target_inputs
+from src.utils.supabase_client import get_supabase_client
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+# Columns read by recalculate-targets. updated_at guards the write
+# against edits made after the read (see sql/user_profiles.sql).
+RECALCULATE_COLUMNS = ', '.join(
+    ('id', 'user_id', 'updated_at', 'onboarding_completed')
+    + PROFILE_TARGET_COLUMNS
+    + ('daily_calories', 'daily_protein_g', 'daily_carbs_g', 'daily_fats_g')
+)
+
+
+@click.command('reset-stale-streaks')
+@with_appcontext
+def reset_stale_streaks_command():
+    """Reset the lapsed streaks of all users (run nightly)"""
+    supabase: Client = get_supabase_client()
+
+    reset_user_ids = reset_stale_streaks(supabase, datetime.now().date())
+    # Profile responses carry the stored streak
+    for user_id in reset_user_ids:
+        user_cache.invalidate(user_id)
+    click.echo(f"Reset {len(reset_user_ids)} stale streaks")
+
+
+def targets_changed(profile: dict, calories: int, protein_g: float, carbs_g: float, fats_g: float) -> bool:
+    """Check whether the stored daily targets of a profile differ from new ones"""
+    stored = (profile.get('daily_calories'), profile.get('daily_protein_g'),
+              profile.get('daily_carbs_g'), profile.get('daily_fats_g'))
+    if any(value is None for value in stored):
+        return True
+    return (int(stored[0]) != calories
+            or abs(float(stored[1]) - protein_g) > 0.01
+            or abs(float(stored[2]) - carbs_g) > 0.01
+            or abs(float(stored[3]) - fats_g) > 0.01)
+
+
+@click.command('recalculate-targets')
+@click.option('--page-size', default=1000, show_default=True, help='Profiles read and updated per batch')
+@click.option('--dry-run', is_flag=True, help='Only count the profiles whose targets changed')
+@with_appcontext
+def recalculate_targets_command(page_size, dry_run):
+    """Recalculate the daily targets of all users (after formula changes, and daily for birthdays)"""
+    supabase: Client = get_supabase_client()
+
+    today = datetime.now().date()
+    scanned_count = 0
+    changed_count = 0
+    skipped_count = 0
+    incomplete_count = 0
+    last_id = None
+
+    while True:
+        # Keyset pagination on the primary key
+        query = supabase.table('user_profiles') \
+            .select(RECALCULATE_COLUMNS) \
+            .order('id') \
+            .limit(page_size)
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        profiles = query.execute().data or []
+        if not profiles:
+            break
+        scanned_count += len(profiles)
+        last_id = profiles[-1]['id']
+
+        # Profiles with missing inputs have no targets to calculate
+        complete_profiles = [profile for profile in profiles if has_target_inputs(profile)]
+        incomplete_count += len(profiles) - len(complete_profiles)
+
+        targets = NutritionCalculator.calculate_from_profiles(complete_profiles, today) if complete_profiles else {}
+
+        changed_profiles = []
+        for index, profile in enumerate(complete_profiles):
+            calories = int(targets['calories'][index])
+            protein_g = float(targets['protein_g'][index])
+            carbs_g = float(targets['carbs_g'][index])
+            fats_g = float(targets['fats_g'][index])
+
+            if targets_changed(profile, calories, protein_g, carbs_g, fats_g):
+                changed_profiles.append({
+                    'user_id': profile['user_id'],
+                    'updated_at': profile.get('updated_at'),
+                    'daily_calories': calories,
+                    'daily_protein_g': protein_g,
+                    'daily_carbs_g': carbs_g,
+                    'daily_fats_g': fats_g
+                })
+
+        if changed_profiles and not dry_run:
+            # Only the target columns, and only rows not edited since the read
+            updated_user_ids = supabase.rpc('update_profile_targets', {
+                'p_targets': changed_profiles,
+                'p_now': datetime.now().isoformat()
+            }).execute().data or []
+            skipped_count += len(changed_profiles) - len(updated_user_ids)
+
+            # Reaches the web workers through the Redis cache backend. The
+            # in-process cache cannot be reached from here and keeps the old
+            # targets for up to CACHE_TTL_SECONDS
+            for user_id in updated_user_ids:
+                user_cache.invalidate(user_id)
+
+        changed_count += len(changed_profiles)
+
+        if len(profiles) < page_size:
+            break
+
+    if dry_run:
+        click.echo(f"Scanned {scanned_count} profiles, {changed_count} would be updated, "
+                   f"{incomplete_count} incomplete")
+    else:
+        click.echo(f"Scanned {scanned_count} profiles, {changed_count - skipped_count} updated, "
+                   f"{skipped_count} skipped (edited during the run), {incomplete_count} incomplete")
+
+
+def register_commands(app):
+    """Register the maintenance commands on the app's CLI"""
+    app.cli.add_command(reset_stale_streaks_command)
+    app.cli.add_command(recalculate_targets_command)
@@ -1,23 +1,24 @@
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
-from flask import jsonify, g, request, current_app
+from flask import jsonify, g, request
 import os
-import pandas as pd
 import json
+from typing import TYPE_CHECKING
 from werkzeug.utils import secure_filename
 from src.utils.auth import verify_supabase_token
-from src.utils.rate_limiter import limiter, RATE_LIMITS
+from src.utils.rate_limiter import limiter, RATE_LIMITS, get_strict_user_id
+from src.utils.cache import invalidates_user_cache
+from src.utils.bulkhead import bulkhead, bulkheads, busy_response, BulkheadFull
+from src.utils.load_shedding import sheds_load
 import uuid
 from datetime import datetime
-from supabase import create_client, Client
-import tempfile
-import io
 from src.utils.models import Model
 from src.utils.prompt_generator import PromptGenerator
-from PIL import Image
-from dotenv import load_dotenv
+from src.utils.image_pool import image_pool, prepare_upload, prepare_prompt_image, ImagePoolFull
+from src.utils.supabase_client import get_supabase_client
 
-load_dotenv()
+if TYPE_CHECKING:
+    from supabase import Client
 
 blp = Blueprint('Consumed', __name__, description='Consumed Operations')
 
@@ -30,7 +31,10 @@ def allowed_file(filename):
 @blp.route('/consumed')
 class Consumed(MethodView):
     @verify_supabase_token  
-    @limiter.limit(RATE_LIMITS['AI_ANALYSIS'])
+    @sheds_load
+    @limiter.limit(RATE_LIMITS['AI_ANALYSIS'], key_func=get_strict_user_id)
+    @invalidates_user_cache
+    @bulkhead('AI_ANALYSIS')
     def post(self):
         try:
             # Check if the request contains a file
@@ -78,31 +82,20 @@ class Consumed(MethodView):
             # Read original file bytes
             original_content = file.read()
 
-            # Check if the image is already in WebP format (frontend optimization)
-            if filename.lower().endswith('.webp'):
-                # Image is already optimized by frontend, use as-is
-                file_content = original_content
-                file_size = len(file_content)
-                # Still need to create image object for AI analysis
-                image = Image.open(io.BytesIO(original_content))
-            else:
-                # Convert to WebP format for backward compatibility
-                image = Image.open(io.BytesIO(original_content))
-                webp_io = io.BytesIO()
-                # Ensure compatibility (e.g. remove alpha channel) before saving as WEBP
-                if image.mode in ("RGBA", "P"):
-                    image = image.convert("RGB")
-                image.save(webp_io, format="WEBP", quality=50)
-                webp_io.seek(0)
-
-                # Final bytes to upload
-                file_content = webp_io.getvalue()
-                file_size = len(file_content)
+            # WebP images are already optimized by the frontend and stored
+            # as-is, others are converted for backward compatibility. Both
+            # also get the copy sent to the AI, in the image pool.
+            try:
+                file_content, prompt_image = image_pool.run(
+                    prepare_upload, original_content, filename.lower().endswith('.webp')
+                )
+            except ImagePoolFull:
+                # Image transforms take well under a second
+                return busy_response('FILE_UPLOAD', 1)
+            file_size = len(file_content)
             
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
             
             # Upload photo to Supabase Storage
             try:
@@ -110,17 +103,20 @@ class Consumed(MethodView):
                 storage_path = f"food-photos/{g.current_user['id']}/{unique_filename}"
                 
                 # Upload to Supabase Storage - if this succeeds without exception, upload is successful
-                supabase.storage.from_('food-images').upload(
-                    file=file_content,
-                    path=storage_path,
-                    file_options={
-                        "content-type": "image/webp",
-                        "upsert": False
-                    }
-                )
+                with bulkheads.get('FILE_UPLOAD').slot():
+                    supabase.storage.from_('food-images').upload(
+                        file=file_content,
+                        path=storage_path,
+                        file_options={
+                            "content-type": "image/webp",
+                            "upsert": False
+                        }
+                    )
                 
                 print(f"Successfully uploaded photo to storage path: {storage_path}")
                     
+            except BulkheadFull:
+                return busy_response('FILE_UPLOAD', bulkheads.get('FILE_UPLOAD').retry_after())
             except Exception as e:
                 return jsonify({
                     'error': 'Failed to upload photo to storage',
@@ -130,7 +126,7 @@ class Consumed(MethodView):
             model = Model()
             prompt_generator = PromptGenerator()
 
-            messages = prompt_generator.consumed_food_prompt(image)
+            messages = prompt_generator.consumed_food_prompt(prompt_image)
 
             response = model.gemini_chat_completion(messages)
             
@@ -208,7 +204,10 @@ class Consumed(MethodView):
 @blp.route('/edit_with_ai')
 class EditWithAI(MethodView):
     @verify_supabase_token
-    @limiter.limit(RATE_LIMITS['AI_ANALYSIS'])
+    @sheds_load
+    @limiter.limit(RATE_LIMITS['AI_ANALYSIS'], key_func=get_strict_user_id)
+    @invalidates_user_cache
+    @bulkhead('AI_ANALYSIS')
     def post(self):
         try:
             # Get request data
@@ -235,10 +234,8 @@ class EditWithAI(MethodView):
                     'message': 'Please provide a text description for more accurate analysis'
                 }), 400
             
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
             
             # Get the existing food record
             try:
@@ -276,9 +273,12 @@ class EditWithAI(MethodView):
                         'message': 'Could not retrieve the image from storage'
                     }), 500
                 
-                # Convert bytes to PIL Image
-                image = Image.open(io.BytesIO(image_response))
+                # Re-encode for the prompt in the image pool
+                prompt_image = image_pool.run(prepare_prompt_image, image_response)
                 
+            except ImagePoolFull:
+                # Image transforms take well under a second
+                return busy_response('FILE_UPLOAD', 1)
             except Exception as e:
                 return jsonify({
                     'error': 'Failed to process image',
@@ -290,7 +290,7 @@ class EditWithAI(MethodView):
                 model = Model()
                 prompt_generator = PromptGenerator()
                 
-                messages = prompt_generator.consumed_food_prompt_with_description(image, text_description)
+                messages = prompt_generator.consumed_food_prompt_with_description(prompt_image, text_description)
                 response = model.gemini_chat_completion(messages)
                 
                 # Parse the JSON response from Gemini
@@ -383,6 +383,8 @@ class EditConsumedFood(MethodView):
     """Manually edit a consumed food record (name & macronutrients)"""
     @verify_supabase_token
     @limiter.limit(RATE_LIMITS['DB_WRITE'])
+    @invalidates_user_cache
+    @bulkhead('DB_WRITE')
     def put(self):
         try:
             data = request.get_json()
@@ -424,10 +426,8 @@ class EditConsumedFood(MethodView):
                     'message': f'Provide at least one of: {", ".join(updatable_fields)}'
                 }), 400
 
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
 
             # Perform update and fetch updated record
             result = supabase.table('foods_consumed') \
@@ -461,6 +461,8 @@ class DeleteConsumedFood(MethodView):
     """Delete a consumed food record"""
     @verify_supabase_token
     @limiter.limit(RATE_LIMITS['DB_WRITE'])
+    @invalidates_user_cache
+    @bulkhead('DB_WRITE')
     def delete(self):
         try:
             data = request.get_json()
@@ -479,10 +481,8 @@ class DeleteConsumedFood(MethodView):
                     'message': 'Please provide a valid food_id of the record to delete'
                 }), 400
 
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
 
             # First, get the record to check ownership and get photo path
             try:
@@ -0,0 +1,180 @@
+"""
+Dashboard API Routes
+
+Serves everything the home screen needs in a single request. The
+underlying queries run concurrently and the user profile is read once
+for all sections.
+"""
+
+from flask import jsonify, request, g
+from flask.views import MethodView
+from flask_smorest import Blueprint
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import os
+from typing import TYPE_CHECKING
+
+from ..utils.auth import verify_supabase_token
+from ..utils.rate_limiter import limiter, RATE_LIMITS
+from ..utils.cache import cached_per_user
+from ..utils.bulkhead import bulkhead
+from ..utils.etag import conditional_get
+from ..utils.nutrition_summary import format_foods, summarize_day
+from ..utils.profile_cache import get_profile
+from ..utils.streaks import effective_streak, load_streak_bitmap, streak_history_fields, HISTORY_FORMATS
+from ..utils.supabase_client import get_supabase_client
+from ..utils.timing import with_request_timing
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+blp = Blueprint('Dashboard', __name__, description='Dashboard Operations')
+
+DASHBOARD_SECTIONS = ('summary', 'meals', 'streak', 'profile')
+
+# Shared pool for the concurrent dashboard queries
+executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('DASHBOARD_WORKERS', 8)),
+    thread_name_prefix='dashboard'
+)
+
+
+@blp.route('/dashboard')
+class Dashboard(MethodView):
+    @verify_supabase_token
+    @limiter.limit(RATE_LIMITS['DB_READ'])
+    @conditional_get('dashboard', signed_urls=True)
+    @cached_per_user('dashboard')
+    @bulkhead('DB_READ')
+    def get(self):
+        """Get daily summary, recent meals, streak and profile in one request"""
+        try:
+            # Get requested sections (defaults to all)
+            sections_param = request.args.get('sections')
+            if sections_param:
+                sections = [section.strip() for section in sections_param.split(',') if section.strip()]
+            else:
+                sections = list(DASHBOARD_SECTIONS)
+
+            invalid_sections = [section for section in sections if section not in DASHBOARD_SECTIONS]
+            if invalid_sections or not sections:
+                return jsonify({
+                    'error': 'Invalid sections',
+                    'message': f'Sections must be a comma separated list of: {", ".join(DASHBOARD_SECTIONS)}'
+                }), 400
+
+            # Get date parameter from query string, default to today if not provided
+            date_param = request.args.get('date')
+
+            if date_param:
+                try:
+                    target_date = datetime.strptime(date_param, '%Y-%m-%d').date()
+                except ValueError:
+                    return jsonify({
+                        'error': 'Invalid date format',
+                        'message': 'Date must be in YYYY-MM-DD format'
+                    }), 400
+            else:
+                target_date = datetime.now().date()
+
+            # Number of recent meals to return (default 3, max 100)
+            limit = min(request.args.get('limit', 3, type=int), 100)
+
+            history_format = request.args.get('history_format', 'dates')
+            if history_format not in HISTORY_FORMATS:
+                return jsonify({
+                    'error': 'Invalid history_format',
+                    'message': f"history_format must be one of: {', '.join(HISTORY_FORMATS)}"
+                }), 400
+
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
+
+            user_id = g.current_user['id']
+            today = datetime.now().date()
+
+            def fetch_foods():
+                # One query serves both the summary (all foods of the day)
+                # and the meals section (most recent foods)
+                query = supabase.table('foods_consumed') \
+                    .select('*') \
+                    .eq('user_id', user_id) \
+                    .gte('created_at', target_date.isoformat()) \
+                    .lt('created_at', (target_date + timedelta(days=1)).isoformat()) \
+                    .order('created_at', desc=True)
+                if 'summary' not in sections:
+                    query = query.limit(limit)
+                return query.execute()
+
+            # Run the independent queries concurrently
+            needs_profile = any(section in sections for section in ('summary', 'streak', 'profile'))
+            profile_future = executor.submit(
+                with_request_timing(get_profile), supabase, user_id, g.get('cache_generation')
+            ) if needs_profile else None
+            foods_future = executor.submit(with_request_timing(fetch_foods)) if any(section in sections for section in ('summary', 'meals')) else None
+
+            profile = None
+            if profile_future:
+                profile = profile_future.result()
+                if not profile:
+                    return jsonify({
+                        'error': 'User profile not found',
+                        'message': 'Please complete your profile setup first'
+                    }), 404
+
+            foods = foods_future.result().data if foods_future else []
+
+            # Streak history comes from the profile's streak bitmap
+            streak_fields = {}
+            if any(section in sections for section in ('streak', 'profile')):
+                streak_bitmap = load_streak_bitmap(supabase, user_id, profile, today)
+                streak_fields = streak_history_fields(streak_bitmap, today, history_format)
+
+            dashboard = {
+                'date': target_date.isoformat(),
+                'sections': sections
+            }
+
+            if 'summary' in sections:
+                dashboard['summary'] = summarize_day(foods, profile)
+
+            if 'meals' in sections:
+                formatted_foods = format_foods(supabase, foods[:limit])
+                dashboard['meals'] = {
+                    'foods': formatted_foods,
+                    'count': len(formatted_foods)
+                }
+
+            if 'streak' in sections:
+                daily_calorie_goal = float(profile['daily_calories']) if profile['daily_calories'] else 0
+                dashboard['streak'] = {
+                    'current_streak': effective_streak(profile.get('streak'), profile.get('streak_update_date'), today),
+                    'daily_calorie_goal': round(daily_calorie_goal, 2),
+                    'last_updated': profile.get('updated_at'),
+                    **streak_fields
+                }
+
+            if 'profile' in sections:
+                dashboard['profile'] = {
+                    'profile': profile,
+                    'daily_targets': {
+                        'calories': profile.get('daily_calories'),
+                        'protein_g': profile.get('daily_protein_g'),
+                        'carbs_g': profile.get('daily_carbs_g'),
+                        'fats_g': profile.get('daily_fats_g')
+                    },
+                    **streak_fields
+                }
+
+            return jsonify({
+                'success': True,
+                'message': 'Dashboard retrieved successfully',
+                'data': dashboard
+            }), 200
+
+        except Exception as e:
+            print(f"Error fetching dashboard: {e}")
+            return jsonify({
+                'error': 'Failed to fetch dashboard',
+                'message': str(e)
+            }), 500
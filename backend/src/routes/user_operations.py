@@ -1,36 +1,57 @@
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
-from flask import jsonify, g, request, current_app
-import os
-import pandas as pd
+from flask import jsonify, g, request, Response, stream_with_context
 import json
-from werkzeug.utils import secure_filename
+import csv
+from typing import TYPE_CHECKING
 from src.utils.auth import verify_supabase_token
 from src.utils.rate_limiter import limiter, RATE_LIMITS
-import uuid
+from src.utils.cache import cached_per_user, invalidates_user_cache
+from src.utils.bulkhead import bulkhead
+from src.utils.etag import conditional_get
+from src.utils.nutrition_summary import format_foods, summarize_day, signed_photo_urls
+from src.utils.profile_cache import get_profile, invalidates_profile_cache
+from src.utils.streaks import (
+    apply_streak_update, effective_streak, load_streak_bitmap,
+    streak_history_fields, HISTORY_FORMATS
+)
+from src.utils.analytics import compute_range_analytics, GRANULARITIES, ROLLING_WINDOW_DAYS
+from src.utils.supabase_client import get_supabase_client
 from datetime import datetime, timedelta
-from supabase import create_client, Client
-import tempfile
 import io
-from src.utils.models import Model
-from src.utils.prompt_generator import PromptGenerator
-from PIL import Image
-from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 blp = Blueprint('History', __name__, description='History Operations')
 
+# Longest date range accepted by /analytics
+MAX_ANALYTICS_DAYS = 731
+
+# Page size for reading many foods_consumed rows (PostgREST caps responses at 1000 rows)
+FOODS_PAGE_SIZE = 1000
+
+# Page size and columns of the streaming /export endpoint
+EXPORT_PAGE_SIZE = 500
+EXPORT_COLUMNS = ['id', 'created_at', 'name', 'emoji', 'calories', 'protein', 'carbs', 'fats', 'portion']
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
 @blp.route('/recently_eaten')
 class RecentlyEaten(MethodView):
     @verify_supabase_token
     @limiter.limit(RATE_LIMITS['DB_READ'])
+    @conditional_get('recently_eaten', signed_urls=True)
+    @cached_per_user('recently_eaten')
+    @bulkhead('DB_READ')
     def get(self):
         """Get user's recently consumed food items from a specific date (defaults to today)"""
         
         try:
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
             
             # Get date parameter from query string, default to today if not provided
             date_param = request.args.get('date')
@@ -86,59 +107,7 @@ class RecentlyEaten(MethodView):
                 }), 200
             
             # Format the food records
-            formatted_foods = []
-            total_calories = 0
-            total_protein = 0
-            total_carbs = 0
-            total_fats = 0
-            
-            for food in result.data:
-                # Get portion size (default to 1 if not set)
-                portion = float(food.get('portion'))
-                
-                # Get signed URL if photo_path exists
-                photo_url = None
-                if food.get('photo_path'):
-                    try:
-                        photo_url_response = supabase.storage.from_('food-images').create_signed_url(food['photo_path'], 3600)  # 1 hour expiry
-                        
-                        # Handle different possible response structures
-                        if isinstance(photo_url_response, dict):
-                            photo_url = photo_url_response.get('signedURL') or photo_url_response.get('signedUrl')
-                        elif isinstance(photo_url_response, str):
-                            photo_url = photo_url_response
-                        else:
-                            photo_url = None
-                            
-                    except Exception as e:
-                        print(f"Warning: Could not generate signed URL for photo {food['photo_path']}: {str(e)}")
-                
-                # Use stored nutritional values (do not multiply by portion)
-                base_protein = float(food['protein']) if food['protein'] else 0
-                base_carbs = float(food['carbs']) if food['carbs'] else 0
-                base_fats = float(food['fats']) if food['fats'] else 0
-                base_calories = float(food['calories']) if food['calories'] else 0
-                
-                formatted_food = {
-                    'id': food['id'],
-                    'name': food['name'],
-                    'emoji': food['emoji'],
-                    'protein': round(base_protein, 2),
-                    'carbs': round(base_carbs, 2),
-                    'fats': round(base_fats, 2),
-                    'calories': round(base_calories, 2),
-                    'portion': portion,
-                    'photo_url': photo_url,
-                    'created_at': food['created_at']
-                }
-                
-                # Add to totals
-                total_calories += formatted_food['calories']
-                total_protein += formatted_food['protein']
-                total_carbs += formatted_food['carbs']
-                total_fats += formatted_food['fats']
-                
-                formatted_foods.append(formatted_food)
+            formatted_foods = format_foods(supabase, result.data)
             
             print(f"Found {len(formatted_foods)} food records")
             
@@ -163,13 +132,13 @@ class RecentlyEaten(MethodView):
 class FullHistory(MethodView):
     @verify_supabase_token
     @limiter.limit(RATE_LIMITS['DB_READ'])
+    @conditional_get('full_history', signed_urls=True)
+    @bulkhead('DB_READ')
     def get(self):
         """Get user's full history of consumed food items"""
         try:
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
             
             # Get query parameters for pagination
             limit = request.args.get('limit', 20, type=int)  # Default 20 items
@@ -272,13 +241,14 @@ class FullHistory(MethodView):
 class DailyNutritionSummary(MethodView):
     @verify_supabase_token
     @limiter.limit(RATE_LIMITS['DB_READ'])
+    @conditional_get('daily_nutrition_summary')
+    @cached_per_user('daily_nutrition_summary')
+    @bulkhead('DB_READ')
     def get(self):
         """Get user's daily nutrition summary with consumed vs goals for a specific date"""
         try:
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
             
             # Get date parameter from query string, default to today if not provided
             date_param = request.args.get('date')
@@ -311,88 +281,20 @@ class DailyNutritionSummary(MethodView):
                 .execute()
             
             # Get user's daily goals from profile
-            profile_result = supabase.table('user_profiles') \
-                .select('daily_calories, daily_protein_g, daily_carbs_g, daily_fats_g') \
-                .eq('user_id', g.current_user['id']) \
-                .execute()
+            user_goals = get_profile(supabase, g.current_user['id'])
             
-            if not profile_result.data:
+            if not user_goals:
                 return jsonify({
                     'error': 'User profile not found',
                     'message': 'Please complete your profile setup first'
                 }), 404
             
-            user_goals = profile_result.data[0]
-            
-            # Calculate consumed totals for the target date
-            consumed_calories = 0
-            consumed_protein = 0
-            consumed_carbs = 0
-            consumed_fats = 0
-            
-            for food in foods_result.data:
-                # Get portion size (default to 1 if not set)
-                # portion = float(food.get('portion'))
-                # Do NOT multiply by portion; just sum the stored values
-                consumed_calories += float(food['calories']) if food['calories'] else 0
-                consumed_protein += float(food['protein']) if food['protein'] else 0
-                consumed_carbs += float(food['carbs']) if food['carbs'] else 0
-                consumed_fats += float(food['fats']) if food['fats'] else 0
-            
-            # Get daily goals (handle None values)
-            goal_calories = float(user_goals['daily_calories']) if user_goals['daily_calories'] else 0
-            goal_protein = float(user_goals['daily_protein_g']) if user_goals['daily_protein_g'] else 0
-            goal_carbs = float(user_goals['daily_carbs_g']) if user_goals['daily_carbs_g'] else 0
-            goal_fats = float(user_goals['daily_fats_g']) if user_goals['daily_fats_g'] else 0
-            
-            # Calculate remaining amounts (can be negative if exceeded)
-            remaining_calories = goal_calories - consumed_calories
-            remaining_protein = goal_protein - consumed_protein
-            remaining_carbs = goal_carbs - consumed_carbs
-            remaining_fats = goal_fats - consumed_fats
-            
-            # Calculate percentages achieved
-            calories_percentage = (consumed_calories / goal_calories * 100) if goal_calories > 0 else 0
-            protein_percentage = (consumed_protein / goal_protein * 100) if goal_protein > 0 else 0
-            carbs_percentage = (consumed_carbs / goal_carbs * 100) if goal_carbs > 0 else 0
-            fats_percentage = (consumed_fats / goal_fats * 100) if goal_fats > 0 else 0
-            
             return jsonify({
                 'success': True,
                 'message': 'Daily nutrition summary retrieved successfully',
                 'data': {
                     'date': today,
-                    'consumed_today': {
-                        'calories': round(consumed_calories, 2),
-                        'protein': round(consumed_protein, 2),
-                        'carbs': round(consumed_carbs, 2),
-                        'fats': round(consumed_fats, 2)
-                    },
-                    'daily_goals': {
-                        'calories': round(goal_calories, 2),
-                        'protein': round(goal_protein, 2),
-                        'carbs': round(goal_carbs, 2),
-                        'fats': round(goal_fats, 2)
-                    },
-                    'remaining_to_goal': {
-                        'calories': round(remaining_calories, 2),
-                        'protein': round(remaining_protein, 2),
-                        'carbs': round(remaining_carbs, 2),
-                        'fats': round(remaining_fats, 2)
-                    },
-                    'progress_percentage': {
-                        'calories': round(calories_percentage, 1),
-                        'protein': round(protein_percentage, 1),
-                        'carbs': round(carbs_percentage, 1),
-                        'fats': round(fats_percentage, 1)
-                    },
-                    'foods_consumed_count': len(foods_result.data),
-                    'goals_status': {
-                        'calories_exceeded': consumed_calories > goal_calories,
-                        'protein_exceeded': consumed_protein > goal_protein,
-                        'carbs_exceeded': consumed_carbs > goal_carbs,
-                        'fats_exceeded': consumed_fats > goal_fats
-                    }
+                    **summarize_day(foods_result.data, user_goals)
                 }
             }), 200
             
@@ -407,100 +309,41 @@ class DailyNutritionSummary(MethodView):
 class UpdateStreak(MethodView):
     @verify_supabase_token  
     @limiter.limit(RATE_LIMITS['DB_WRITE'])
+    @invalidates_user_cache
+    @invalidates_profile_cache
+    @bulkhead('DB_WRITE')
     def post(self):
         """Update user's streak based on whether they hit their daily calorie goal"""
         try:
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
-            
-            # Get user's profile including current streak and daily calorie goal
-            profile_result = supabase.table('user_profiles') \
-                .select('daily_calories, streak, streak_update_date') \
-                .eq('user_id', g.current_user['id']) \
-                .execute()
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
             
-            if not profile_result.data:
+            # Update the streak in a single atomic database call
+            streak_update = apply_streak_update(supabase, g.current_user['id'], datetime.now())
+            
+            if streak_update['status'] == 'profile_not_found':
                 return jsonify({
                     'error': 'User profile not found',
                     'message': 'Please complete your profile setup first'
                 }), 404
             
-            user_profile = profile_result.data[0]
-            current_streak = int(user_profile['streak']) if user_profile['streak'] else 0
-            streak_update_date = user_profile.get('streak_update_date')
-            
-            today_date = datetime.now().date()
-            today_iso = datetime.now().isoformat()
-            
-            # Check if streak was already updated today
-            if streak_update_date:
-                stored_date = datetime.fromisoformat(streak_update_date.replace('Z', '+00:00')).date()
-                print(f"Last streak update: {stored_date}, Today: {today_date}")
-                
-                if stored_date == today_date:
-                    return jsonify({
-                        'error': 'Streak already updated today',
-                        'message': 'You can only update your streak once per day'
-                    }), 400
-                
-                # Check for gaps in the streak
-                days_difference = (today_date - stored_date).days
-                print(f"Days since last update: {days_difference}")
-                
-                if days_difference == 1:
-                    # Consecutive day - increment streak
-                    new_streak = current_streak + 1
-                    print(f"Consecutive day detected. Incrementing streak from {current_streak} to {new_streak}")
-                elif days_difference > 1:
-                    # Gap detected - reset streak to 1 (today starts a new streak)
-                    new_streak = 1
-                    print(f"Gap of {days_difference} days detected. Resetting streak to 1")
-                else:
-                    # This shouldn't happen (days_difference should never be 0 or negative here)
-                    return jsonify({
-                        'error': 'Invalid date comparison',
-                        'message': 'Unable to calculate streak properly'
-                    }), 400
-            else:
-                # First time updating streak
-                new_streak = 1
-                print(f"First streak update. Setting streak to 1")
-            
-            # Update the streak in the database
-            update_result = supabase.table('user_profiles') \
-                .update({
-                    'streak': new_streak,
-                    'updated_at': today_iso,
-                    'streak_update_date': today_iso
-                }) \
-                .eq('user_id', g.current_user['id']) \
-                .execute()
-            
-            if not update_result.data:
-                raise Exception("Failed to update streak in database")
-            
-            # Add a record to the user_streaks table for today
-            streak_record_result = supabase.table('user_streaks') \
-                .insert({
-                    'user_id': g.current_user['id'],
-                    'streak_date': today_date.isoformat()
-                }) \
-                .execute()
-            
-            if not streak_record_result.data:
-                print(f"Warning: Failed to insert streak record for user {g.current_user['id']} on {today_date}")
+            if streak_update['status'] == 'already_updated':
+                return jsonify({
+                    'error': 'Streak already updated today',
+                    'message': 'You can only update your streak once per day'
+                }), 400
             
-            updated_profile = update_result.data[0]
+            new_streak = streak_update['streak']
+            previous_streak = streak_update['previous_streak']
+            print(f"Streak updated from {previous_streak} to {new_streak}")
             
             return jsonify({
                 'success': True,
                 'message': f'Streak updated successfully to {new_streak}',
                 'data': {
-                    'streak': updated_profile['streak'],
-                    'previous_streak': current_streak,
-                    'streak_action': 'incremented' if new_streak > current_streak else 'reset'
+                    'streak': new_streak,
+                    'previous_streak': previous_streak,
+                    'streak_action': 'incremented' if new_streak > previous_streak else 'reset'
                 }
             }), 200
             
@@ -515,73 +358,44 @@ class UpdateStreak(MethodView):
 class GetStreak(MethodView):
     @verify_supabase_token
     @limiter.limit(RATE_LIMITS['DB_READ'])
+    @conditional_get('get_streak')
+    @cached_per_user('get_streak')
+    @bulkhead('DB_READ')
     def get(self):
         """Get user's current streak information"""
         try:
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            history_format = request.args.get('history_format', 'dates')
+            if history_format not in HISTORY_FORMATS:
+                return jsonify({
+                    'error': 'Invalid history_format',
+                    'message': f"history_format must be one of: {', '.join(HISTORY_FORMATS)}"
+                }), 400
+
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
             
             # Get user's current streak from profile
-            profile_result = supabase.table('user_profiles') \
-                .select('streak, daily_calories, updated_at, streak_update_date') \
-                .eq('user_id', g.current_user['id']) \
-                .execute()
+            user_profile = get_profile(supabase, g.current_user['id'])
             
-            if not profile_result.data:
+            if not user_profile:
                 return jsonify({
                     'error': 'User profile not found',
                     'message': 'Please complete your profile setup first'
                 }), 404
             
-            user_profile = profile_result.data[0]
-            current_streak = int(user_profile['streak']) if user_profile['streak'] else 0
+            stored_streak = int(user_profile['streak']) if user_profile['streak'] else 0
             daily_calorie_goal = float(user_profile['daily_calories']) if user_profile['daily_calories'] else 0
             last_updated = user_profile.get('updated_at')
-            streak_update_date = user_profile.get('streak_update_date')
-            
-            # Check if streak should be reset due to missed days
-            streak_needs_reset = False
-            if streak_update_date and current_streak > 0:
-                stored_date = datetime.fromisoformat(streak_update_date.replace('Z', '+00:00')).date()
-                today_date = datetime.now().date()
-                days_difference = (today_date - stored_date).days
-                
-                # If more than 1 day has passed since last update, streak should be reset
-                if days_difference > 1:
-                    streak_needs_reset = True
-                    print(f"Streak should be reset. Last update: {stored_date}, Today: {today_date}, Gap: {days_difference} days")
-                    
-                    # Reset the streak in database
-                    reset_result = supabase.table('user_profiles') \
-                        .update({
-                            'streak': 0,
-                            'updated_at': datetime.now().isoformat()
-                        }) \
-                        .eq('user_id', g.current_user['id']) \
-                        .execute()
-                    
-                    if reset_result.data:
-                        current_streak = 0
-                        print(f"Streak reset to 0 due to {days_difference} day gap")
-            
-            # Get last 31 days of streak data
-            thirty_one_days_ago = (datetime.now().date() - timedelta(days=31)).isoformat()
-            today = datetime.now().date().isoformat()
             
-            streak_history_result = supabase.table('user_streaks') \
-                .select('streak_date') \
-                .eq('user_id', g.current_user['id']) \
-                .gte('streak_date', thirty_one_days_ago) \
-                .lte('streak_date', today) \
-                .order('streak_date', desc=True) \
-                .execute()
+            # A streak with a gap since its last update has lapsed. It is
+            # reported as 0 here and reset in the database by the nightly
+            # reset-stale-streaks job, so this endpoint never writes.
+            current_streak = effective_streak(stored_streak, user_profile.get('streak_update_date'), datetime.now().date())
+            streak_needs_reset = current_streak != stored_streak
             
-            # Format streak dates
-            streak_dates = []
-            if streak_history_result.data:
-                streak_dates = [record['streak_date'] for record in streak_history_result.data]
+            # Last 31 days of streak data, from the profile's streak bitmap
+            today = datetime.now().date()
+            streak_bitmap = load_streak_bitmap(supabase, g.current_user['id'], user_profile, today)
 
             return jsonify({
                 'success': True,
@@ -591,7 +405,7 @@ class GetStreak(MethodView):
                     'daily_calorie_goal': round(daily_calorie_goal, 2),
                     'last_updated': last_updated,
                     'user_id': g.current_user['id'],
-                    'streak_history': streak_dates,
+                    **streak_history_fields(streak_bitmap, today, history_format),
                     'streak_auto_reset': streak_needs_reset
                 }
             }), 200
@@ -607,13 +421,14 @@ class GetStreak(MethodView):
 class WeeklyRecentlyEaten(MethodView):
     @verify_supabase_token
     @limiter.limit(RATE_LIMITS['DB_READ'])
+    @conditional_get('weekly_recently_eaten', signed_urls=True)
+    @cached_per_user('weekly_recently_eaten')
+    @bulkhead('DB_READ')
     def get(self):
         """Get user's recently consumed food items for the last 5 days"""
         try:
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
             
             # Get limit parameter for each day (default 3 items per day)
             daily_limit = request.args.get('daily_limit', 3, type=int)
@@ -737,28 +552,24 @@ class WeeklyRecentlyEaten(MethodView):
 class WeeklyDailyNutritionSummary(MethodView):
     @verify_supabase_token
     @limiter.limit(RATE_LIMITS['DB_READ'])
+    @conditional_get('weekly_daily_nutrition_summary')
+    @cached_per_user('weekly_daily_nutrition_summary')
+    @bulkhead('DB_READ')
     def get(self):
         """Get user's daily nutrition summary for the last 5 days with consumed vs goals"""
         try:
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
             
             # Get user's daily goals from profile (fetch once for all days)
-            profile_result = supabase.table('user_profiles') \
-                .select('daily_calories, daily_protein_g, daily_carbs_g, daily_fats_g') \
-                .eq('user_id', g.current_user['id']) \
-                .execute()
+            user_goals = get_profile(supabase, g.current_user['id'])
             
-            if not profile_result.data:
+            if not user_goals:
                 return jsonify({
                     'error': 'User profile not found',
                     'message': 'Please complete your profile setup first'
                 }), 404
             
-            user_goals = profile_result.data[0]
-            
             # Get daily goals (handle None values)
             goal_calories = float(user_goals['daily_calories']) if user_goals['daily_calories'] else 0
             goal_protein = float(user_goals['daily_protein_g']) if user_goals['daily_protein_g'] else 0
@@ -867,3 +678,221 @@ class WeeklyDailyNutritionSummary(MethodView):
                 'message': str(e)
             }), 500
 
+@blp.route('/analytics')
+class Analytics(MethodView):
+    @verify_supabase_token
+    @limiter.limit(RATE_LIMITS['DB_READ'])
+    @conditional_get('analytics')
+    @cached_per_user('analytics')
+    @bulkhead('DB_READ')
+    def get(self):
+        """Get bucketed nutrition totals, rolling averages and goal adherence for a date range"""
+        try:
+            # Parse date range (defaults to the last 30 days)
+            try:
+                to_param = request.args.get('to')
+                end_date = datetime.strptime(to_param, '%Y-%m-%d').date() if to_param else datetime.now().date()
+                from_param = request.args.get('from')
+                start_date = datetime.strptime(from_param, '%Y-%m-%d').date() if from_param else end_date - timedelta(days=29)
+            except ValueError:
+                return jsonify({
+                    'error': 'Invalid date format',
+                    'message': 'from and to must be in YYYY-MM-DD format'
+                }), 400
+
+            if start_date > end_date:
+                return jsonify({
+                    'error': 'Invalid date range',
+                    'message': 'from must not be after to'
+                }), 400
+
+            if (end_date - start_date).days + 1 > MAX_ANALYTICS_DAYS:
+                return jsonify({
+                    'error': 'Date range too large',
+                    'message': f'Date range must not exceed {MAX_ANALYTICS_DAYS} days'
+                }), 400
+
+            granularity = request.args.get('granularity', 'day')
+            if granularity not in GRANULARITIES:
+                return jsonify({
+                    'error': 'Invalid granularity',
+                    'message': f'Granularity must be one of: {", ".join(GRANULARITIES)}'
+                }), 400
+
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
+
+            # Get user's daily goals from profile
+            user_goals = get_profile(supabase, g.current_user['id'])
+
+            if not user_goals:
+                return jsonify({
+                    'error': 'User profile not found',
+                    'message': 'Please complete your profile setup first'
+                }), 404
+
+            # Fetch only the needed columns, including the lead-in days of
+            # the first rolling 7-day window
+            query_start = (start_date - timedelta(days=ROLLING_WINDOW_DAYS - 1)).isoformat()
+            query_end = (end_date + timedelta(days=1)).isoformat()
+
+            # Keyset pagination on (created_at, id), like /export, so foods
+            # sharing a created_at are neither skipped nor read twice
+            foods = []
+            while True:
+                query = supabase.table('foods_consumed') \
+                    .select('id, created_at, calories, protein, carbs, fats') \
+                    .eq('user_id', g.current_user['id']) \
+                    .gte('created_at', query_start) \
+                    .lt('created_at', query_end)
+                if foods:
+                    created_at, food_id = foods[-1]['created_at'], foods[-1]['id']
+                    query = query.or_(
+                        f'created_at.gt."{created_at}",'
+                        f'and(created_at.eq."{created_at}",id.gt."{food_id}")'
+                    )
+                page = query \
+                    .order('created_at') \
+                    .order('id') \
+                    .limit(FOODS_PAGE_SIZE) \
+                    .execute()
+                foods.extend(page.data)
+                if len(page.data) < FOODS_PAGE_SIZE:
+                    break
+
+            print(f"Computing analytics for user: {g.current_user['id']} from {start_date} to {end_date} ({len(foods)} foods)")
+
+            analytics = compute_range_analytics(
+                foods, user_goals, start_date, end_date, granularity
+            )
+
+            return jsonify({
+                'success': True,
+                'message': 'Analytics retrieved successfully',
+                'data': {
+                    'date_range': {
+                        'start_date': start_date.isoformat(),
+                        'end_date': end_date.isoformat()
+                    },
+                    'granularity': granularity,
+                    **analytics
+                }
+            }), 200
+
+        except Exception as e:
+            print(f"Error fetching analytics: {e}")
+            return jsonify({
+                'error': 'Failed to fetch analytics',
+                'message': str(e)
+            }), 500
+
+@blp.route('/export')
+class Export(MethodView):
+    @verify_supabase_token
+    @limiter.limit(RATE_LIMITS['DATA_EXPORT'])
+    @bulkhead('DATA_EXPORT')
+    def get(self):
+        """Stream the user's full food history as NDJSON or CSV"""
+        try:
+            export_format = request.args.get('format', 'ndjson')
+            if export_format not in EXPORT_FORMATS:
+                return jsonify({
+                    'error': 'Invalid format',
+                    'message': f'Format must be one of: {", ".join(EXPORT_FORMATS)}'
+                }), 400
+
+            include_photo_urls = request.args.get('include_photo_urls', 'false').lower() in ('1', 'true', 'yes')
+
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
+
+            user_id = g.current_user['id']
+            columns = EXPORT_COLUMNS + (['photo_path'] if include_photo_urls else [])
+            fieldnames = EXPORT_COLUMNS + (['photo_url'] if include_photo_urls else [])
+
+            def fetch_page(cursor):
+                """Fetch the next page with keyset pagination on (created_at, id)"""
+                query = supabase.table('foods_consumed') \
+                    .select(', '.join(columns)) \
+                    .eq('user_id', user_id)
+                if cursor:
+                    created_at, food_id = cursor
+                    query = query.or_(
+                        f'created_at.lt."{created_at}",'
+                        f'and(created_at.eq."{created_at}",id.lt."{food_id}")'
+                    )
+                return query \
+                    .order('created_at', desc=True) \
+                    .order('id', desc=True) \
+                    .limit(EXPORT_PAGE_SIZE) \
+                    .execute() \
+                    .data
+
+            def export_rows(page):
+                photo_urls = signed_photo_urls(supabase, (food.get('photo_path') for food in page)) \
+                    if include_photo_urls else {}
+                for food in page:
+                    row = {column: food.get(column) for column in EXPORT_COLUMNS}
+                    if include_photo_urls:
+                        row['photo_url'] = photo_urls.get(food.get('photo_path'))
+                    yield row
+
+            # Fetch the first page before streaming so errors still return a 500
+            first_page = fetch_page(None)
+
+            def generate():
+                page = first_page
+                exported = 0
+
+                if export_format == 'csv':
+                    buffer = io.StringIO()
+                    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+                    writer.writeheader()
+                    yield buffer.getvalue()
+
+                while page:
+                    if export_format == 'csv':
+                        buffer = io.StringIO()
+                        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+                        writer.writerows(export_rows(page))
+                        yield buffer.getvalue()
+                    else:
+                        yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in export_rows(page))
+
+                    exported += len(page)
+                    if len(page) < EXPORT_PAGE_SIZE:
+                        break
+
+                    try:
+                        page = fetch_page((page[-1]['created_at'], page[-1]['id']))
+                    except Exception as e:
+                        # Headers are already sent, so the status cannot change.
+                        # NDJSON ends with an error record; CSV has no room for
+                        # one, so the error aborts the chunked response instead
+                        # of ending it cleanly
+                        print(f"Error during export for user {user_id} after {exported} records: {e}")
+                        if export_format == 'csv':
+                            raise
+                        yield json.dumps({
+                            'error': 'Export incomplete',
+                            'message': str(e),
+                            'exported': exported
+                        }) + '\n'
+                        return
+
+                print(f"Exported {exported} food records for user: {user_id}")
+
+            filename = f"kalai-export-{datetime.now().date().isoformat()}.{export_format}"
+
+            return Response(
+                stream_with_context(generate()),
+                mimetype=EXPORT_FORMATS[export_format],
+                headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+            )
+
+        except Exception as e:
+            print(f"Error exporting food history: {e}")
+            return jsonify({
+                'error': 'Failed to export food history',
+                'message': str(e)
+            }), 500
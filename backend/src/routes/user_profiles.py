@@ -4,28 +4,54 @@ User Profiles API Routes
 Handles user profile creation, updates, and daily target calculations.
 """
 
-from flask import jsonify, request, g, current_app
+from flask import jsonify, request, g
 from flask.views import MethodView
 from flask_smorest import Blueprint
 from datetime import datetime, date, timedelta
 import json
-import os
-from supabase import create_client, Client
+from typing import TYPE_CHECKING
 
 from ..utils.auth import verify_supabase_token
-from ..utils.nutrition_calculator import NutritionCalculator, DailyTargets
+from ..utils.nutrition_calculator import NutritionCalculator, DailyTargets, PROFILE_TARGET_COLUMNS
 from ..utils.rate_limiter import limiter, RATE_LIMITS
+from ..utils.cache import cached_per_user, invalidates_user_cache
+from ..utils.bulkhead import bulkhead
+from ..utils.profile_cache import get_profile, invalidates_profile_cache
+from ..utils.etag import conditional_get
+from ..utils.streaks import effective_streak, load_streak_bitmap, streak_history_fields, HISTORY_FORMATS
+from ..utils.supabase_client import get_supabase_client
 
-from dotenv import load_dotenv
-
-load_dotenv()
+if TYPE_CHECKING:
+    from supabase import Client
 
 blp = Blueprint('user_profiles', __name__, description='User Profiles Operations')
 
+# Longest projection horizon (2 years)
+MAX_PROJECTION_WEEKS = 104
+
+# Profile columns returned by the write endpoints
+PROFILE_RESPONSE_COLUMNS = ', '.join(
+    ('id', 'user_id', 'tracking_difficulty', 'experience_level')
+    + PROFILE_TARGET_COLUMNS
+    + ('daily_calories', 'daily_protein_g', 'daily_carbs_g', 'daily_fats_g',
+       'onboarding_completed', 'created_at', 'updated_at')
+)
+
+
+def returning_columns(query, columns: str):
+    """Limit the columns an insert, update or upsert returns"""
+    cleaned_columns = ','.join(column.strip() for column in columns.split(','))
+    query.params = query.params.add('select', cleaned_columns)
+    return query
+
+
 @blp.route("/user_profiles")
 class UserProfilesView(MethodView):
     @verify_supabase_token
     @limiter.limit(RATE_LIMITS['DB_WRITE'])
+    @invalidates_user_cache
+    @invalidates_profile_cache
+    @bulkhead('DB_WRITE')
     def post(self):
         """Create or update user profile with onboarding data"""
         try:
@@ -91,46 +117,26 @@ class UserProfilesView(MethodView):
                 'daily_protein_g': targets.protein_g,
                 'daily_carbs_g': targets.carbs_g,
                 'daily_fats_g': targets.fats_g,
-                'onboarding_completed': True
+                'onboarding_completed': True,
+                'updated_at': datetime.now().isoformat()
             }
             
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
             
-            # Check if profile already exists
-            existing_profile_result = supabase.table('user_profiles') \
-                .select('*') \
-                .eq('user_id', user_id) \
-                .execute()
+            # Create or update the profile in a single round trip
+            # (user_id is unique, see sql/user_profiles.sql)
+            result = returning_columns(
+                supabase.table('user_profiles').upsert(profile_data, on_conflict='user_id', default_to_null=False),
+                PROFILE_RESPONSE_COLUMNS
+            ).execute()
             
-            if existing_profile_result.data:
-                # Update existing profile
-                result = supabase.table('user_profiles') \
-                    .update(profile_data) \
-                    .eq('user_id', user_id) \
-                    .execute()
-                
-                if result.data:
-                    saved_record = result.data[0]
-                    message = 'Profile updated successfully'
-                else:
-                    raise Exception("No data returned from database update")
-            else:
-                # Insert new profile
-                result = supabase.table('user_profiles') \
-                    .insert(profile_data) \
-                    .execute()
-                
-                if result.data:
-                    saved_record = result.data[0]
-                    message = 'Profile created successfully'
-                else:
-                    raise Exception("No data returned from database insert")
+            if not result.data:
+                raise Exception("No data returned from database upsert")
+            saved_record = result.data[0]
             
             return jsonify({
-                'message': message,
+                'message': 'Profile saved successfully',
                 'profile': saved_record,
                 'daily_targets': {
                     'calories': targets.calories,
@@ -148,47 +154,36 @@ class UserProfilesView(MethodView):
     
     @verify_supabase_token
     @limiter.limit(RATE_LIMITS['DB_READ'])
+    @conditional_get('user_profiles')
+    @cached_per_user('user_profiles')
+    @bulkhead('DB_READ')
     def get(self):
         """Get user profile"""
         try:
             user_id = g.current_user['id']
+
+            history_format = request.args.get('history_format', 'dates')
+            if history_format not in HISTORY_FORMATS:
+                return jsonify({
+                    'error': f"history_format must be one of: {', '.join(HISTORY_FORMATS)}"
+                }), 400
+
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
             
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
-            
-            # Fetch user profile from database
-            result = supabase.table('user_profiles') \
-                .select('*') \
-                .eq('user_id', user_id) \
-                .execute()
+            # Fetch user profile
+            profile = get_profile(supabase, user_id)
             
-            if not result.data:
+            if not profile:
                 return jsonify({
                     'message': 'No profile found for user',
                     'user_id': user_id,
                     'profile': None
                 }), 404
-            
-            profile = result.data[0]
 
-                        # Get last 31 days of streak data
-            thirty_one_days_ago = (datetime.now().date() - timedelta(days=31)).isoformat()
-            today = datetime.now().date().isoformat()
-            
-            streak_history_result = supabase.table('user_streaks') \
-                .select('streak_date') \
-                .eq('user_id', g.current_user['id']) \
-                .gte('streak_date', thirty_one_days_ago) \
-                .lte('streak_date', today) \
-                .order('streak_date', desc=True) \
-                .execute()
-            
-            # Format streak dates
-            streak_dates = []
-            if streak_history_result.data:
-                streak_dates = [record['streak_date'] for record in streak_history_result.data]
+            # Last 31 days of streak data, from the profile's streak bitmap
+            today = datetime.now().date()
+            streak_bitmap = load_streak_bitmap(supabase, user_id, profile, today)
             
             return jsonify({
                 'message': 'Profile retrieved successfully',
@@ -200,8 +195,8 @@ class UserProfilesView(MethodView):
                     'carbs_g': profile.get('daily_carbs_g'),
                     'fats_g': profile.get('daily_fats_g')
                 },
-                'streak': profile.get('streak'),
-                'streak_history': streak_dates
+                'streak': effective_streak(profile.get('streak'), profile.get('streak_update_date'), today),
+                **streak_history_fields(streak_bitmap, today, history_format)
             }), 200
             
         except Exception as e:
@@ -214,19 +209,20 @@ class RecalculateTargetsView(MethodView):
     
     @verify_supabase_token
     @limiter.limit(RATE_LIMITS['DB_WRITE'])
+    @invalidates_user_cache
+    @invalidates_profile_cache
+    @bulkhead('DB_WRITE')
     def post(self):
         """Recalculate daily targets for existing profile"""
         try:
             user_id = g.current_user['id']
             
-            # Initialize Supabase client
-            supabase_url = current_app.config['SUPABASE_URL']
-            supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
             
-            # Fetch current profile from database
+            # Fetch only the columns the targets are calculated from
             result = supabase.table('user_profiles') \
-                .select('*') \
+                .select(', '.join(PROFILE_TARGET_COLUMNS)) \
                 .eq('user_id', user_id) \
                 .execute()
             
@@ -269,10 +265,10 @@ class RecalculateTargetsView(MethodView):
                 'updated_at': datetime.now().isoformat()
             }
             
-            update_result = supabase.table('user_profiles') \
-                .update(update_data) \
-                .eq('user_id', user_id) \
-                .execute()
+            update_result = returning_columns(
+                supabase.table('user_profiles').update(update_data).eq('user_id', user_id),
+                PROFILE_RESPONSE_COLUMNS
+            ).execute()
             
             if not update_result.data:
                 raise Exception("No data returned from database update")
@@ -295,4 +291,102 @@ class RecalculateTargetsView(MethodView):
             return jsonify({
                 'error': f'Failed to recalculate targets: {str(e)}'
             }), 500 
-        
\ No newline at end of file
+        
+
+@blp.route("/projection")
+class ProjectionView(MethodView):
+
+    @verify_supabase_token
+    @limiter.limit(RATE_LIMITS['DB_READ'])
+    @conditional_get('projection')
+    @cached_per_user('projection')
+    @bulkhead('DB_READ')
+    def get(self):
+        """Project weight and daily targets over the coming weeks for several goals"""
+        try:
+            user_id = g.current_user['id']
+
+            # Number of weeks to project (default 12)
+            weeks = request.args.get('weeks', 12, type=int)
+            if weeks < 1 or weeks > MAX_PROJECTION_WEEKS:
+                return jsonify({
+                    'error': f'weeks must be between 1 and {MAX_PROJECTION_WEEKS}'
+                }), 400
+
+            # Goals to compare (defaults to all)
+            goals_param = request.args.get('goals')
+            if goals_param:
+                goals = [goal.strip() for goal in goals_param.split(',') if goal.strip()]
+            else:
+                goals = list(NutritionCalculator.GOAL_ADJUSTMENTS)
+
+            invalid_goals = [goal for goal in goals if goal not in NutritionCalculator.GOAL_ADJUSTMENTS]
+            if invalid_goals or not goals:
+                return jsonify({
+                    'error': f'goals must be a comma separated list of: {", ".join(NutritionCalculator.GOAL_ADJUSTMENTS)}'
+                }), 400
+
+            # Optional target weight, in the profile's weight unit
+            target_weight = request.args.get('target_weight', type=float)
+
+            # Shared Supabase client, reuses pooled connections
+            supabase: Client = get_supabase_client()
+
+            profile = get_profile(supabase, user_id)
+
+            if not profile:
+                return jsonify({
+                    'error': 'No profile found for user. Please complete onboarding first.',
+                    'user_id': user_id
+                }), 404
+
+            # Imported on first use, like the calculator's batch paths
+            import numpy as np
+
+            projection = NutritionCalculator.project_from_profile(profile, goals, weeks)
+
+            weights = projection['weight_kg']
+            target_weight_kg = None
+            weeks_to_target = [None] * len(goals)
+            if target_weight is not None:
+                _, target_weight_kg = NutritionCalculator.convert_to_metric(
+                    'metric', 0, None, profile['weight_unit'], target_weight
+                )
+                # First week each trajectory reaches the target weight
+                start_side = np.sign(weights[:, :1] - target_weight_kg)
+                reached = np.sign(weights - target_weight_kg) != start_side
+                reached |= start_side == 0
+                weeks_to_target = [
+                    int(np.argmax(row)) if row.any() else None
+                    for row in reached
+                ]
+
+            scenarios = []
+            for index, goal in enumerate(goals):
+                scenarios.append({
+                    'goal': goal,
+                    'final_weight_kg': round(float(weights[index, -1]), 1),
+                    'total_change_kg': round(float(weights[index, -1] - weights[index, 0]), 1),
+                    'weeks_to_target_weight': weeks_to_target[index],
+                    'weekly': {
+                        'weight_kg': np.round(weights[index], 1).tolist(),
+                        'daily_calories': projection['calories'][index].tolist(),
+                        'protein_g': projection['protein_g'][index].tolist(),
+                        'carbs_g': projection['carbs_g'][index].tolist(),
+                        'fats_g': projection['fats_g'][index].tolist()
+                    }
+                })
+
+            return jsonify({
+                'message': 'Projection calculated successfully',
+                'user_id': user_id,
+                'weeks': weeks,
+                'start_weight_kg': round(float(weights[0, 0]), 1),
+                'target_weight_kg': round(target_weight_kg, 1) if target_weight_kg is not None else None,
+                'scenarios': scenarios
+            }), 200
+
+        except Exception as e:
+            return jsonify({
+                'error': f'Failed to calculate projection: {str(e)}'
+            }), 500
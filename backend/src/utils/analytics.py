@@ -0,0 +1,160 @@
+"""
+Nutrition Analytics
+
+Computes bucketed totals, rolling averages and goal adherence over a date
+range. Food records are converted to columnar NumPy arrays once and every
+statistic is derived with vectorized operations instead of per-day loops.
+"""
+
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Dict, List
+
+if TYPE_CHECKING:
+    import numpy as np
+
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fats')
+GOAL_KEYS = {
+    'calories': 'daily_calories',
+    'protein': 'daily_protein_g',
+    'carbs': 'daily_carbs_g',
+    'fats': 'daily_fats_g',
+}
+GRANULARITIES = ('day', 'week', 'month')
+ROLLING_WINDOW_DAYS = 7
+
+
+def _round_dict(values: 'np.ndarray', digits: int = 2) -> Dict[str, float]:
+    return {nutrient: round(float(value), digits) for nutrient, value in zip(NUTRIENTS, values)}
+
+
+def _percentage(count: 'np.ndarray', total: 'np.ndarray') -> 'np.ndarray':
+    import numpy as np
+
+    return np.divide(count * 100.0, total, out=np.zeros(np.shape(count)), where=total > 0)
+
+
+def compute_range_analytics(
+    foods: List[Dict],
+    user_goals: Dict,
+    start_date: date,
+    end_date: date,
+    granularity: str = 'day'
+) -> Dict:
+    """
+    Compute analytics for a date range
+
+    Args:
+        foods: foods_consumed records with created_at and nutrient columns.
+            Should include the 6 days before start_date so the first rolling
+            averages cover a full window.
+        user_goals: user_profiles record with the daily_* goal columns
+        start_date: First day of the range (inclusive)
+        end_date: Last day of the range (inclusive)
+        granularity: 'day', 'week' (ISO weeks) or 'month'
+
+    Returns:
+        Dictionary with buckets, overall stats and goal hit days
+    """
+    import numpy as np
+
+    # Days of the padded range: rolling window lead-in + requested range
+    padding = ROLLING_WINDOW_DAYS - 1
+    first_day = np.datetime64(start_date - timedelta(days=padding), 'D')
+    total_days = (end_date - start_date).days + 1 + padding
+
+    # Columnar food data: day index + one column per nutrient
+    food_days = np.array([food['created_at'][:10] for food in foods], dtype='datetime64[D]')
+    day_index = (food_days - first_day).astype(np.int64)
+    values = np.array(
+        [[float(food[nutrient]) if food[nutrient] else 0.0 for nutrient in NUTRIENTS] for food in foods],
+        dtype=np.float64
+    ).reshape(-1, len(NUTRIENTS))
+
+    in_range = (day_index >= 0) & (day_index < total_days)
+    day_index, values = day_index[in_range], values[in_range]
+
+    # Daily totals and number of foods per day
+    daily = np.zeros((total_days, len(NUTRIENTS)))
+    np.add.at(daily, day_index, values)
+    food_counts = np.bincount(day_index, minlength=total_days)
+    logged = food_counts > 0
+
+    # Rolling 7-day averages over logged days, via cumulative sums
+    cumulative = np.vstack([np.zeros((1, len(NUTRIENTS))), np.cumsum(daily, axis=0)])
+    cumulative_logged = np.concatenate([[0], np.cumsum(logged)])
+    window_sums = cumulative[ROLLING_WINDOW_DAYS:] - cumulative[:-ROLLING_WINDOW_DAYS]
+    window_logged = cumulative_logged[ROLLING_WINDOW_DAYS:] - cumulative_logged[:-ROLLING_WINDOW_DAYS]
+    rolling = np.divide(
+        window_sums, window_logged[:, None],
+        out=np.zeros_like(window_sums), where=window_logged[:, None] > 0
+    )
+
+    # Drop the lead-in days, everything below covers the requested range
+    daily, logged, food_counts = daily[padding:], logged[padding:], food_counts[padding:]
+    days = first_day + padding + np.arange(len(daily))
+
+    # Goal adherence: a day meets a goal when consumption reaches it. Hit
+    # days are computed here only; the streak is recorded by the app
+    # through /update_streak and is not checked against them
+    goals = np.array([float(user_goals.get(GOAL_KEYS[nutrient]) or 0) for nutrient in NUTRIENTS])
+    goal_met = (daily >= goals) & (goals > 0) & logged[:, None]
+    hit_days = goal_met[:, 0]
+
+    # Bucket assignment
+    if granularity == 'week':
+        weekday = (days.astype(np.int64) + 3) % 7  # Monday = 0
+        bucket_keys = days - weekday
+    elif granularity == 'month':
+        bucket_keys = days.astype('datetime64[M]').astype('datetime64[D]')
+    else:
+        bucket_keys = days
+    bucket_starts, bucket_index = np.unique(bucket_keys, return_inverse=True)
+    bucket_count = len(bucket_starts)
+
+    bucket_totals = np.zeros((bucket_count, len(NUTRIENTS)))
+    np.add.at(bucket_totals, bucket_index, daily)
+    bucket_days = np.bincount(bucket_index, minlength=bucket_count)
+    bucket_logged = np.bincount(bucket_index, weights=logged, minlength=bucket_count)
+    bucket_foods = np.bincount(bucket_index, weights=food_counts, minlength=bucket_count)
+    bucket_goal_met = np.zeros((bucket_count, len(NUTRIENTS)))
+    np.add.at(bucket_goal_met, bucket_index, goal_met)
+    bucket_ends = np.append(np.flatnonzero(np.diff(bucket_index)), len(days) - 1)
+
+    bucket_averages = np.divide(
+        bucket_totals, bucket_logged[:, None],
+        out=np.zeros_like(bucket_totals), where=bucket_logged[:, None] > 0
+    )
+    bucket_adherence = _percentage(bucket_goal_met, bucket_logged[:, None])
+
+    buckets = []
+    for i in range(bucket_count):
+        buckets.append({
+            'start_date': str(bucket_starts[i]),
+            'end_date': str(days[bucket_ends[i]]),
+            'days': int(bucket_days[i]),
+            'logged_days': int(bucket_logged[i]),
+            'foods_consumed_count': int(bucket_foods[i]),
+            'totals': _round_dict(bucket_totals[i]),
+            'daily_average': _round_dict(bucket_averages[i]),
+            'rolling_7_day_average': _round_dict(rolling[bucket_ends[i]]),
+            'goal_adherence_percentage': _round_dict(bucket_adherence[i], 1),
+            'goal_hit_days': int(bucket_goal_met[i, 0])
+        })
+
+    logged_days = int(logged.sum())
+    overall_totals = daily.sum(axis=0)
+
+    return {
+        'buckets': buckets,
+        'overall': {
+            'days': len(days),
+            'logged_days': logged_days,
+            'foods_consumed_count': int(food_counts.sum()),
+            'totals': _round_dict(overall_totals),
+            'daily_average': _round_dict(overall_totals / logged_days if logged_days else np.zeros(len(NUTRIENTS))),
+            'goal_adherence_percentage': _round_dict(_percentage(goal_met.sum(axis=0), logged_days), 1),
+            'goal_hit_days': int(hit_days.sum())
+        },
+        'daily_goals': _round_dict(goals),
+        'hit_days': [str(day) for day in days[hit_days]]
+    }
@@ -1,7 +1,176 @@
+"""
+Supabase JWT Authentication
+
+verify_supabase_token checks the bearer token of a request. Tokens signed
+with the project's JWT secret (HS256) and with Supabase's asymmetric
+signing keys (JWKS) are both supported. Verified claims are cached by
+token digest until the token expires, so a client's repeated requests
+skip signature verification.
+"""
+
 from flask import jsonify, g, request
+import hashlib
+import json
 import jwt
 import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
 from functools import wraps
+from typing import Callable, Dict, Optional
+
+from .timing import phase
+
+# Algorithms accepted for tokens signed with a JWKS key
+ASYMMETRIC_ALGORITHMS = ('RS256', 'ES256')
+
+# Minimum time between two JWKS refetches triggered by unknown key ids
+JWKS_MIN_REFRESH_SECONDS = 60
+
+
+def load_jwks_url(url: str) -> Callable[[], Dict]:
+    """Build a loader fetching a JWKS document over HTTP"""
+    def load():
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return json.loads(response.read())
+    return load
+
+
+def load_jwks_file(path: str) -> Callable[[], Dict]:
+    """Build a loader reading a JWKS document from a local file"""
+    def load():
+        with open(path) as jwks_file:
+            return json.load(jwks_file)
+    return load
+
+
+class JWKSKeyStore:
+    """
+    Signing keys of a JWKS document, by key id.
+
+    The document is loaded on first use. A token with an unknown key id
+    triggers a reload (at most once per JWKS_MIN_REFRESH_SECONDS), which
+    picks up rotated keys.
+    """
+
+    def __init__(self, load: Callable[[], Dict]):
+        self._load = load
+        self._keys = {}
+        self._last_refresh = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        # Count failed attempts too, so an unreachable JWKS endpoint is not
+        # retried on every request
+        self._last_refresh = time.monotonic()
+        jwk_set = jwt.PyJWKSet.from_dict(self._load())
+        self._keys = {key.key_id: key for key in jwk_set.keys}
+
+    def get_key(self, kid: Optional[str]) -> Optional[jwt.PyJWK]:
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+
+        with self._lock:
+            key = self._keys.get(kid)
+            if key is None and (self._last_refresh is None
+                                or time.monotonic() - self._last_refresh >= JWKS_MIN_REFRESH_SECONDS):
+                self.refresh()
+                key = self._keys.get(kid)
+        return key
+
+
+class TokenVerifier:
+    """Verifies Supabase JWTs and caches the verified claims until expiry"""
+
+    def __init__(self):
+        self.secret = None
+        self.jwks = None
+        self.max_entries = 10000
+        self._claims = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.secret = app.config.get('SUPABASE_JWT_SECRET')
+        self.max_entries = app.config.get('AUTH_CACHE_MAX_ENTRIES', 10000)
+
+        jwks_file = app.config.get('SUPABASE_JWKS_FILE')
+        jwks_url = app.config.get('SUPABASE_JWKS_URL')
+        if jwks_file:
+            self.jwks = JWKSKeyStore(load_jwks_file(jwks_file))
+        elif jwks_url:
+            self.jwks = JWKSKeyStore(load_jwks_url(jwks_url))
+
+        app.extensions['token_verifier'] = self
+
+    def decode(self, token: str) -> Dict:
+        """Verify a token's signature, expiry and audience"""
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get('alg')
+
+        if algorithm == 'HS256':
+            if self.secret is None:
+                self.secret = os.getenv('SUPABASE_JWT_SECRET')
+            key = self.secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS and self.jwks is not None:
+            signing_key = self.jwks.get_key(header.get('kid'))
+            if signing_key is None:
+                raise jwt.InvalidTokenError('Unknown signing key')
+            if signing_key.algorithm_name != algorithm:
+                raise jwt.InvalidTokenError('Signing key algorithm mismatch')
+            key = signing_key.key
+        else:
+            raise jwt.InvalidTokenError(f'Unsupported algorithm: {algorithm}')
+
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience='authenticated'
+        )
+
+    def verify(self, token: str) -> Dict:
+        """
+        Get the user of a token, verifying it on a cache miss
+
+        Returns:
+            Dictionary with the user's 'id', 'email' and 'role'
+        """
+        digest = hashlib.sha256(token.encode()).digest()
+
+        with self._lock:
+            entry = self._claims.get(digest)
+            if entry is not None:
+                user, expires_at = entry
+                if expires_at > time.time():
+                    self._claims.move_to_end(digest)
+                    self.hits += 1
+                    return dict(user)
+                del self._claims[digest]
+            self.misses += 1
+
+        payload = self.decode(token)
+        user = {
+            'id': payload.get('sub'),
+            'email': payload.get('email'),
+            'role': payload.get('role', 'authenticated')
+        }
+
+        # Only tokens with an expiry are cached, and never beyond it
+        if payload.get('exp') is not None:
+            with self._lock:
+                self._claims[digest] = (user, float(payload['exp']))
+                while len(self._claims) > self.max_entries:
+                    self._claims.popitem(last=False)
+
+        return dict(user)
+
+
+token_verifier = TokenVerifier()
+
 
 def verify_supabase_token(f):
     """Decorator to verify Supabase JWT tokens"""
@@ -15,24 +184,10 @@ def verify_supabase_token(f):
         token = auth_header.split(' ')[1]
 
         try:
-            # Get JWT secret from environment
-            jwt_secret = os.getenv('SUPABASE_JWT_SECRET')
-            
-            # Verify and decode the JWT token using Supabase JWT secret
-            payload = jwt.decode(
-                token,
-                jwt_secret,
-                algorithms=['HS256'],
-                audience='authenticated'
-            )
-            
             # Store user info in Flask's g object for use in routes
-            g.current_user = {
-                'id': payload.get('sub'),
-                'email': payload.get('email'),
-                'role': payload.get('role', 'authenticated')
-            }
-            
+            with phase('auth'):
+                g.current_user = token_verifier.verify(token)
+
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token has expired'}), 401
         except jwt.InvalidTokenError:
@@ -46,4 +201,4 @@ def verify_supabase_token(f):
         # Call the actual function after successful authentication
         return f(*args, **kwargs)
 
-    return decorated_function 
\ No newline at end of file
+    return decorated_function
@@ -0,0 +1,337 @@
+"""
+Bulkhead Concurrency Pools
+
+Each RATE_LIMITS category gets its own pool of request slots, so slow AI
+analyses and uploads cannot take every worker thread and starve the read
+endpoints. A pool admits up to max_concurrent requests and lets up to
+max_queue more wait for a slot (at most BULKHEAD_QUEUE_TIMEOUT seconds).
+Anything beyond that is rejected right away with a 503, with a
+Retry-After of the time the pool needs to work through its backlog.
+
+Pool sizes default to a share of the worker's serving capacity
+(GUNICORN_THREADS, or WORKER_CONNECTIONS in async mode). Waiting requests
+hold a thread too, so the non-read pools also share a budget of the
+capacity minus a read reserve (BULKHEAD_READ_RESERVE): once their running
+and waiting requests hold the whole budget, further ones are rejected
+even if their own pool has room, and reads always keep the reserve.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Optional
+
+from flask import jsonify, Response
+
+# Default pool sizes as (concurrency share, queue share) of the serving
+# capacity. AI requests spend nearly all of their 5-10s waiting on Gemini,
+# so they get the largest share, and a queue long enough to absorb a burst
+# within BULKHEAD_QUEUE_TIMEOUT. FILE_UPLOAD runs inside AI_ANALYSIS
+# requests, so it takes no threads of its own.
+DEFAULT_BULKHEAD_SHARES = {
+    'AI_ANALYSIS': (0.4, 0.25),
+    'FILE_UPLOAD': (0.25, 0.125),
+    'DB_WRITE': (0.25, 0.125),
+    'DATA_EXPORT': (0.1, 0.0),
+    'DB_READ': (1.0, 0.0),
+}
+
+# Default share of the serving capacity only reads can use
+DEFAULT_READ_RESERVE_SHARE = 0.25
+
+# Pools that hold no threads from the shared budget: reads, and uploads
+# nested in AI_ANALYSIS requests
+UNBUDGETED_CATEGORIES = ('DB_READ', 'FILE_UPLOAD')
+
+
+def default_bulkhead_sizes(capacity: int) -> Dict[str, tuple]:
+    """Get the default (max_concurrent, max_queue) of each pool"""
+    return {
+        category: (max(1, int(capacity * concurrency)), int(capacity * queue))
+        for category, (concurrency, queue) in DEFAULT_BULKHEAD_SHARES.items()
+    }
+
+
+def default_read_reserve(capacity: int) -> int:
+    """Get the default number of request slots reserved for reads"""
+    return max(1, int(capacity * DEFAULT_READ_RESERVE_SHARE))
+
+
+class BulkheadFull(Exception):
+    """Raised when a pool has no free slot and no room in its queue"""
+
+    def __init__(self, category: str, timed_out: bool = False):
+        super().__init__(category)
+        self.category = category
+        self.timed_out = timed_out
+
+
+class LatencyTracker:
+    """Exponentially weighted moving average of an operation's latency"""
+
+    def __init__(self, alpha: float = 0.2, initial: float = 5.0):
+        self.alpha = alpha
+        self.value = initial
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            # The first sample replaces the initial guess
+            if self.samples == 0:
+                self.value = seconds
+            else:
+                self.value += self.alpha * (seconds - self.value)
+            self.samples += 1
+
+
+class ThreadBudget:
+    """Limit on the requests a group of pools holds, running or waiting"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.held = 0
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.held >= self.limit:
+                return False
+            self.held += 1
+            return True
+
+    def give_back(self):
+        with self._lock:
+            self.held -= 1
+
+
+class Bulkhead:
+    """Bounded pool of concurrent request slots with a bounded wait queue"""
+
+    def __init__(self, category: str, max_concurrent: int, max_queue: int, queue_timeout: float,
+                 budget: Optional[ThreadBudget] = None):
+        self.category = category
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.budget = budget
+
+        # How long requests hold a slot
+        self.hold_time = LatencyTracker(initial=1.0)
+
+        self.in_flight = 0
+        self.queued = 0
+        self._cond = threading.Condition()
+
+        # Metrics
+        self.peak_queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self) -> float:
+        """
+        Take a slot, waiting in the queue if the pool is busy
+
+        Returns:
+            Seconds spent waiting for the slot
+        """
+        if self.budget is not None and not self.budget.take():
+            with self._cond:
+                self.rejected += 1
+            raise BulkheadFull(self.category)
+        try:
+            return self._acquire()
+        except BulkheadFull:
+            if self.budget is not None:
+                self.budget.give_back()
+            raise
+
+    def _acquire(self) -> float:
+        with self._cond:
+            if self.in_flight < self.max_concurrent:
+                self.in_flight += 1
+                self.admitted += 1
+                return 0.0
+
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise BulkheadFull(self.category)
+
+            start = time.monotonic()
+            deadline = start + self.queue_timeout
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            try:
+                while self.in_flight >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        raise BulkheadFull(self.category, timed_out=True)
+                    self._cond.wait(remaining)
+            finally:
+                self.queued -= 1
+
+            wait = time.monotonic() - start
+            self.in_flight += 1
+            self.admitted += 1
+            self.waited += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def release(self, held: Optional[float] = None):
+        """Free a slot, recording how many seconds it was held"""
+        if held is not None:
+            self.hold_time.observe(held)
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+        if self.budget is not None:
+            self.budget.give_back()
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot for the duration of a block"""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def is_full(self) -> bool:
+        """Check whether a new request would be rejected right away"""
+        if self.budget is not None and self.budget.held >= self.budget.limit:
+            return True
+        return self.in_flight >= self.max_concurrent and self.queued >= self.max_queue
+
+    def expected_wait(self, latency: Optional[float] = None) -> float:
+        """
+        Seconds a new request would wait for a slot
+
+        Args:
+            latency: Seconds a request holds a slot, defaults to the
+                moving average of the pool's own requests
+        """
+        ahead = self.in_flight + self.queued - self.max_concurrent + 1
+        if ahead <= 0:
+            return 0.0
+        # Every latency period frees about max_concurrent slots
+        latency = self.hold_time.value if latency is None else latency
+        return ahead / self.max_concurrent * latency
+
+    def retry_after(self, latency: Optional[float] = None) -> int:
+        """Seconds until the running and waiting requests are done"""
+        backlog = self.in_flight + self.queued
+        latency = self.hold_time.value if latency is None else latency
+        return max(1, math.ceil(backlog / self.max_concurrent * latency))
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'queue_depth': self.queued,
+                'peak_queue_depth': self.peak_queued,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'avg_wait_ms': round(self.total_wait / self.waited * 1000, 1) if self.waited else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 1),
+            }
+
+
+class BulkheadRegistry:
+    """The process's bulkhead pools, by RATE_LIMITS category"""
+
+    def __init__(self):
+        self.pools = {}
+        self.capacity = None
+        self.budget = None
+
+    def init_app(self, app):
+        self.capacity = app.config['BULKHEAD_CAPACITY']
+        queue_timeout = app.config.get('BULKHEAD_QUEUE_TIMEOUT', 10.0)
+        read_reserve = app.config.get('BULKHEAD_READ_RESERVE', default_read_reserve(self.capacity))
+
+        # The non-read pools share what the read reserve leaves, at least one slot
+        self.budget = ThreadBudget(max(1, self.capacity - read_reserve))
+        self.pools = {
+            category: Bulkhead(
+                category, max_concurrent, max_queue, queue_timeout,
+                budget=None if category in UNBUDGETED_CATEGORIES else self.budget
+            )
+            for category, (max_concurrent, max_queue) in app.config['BULKHEADS'].items()
+        }
+
+        app.extensions['bulkheads'] = self
+
+    def get(self, category: str) -> Bulkhead:
+        return self.pools[category]
+
+    def stats(self) -> Dict:
+        return {category: pool.stats() for category, pool in self.pools.items()}
+
+    def budget_stats(self) -> Dict:
+        return {
+            'limit': self.budget.limit,
+            'held': self.budget.held,
+            'read_reserve': self.capacity - self.budget.limit,
+        }
+
+
+bulkheads = BulkheadRegistry()
+
+
+def busy_response(category: str, retry_after: Optional[int] = None):
+    """503 response for a request rejected by a full pool or the load shedder"""
+    response = jsonify({
+        'error': 'Server is busy, please try again shortly',
+        'category': category
+    })
+    response.status_code = 503
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def bulkhead(category: str):
+    """
+    Decorator running an endpoint in its category's pool.
+
+    Place it below the rate limit and cache decorators, so rate limited
+    requests and cache hits never take a slot. Streamed responses keep
+    their slot until the stream is closed.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            pool = bulkheads.get(category)
+            try:
+                pool.acquire()
+            except BulkheadFull:
+                return busy_response(category, pool.retry_after())
+
+            start = time.monotonic()
+            try:
+                result = f(*args, **kwargs)
+            except BaseException:
+                pool.release(time.monotonic() - start)
+                raise
+
+            response = result[0] if isinstance(result, tuple) else result
+            if isinstance(response, Response) and response.is_streamed:
+                response.call_on_close(lambda: pool.release(time.monotonic() - start))
+            else:
+                pool.release(time.monotonic() - start)
+            return result
+
+        return decorated_function
+    return decorator
@@ -0,0 +1,258 @@
+"""
+Per-User Response Cache
+
+Read-through cache for the read-heavy summary and history endpoints.
+Every cache key is namespaced by a per-user generation counter. Write
+endpoints bump that counter, which makes all of the user's cached entries
+unreachable in O(1); the stale entries simply age out of the backend.
+
+Uses an in-process LRU by default, or Redis when REDIS_URL is set. The
+in-process generations cannot be seen by other workers, so without Redis
+the cache is turned off when WEB_CONCURRENCY > 1.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import g, request, current_app, make_response
+
+from .responses import wants_msgpack
+
+
+class LRUCacheBackend:
+    """Thread-safe in-process LRU cache with per-entry expiry"""
+
+    # Generations live in this process only
+    shared = False
+
+    def __init__(self, max_entries: int = 2048, ttl: int = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # user_id -> (generation, bumped at), oldest bump first. Generations
+        # come from one counter, so a user never gets back a generation that
+        # entries may still be stored under.
+        self._generations = OrderedDict()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: int):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_generation(self, user_id: str) -> str:
+        with self._lock:
+            generation, _ = self._generations.get(user_id, (0, None))
+        return str(generation)
+
+    def bump_generation(self, user_id: str):
+        now = time.monotonic()
+        with self._lock:
+            self._counter += 1
+            self._generations[user_id] = (self._counter, now)
+            self._generations.move_to_end(user_id)
+
+            # Every entry stored before a bump older than the TTL has expired,
+            # so those users can go back to generation 0
+            while self._generations:
+                _, bumped_at = next(iter(self._generations.values()))
+                if bumped_at >= now - self.ttl:
+                    break
+                self._generations.popitem(last=False)
+
+
+class RedisCacheBackend:
+    """Redis-backed cache shared by all processes"""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = 'kalai:cache:'):
+        import redis
+
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._redis.get(self.prefix + key)
+
+    def set(self, key, value, ttl: int):
+        self._redis.setex(self.prefix + key, ttl, value)
+
+    def get_generation(self, user_id: str) -> str:
+        generation = self._redis.get(f"{self.prefix}gen:{user_id}")
+        return generation.decode() if generation else '0'
+
+    def bump_generation(self, user_id: str):
+        self._redis.incr(f"{self.prefix}gen:{user_id}")
+
+    def ping(self):
+        self._redis.ping()
+
+
+class UserCache:
+    """
+    Per-user read-through cache.
+
+    Backend errors never fail a request: reads fall through to the
+    database and writes are skipped.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.enabled = True
+        self.ttl = 300
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('CACHE_TTL_SECONDS', 300)
+        redis_url = app.config.get('CACHE_REDIS_URL')
+
+        if redis_url:
+            try:
+                self.backend = RedisCacheBackend(redis_url)
+            except ImportError:
+                print("Warning: redis package not installed, falling back to in-process cache")
+
+        if self.backend is None:
+            self.backend = LRUCacheBackend(app.config.get('CACHE_MAX_ENTRIES', 2048), self.ttl)
+
+            # A write in one worker would not invalidate the others' entries
+            if app.config.get('WEB_CONCURRENCY', 1) > 1:
+                print("Warning: response cache disabled, it needs REDIS_URL with more than one worker")
+                self.enabled = False
+
+        app.extensions['user_cache'] = self
+
+    @property
+    def shared(self) -> bool:
+        """Whether generations are shared by every process, including CLI commands"""
+        return self.backend is not None and self.backend.shared
+
+    def generation(self, user_id: str) -> str:
+        return self.backend.get_generation(user_id)
+
+    def request_generation(self, user_id: str):
+        """
+        Get the user's generation, read once per request
+
+        Read before the view runs, so a write that lands while it runs makes
+        the stored body unreachable instead of storing the old body under
+        the new generation. None when the backend cannot be reached.
+        """
+        if 'cache_generation' not in g:
+            try:
+                g.cache_generation = self.generation(user_id)
+            except Exception as e:
+                print(f"Warning: Cache read failed: {str(e)}")
+                g.cache_generation = None
+        return g.cache_generation
+
+    def invalidate(self, user_id: str):
+        """Drop every cached entry of a user by bumping their generation"""
+        try:
+            self.backend.bump_generation(user_id)
+        except Exception as e:
+            print(f"Warning: Could not invalidate cache for user {user_id}: {str(e)}")
+
+    def get(self, user_id: str, generation: str, key: str):
+        try:
+            value = self.backend.get(f"{user_id}:{generation}:{key}")
+        except Exception as e:
+            print(f"Warning: Cache read failed: {str(e)}")
+            value = None
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, user_id: str, generation: str, key: str, value: bytes):
+        try:
+            self.backend.set(f"{user_id}:{generation}:{key}", value, self.ttl)
+        except Exception as e:
+            print(f"Warning: Cache write failed: {str(e)}")
+
+
+user_cache = UserCache()
+
+
+def request_cache_key(namespace: str) -> str:
+    """
+    Build the cache key of the current request.
+
+    Includes today's date because endpoints default to "today" when no
+    date parameter is given, and the negotiated body format.
+    """
+    args = urlencode(sorted(request.args.items(multi=True)))
+    representation = 'msgpack' if wants_msgpack() else 'json'
+    return f"{namespace}:{date.today().isoformat()}:{representation}:{args}"
+
+
+def cached_per_user(namespace: str):
+    """Decorator to serve successful JSON responses from the per-user cache"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not user_cache.enabled:
+                return f(*args, **kwargs)
+
+            user_id = g.current_user['id']
+            generation = user_cache.request_generation(user_id)
+            if generation is None:
+                return f(*args, **kwargs)
+
+            key = request_cache_key(namespace)
+            mimetype = 'application/msgpack' if wants_msgpack() else 'application/json'
+
+            cached_body = user_cache.get(user_id, generation, key)
+            if cached_body is not None:
+                return current_app.response_class(cached_body, status=200, mimetype=mimetype)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and response.mimetype == mimetype:
+                user_cache.set(user_id, generation, key, response.get_data())
+
+            return response
+
+        return decorated_function
+    return decorator
+
+
+def invalidates_user_cache(f):
+    """
+    Decorator for write endpoints: bumps the user's cache generation.
+
+    The bump also runs on failures, since some endpoints can fail after a
+    partial write (e.g. photo uploaded but database insert failed).
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            return f(*args, **kwargs)
+        finally:
+            if getattr(g, 'current_user', None):
+                user_cache.invalidate(g.current_user['id'])
+
+    return decorated_function
@@ -0,0 +1,102 @@
+"""
+ETag and Conditional GET Support
+
+Read endpoints get a strong ETag derived from the user's data version
+(the per-user cache generation) and the request parameters. A matching
+If-None-Match is answered with 304 before the view runs, so neither the
+database queries nor the JSON body are built for unchanged data.
+
+Data version ETags need generations every writer can bump, including the
+CLI commands, so they are only used with the Redis cache backend. Without
+it the ETag is a hash of the body: the view still runs, but an unchanged
+body is answered with an empty 304. Bodies with signed photo URLs change
+on every request, so those endpoints get no ETag without Redis.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from flask import g, current_app, make_response, request
+
+from .cache import user_cache, request_cache_key
+from .responses import ENCODING_ETAG_SUFFIXES
+
+# Photo URLs in responses are signed for 1 hour. ETags roll over every half
+# hour so a client revalidating with 304s never holds an expired URL.
+SIGNED_URL_REFRESH_SECONDS = 1800
+
+
+def compute_etag(namespace: str):
+    """Compute the ETag of the current request from the user's data version, None without one"""
+    user_id = g.current_user['id']
+    # The same generation as the response cache, read before the view runs
+    generation = user_cache.request_generation(user_id)
+    if generation is None:
+        return None
+    window = int(time.time() // SIGNED_URL_REFRESH_SECONDS)
+    version = f"{user_id}:{generation}:{request_cache_key(namespace)}:{window}"
+    return hashlib.sha256(version.encode()).hexdigest()[:32]
+
+
+def etag_matches(etag: str) -> bool:
+    """
+    Check If-None-Match against an ETag
+
+    Compressed responses carry the ETag with an encoding suffix; the client
+    caches the decoded body, so those tags match the uncompressed ETag.
+    """
+    if request.if_none_match.contains_weak(etag):
+        return True
+    return any(
+        request.if_none_match.contains_weak(etag + suffix)
+        for suffix in ENCODING_ETAG_SUFFIXES
+    )
+
+
+def _with_etag(response, etag: str):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _body_conditional(rv):
+    """Tag a built response with the hash of its body, 304 if the client has it"""
+    response = make_response(rv)
+    if response.status_code != 200:
+        return response
+
+    etag = hashlib.sha256(response.get_data()).hexdigest()[:32]
+    if etag_matches(etag):
+        response = current_app.response_class(status=304)
+    return _with_etag(response, etag)
+
+
+def conditional_get(namespace: str, signed_urls: bool = False):
+    """
+    Decorator to add ETags to a read endpoint and answer If-None-Match with 304
+
+    Args:
+        namespace: Cache namespace of the endpoint
+        signed_urls: Whether the body embeds signed photo URLs, which rules
+            out the body hash fallback
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag = compute_etag(namespace) if user_cache.shared else None
+            if etag is None:
+                if signed_urls:
+                    return f(*args, **kwargs)
+                return _body_conditional(f(*args, **kwargs))
+
+            if etag_matches(etag):
+                return _with_etag(current_app.response_class(status=304), etag)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            return _with_etag(response, etag)
+
+        return decorated_function
+    return decorator
@@ -0,0 +1,171 @@
+"""
+Image Processing Pool
+
+Decoding and re-encoding uploads with Pillow holds the GIL for tens of
+milliseconds per image, which stalls every other request of the worker.
+Image transforms run instead in a small pool of warm worker processes
+(IMAGE_WORKERS, started by gunicorn's post_worker_init hook). Only bytes
+cross the process boundary: each task decodes the image once and returns
+the encoded results. At most IMAGE_MAX_PENDING tasks may be queued or
+running, further requests are rejected right away.
+
+run() waits for a result from sync code; run_async() returns an
+awaitable for asyncio code. Both go through submit(). With
+IMAGE_WORKERS=0 the transforms run inline in the request thread.
+
+Under gevent workers (SERVING_MODE=async) the process pool's helper
+threads would become greenlets and stall, so run() uses the hub's
+CPU_WORKERS OS threads instead; Pillow releases the GIL in its codecs.
+"""
+
+import io
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Tuple
+
+from .serving import is_async_mode, run_cpu_bound
+
+# Upload re-encoding quality, and quality of the copy sent to Gemini
+STORAGE_WEBP_QUALITY = 50
+PROMPT_WEBP_QUALITY = 80
+
+
+def _encode_webp(image, quality: int) -> bytes:
+    # Ensure compatibility (e.g. remove alpha channel) before saving as WEBP
+    if image.mode in ("RGBA", "P"):
+        image = image.convert("RGB")
+    buffered = io.BytesIO()
+    image.save(buffered, format="WEBP", quality=quality)
+    return buffered.getvalue()
+
+
+def prepare_upload(content: bytes, is_webp: bool) -> Tuple[bytes, bytes]:
+    """
+    Decode an uploaded photo once and encode what the upload needs
+
+    Returns:
+        Tuple of (bytes to store, WEBP bytes for the AI prompt). WEBP
+        uploads are stored as-is.
+    """
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(content))
+    image.load()
+    if image.mode in ("RGBA", "P"):
+        image = image.convert("RGB")
+    stored = content if is_webp else _encode_webp(image, STORAGE_WEBP_QUALITY)
+    return stored, _encode_webp(image, PROMPT_WEBP_QUALITY)
+
+
+def prepare_prompt_image(content: bytes) -> bytes:
+    """Re-encode a stored photo as the WEBP sent to the AI prompt"""
+    from PIL import Image
+
+    return _encode_webp(Image.open(io.BytesIO(content)), PROMPT_WEBP_QUALITY)
+
+
+def _warm_up():
+    # Load Pillow and its WEBP codec before the first real task
+    from PIL import Image, WebPImagePlugin  # noqa: F401
+
+
+class ImagePoolFull(Exception):
+    """Raised when IMAGE_MAX_PENDING tasks are already queued or running"""
+
+
+class ImagePool:
+    """Bounded pool of warm processes for image transforms"""
+
+    def __init__(self, workers: int = 2, max_pending: int = 16):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config.get('IMAGE_WORKERS', 2)
+        self.max_pending = app.config.get('IMAGE_MAX_PENDING', 16)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions['image_pool'] = self
+
+    def start(self):
+        """Start the worker processes and load Pillow in each of them"""
+        if self.workers <= 0 or is_async_mode():
+            return
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the request threads may hold locks that a
+                # forked child would inherit
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_warm_up
+                )
+                for _ in range(self.workers):
+                    self._executor.submit(_warm_up)
+
+    def _submit(self, fn, *args) -> Future:
+        self.start()
+        try:
+            return self._executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); replace the pool once
+            with self._lock:
+                self._executor = None
+            self.start()
+            return self._executor.submit(fn, *args)
+
+    def submit(self, fn, *args) -> Future:
+        """Queue a transform, raising ImagePoolFull if the queue is full"""
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        if not self._slots.acquire(blocking=False):
+            raise ImagePoolFull()
+        try:
+            future = self._submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        """Run a transform and wait for its result"""
+        # Imported here, the worker processes import this module and
+        # should not load Flask
+        from .timing import phase
+
+        if self.workers > 0 and is_async_mode():
+            if not self._slots.acquire(blocking=False):
+                raise ImagePoolFull()
+            try:
+                with phase(f"image.{fn.__name__}"):
+                    return run_cpu_bound(fn, *args)
+            finally:
+                self._slots.release()
+        with phase(f"image.{fn.__name__}"):
+            return self.submit(fn, *args).result()
+
+    def run_async(self, fn, *args):
+        """Run a transform, returning an awaitable of its result"""
+        import asyncio
+
+        return asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+image_pool = ImagePool()
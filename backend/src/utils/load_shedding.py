@@ -0,0 +1,90 @@
+"""
+Load Shedding for the AI Endpoints
+
+During a traffic spike AI requests used to wait in line until gunicorn's
+600s timeout. The load shedder estimates how long a new request would
+wait for an AI_ANALYSIS slot from the pool's in-flight and queued
+requests and a moving average of recent Gemini latency. When the pool
+has no room left, or that wait exceeds AI_WAIT_SLO_SECONDS or the
+pool's BULKHEAD_QUEUE_TIMEOUT, the request is rejected right away with
+a 503 and a Retry-After of the time the pool needs to work through its
+backlog. Only the AI endpoints are shed; reads are always admitted.
+"""
+
+import threading
+from functools import wraps
+from typing import Dict, Optional
+
+from .bulkhead import bulkheads, busy_response, LatencyTracker
+
+
+# Latency of Gemini chat completions, recorded by Model
+gemini_latency = LatencyTracker()
+
+
+class LoadShedder:
+    """Admission control for a bulkhead pool based on its expected wait"""
+
+    def __init__(self, category: str, latency: LatencyTracker, slo: float = 20.0):
+        self.category = category
+        self.latency = latency
+        self.slo = slo
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.slo = app.config.get('AI_WAIT_SLO_SECONDS', 20.0)
+        self.latency.alpha = app.config.get('UPSTREAM_LATENCY_ALPHA', 0.2)
+        if self.latency.samples == 0:
+            self.latency.value = app.config.get('UPSTREAM_LATENCY_INITIAL_SECONDS', 5.0)
+        app.extensions['load_shedder'] = self
+
+    def expected_wait(self) -> float:
+        """Seconds a new request would wait for a slot in the pool"""
+        return bulkheads.get(self.category).expected_wait(self.latency.value)
+
+    def check(self) -> Optional[int]:
+        """
+        Decide whether to admit a new request
+
+        Returns:
+            None to admit it, or the Retry-After in seconds to reject it
+        """
+        pool = bulkheads.get(self.category)
+        # A queued request gives up after the pool's queue timeout
+        max_wait = min(self.slo, pool.queue_timeout)
+        if not pool.is_full() and pool.expected_wait(self.latency.value) <= max_wait:
+            return None
+        with self._lock:
+            self.shed += 1
+        return pool.retry_after(self.latency.value)
+
+    def stats(self) -> Dict:
+        return {
+            'category': self.category,
+            'wait_slo_seconds': self.slo,
+            'expected_wait_seconds': round(self.expected_wait(), 2),
+            'upstream_latency_seconds': round(self.latency.value, 3),
+            'upstream_latency_samples': self.latency.samples,
+            'shed': self.shed,
+        }
+
+
+ai_load_shedder = LoadShedder('AI_ANALYSIS', gemini_latency)
+
+
+def sheds_load(f):
+    """
+    Decorator rejecting AI requests whose expected wait exceeds the SLO.
+
+    Place it above the rate limit decorator, so shed requests do not use
+    up the client's quota.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        retry_after = ai_load_shedder.check()
+        if retry_after is not None:
+            return busy_response(ai_load_shedder.category, retry_after)
+        return f(*args, **kwargs)
+
+    return decorated_function
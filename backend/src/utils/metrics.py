@@ -0,0 +1,327 @@
+"""
+Prometheus Metrics
+
+GET /metrics returns the process's metrics in the Prometheus text format:
+- requests, server errors, latency histograms and in-flight requests per
+  route, and rate limit rejections
+- latency histograms and errors of upstream calls: each Supabase table or
+  function, Storage operations and Gemini
+- cache lookups and hit ratios, bulkhead pools and AI load shedding
+
+Request and upstream metrics are aggregated in memory as they happen,
+behind one lock per metric, so any number of request threads can update
+them. Everything else is read from the components' own counters when
+scraped. Metrics are per process: with WEB_CONCURRENCY > 1 each scrape
+sees the worker that served it. /metrics and /bulkhead-info are only
+served when METRICS_TOKEN is set, and require it as a bearer token.
+"""
+
+import hmac
+import math
+import threading
+import time
+from functools import wraps
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import g, jsonify, request
+
+from .auth import token_verifier
+from .bulkhead import bulkheads
+from .cache import user_cache
+from .load_shedding import ai_load_shedder, gemini_latency
+from .profile_cache import profile_cache
+from .timing import upstream_phase
+
+# Latency buckets in seconds, from cached reads to slow Gemini calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PREFIX = 'kalai_'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """A metric family with a fixed set of label names"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+            for labels, value in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # Per label values: [count per bucket..., sum, count]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+
+        lines = self.header()
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket_labels = _format_labels(self.labels + ('le',), labels + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels + ('le',), labels + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {series[-1]}")
+        return lines
+
+
+class Snapshot(Metric):
+    """Metric read from another component when scraped"""
+
+    def __init__(self, name, help, labels=(), kind='gauge', collect=None):
+        super().__init__(name, help, labels)
+        self.kind = kind
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+            for labels, value in self.collect()
+        ]
+
+
+def upstream_labels(method: str, path: str) -> Tuple[str, str]:
+    """(service, operation) of a Supabase HTTP call, e.g. ('supabase', 'foods_consumed')"""
+    service, _, operation = upstream_phase(method, path).partition('.')
+    return ('supabase' if service == 'db' else service), operation
+
+
+class Metrics:
+    """The process's metrics and the request hooks that record them"""
+
+    def __init__(self):
+        self.enabled = False
+        self.token = None
+        self.requests = Counter('http_requests_total', 'Requests by route, method and status',
+                                ('route', 'method', 'status'))
+        self.errors = Counter('http_request_errors_total', 'Requests that failed with a 5xx or an exception',
+                              ('route', 'method'))
+        self.latency = Histogram('http_request_duration_seconds', 'Request latency by route',
+                                 ('route', 'method'))
+        self.in_flight = Gauge('http_requests_in_flight', 'Requests being served by route', ('route',))
+        self.rate_limited = Counter('rate_limit_rejections_total', 'Requests rejected with 429 by route',
+                                    ('route',))
+        self.upstream_latency = Histogram('upstream_request_duration_seconds',
+                                          'Latency of Supabase, Storage and Gemini calls',
+                                          ('service', 'operation'))
+        self.upstream_errors = Counter('upstream_request_errors_total',
+                                       'Upstream calls that returned an error status, or failed without '
+                                       'a response (status="error": connection errors, timeouts)',
+                                       ('service', 'operation', 'status'))
+        self.snapshots: List[Snapshot] = []
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.token = app.config.get('METRICS_TOKEN')
+        if self.enabled:
+            app.before_request(self._start)
+            app.after_request(self._record_status)
+            app.teardown_request(self._finish)
+            self.snapshots = self._component_snapshots()
+        app.extensions['metrics'] = self
+
+    # ===== Requests =====
+
+    @staticmethod
+    def _route() -> str:
+        # The rule, not the path, keeps the label values bounded
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    def _start(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_route = self._route()
+        self.in_flight.inc(g.metrics_route)
+
+    def _record_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _finish(self, exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        route = g.pop('metrics_route')
+        status = g.pop('metrics_status', 500)
+        self.in_flight.dec(route)
+
+        self.requests.inc(route, request.method, str(status))
+        self.latency.observe(time.perf_counter() - start, route, request.method)
+        if status >= 500 or exc is not None:
+            self.errors.inc(route, request.method)
+        if status == 429:
+            self.rate_limited.inc(route)
+
+    # ===== Upstream calls =====
+
+    def observe_upstream(self, service: str, operation: str, seconds: float, error_status: Optional[str] = None):
+        """Record an upstream call; error_status is the HTTP status of a failed call, or 'error' without a response"""
+        if not self.enabled:
+            return
+        self.upstream_latency.observe(seconds, service, operation)
+        if error_status is not None:
+            self.upstream_errors.inc(service, operation, error_status)
+
+    # ===== Scrape =====
+
+    def _component_snapshots(self) -> List[Snapshot]:
+        caches = {'responses': user_cache, 'profiles': profile_cache, 'tokens': token_verifier}
+
+        def pool_stat(stat):
+            return lambda: [((category,), stats[stat]) for category, stats in bulkheads.stats().items()]
+
+        return [
+            Snapshot('cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result'), 'counter',
+                     lambda: [((name, result), value) for name, cache in caches.items()
+                              for result, value in (('hit', cache.hits), ('miss', cache.misses))]),
+            Snapshot('cache_hit_ratio', 'Share of cache lookups that were hits', ('cache',), 'gauge',
+                     lambda: [((name,), cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else 0.0)
+                              for name, cache in caches.items()]),
+            Snapshot('bulkhead_in_flight', 'Requests holding a slot of the pool', ('category',),
+                     collect=pool_stat('in_flight')),
+            Snapshot('bulkhead_queue_depth', 'Requests waiting for a slot of the pool', ('category',),
+                     collect=pool_stat('queue_depth')),
+            Snapshot('bulkhead_rejected_total', 'Requests rejected by a full pool', ('category',), 'counter',
+                     pool_stat('rejected')),
+            Snapshot('bulkhead_timed_out_total', 'Requests that waited too long for a slot', ('category',), 'counter',
+                     pool_stat('timed_out')),
+            Snapshot('ai_requests_shed_total', 'AI requests rejected by the load shedder', (), 'counter',
+                     lambda: [((), ai_load_shedder.shed)]),
+            Snapshot('gemini_latency_average_seconds', 'Moving average of Gemini latency used for load shedding',
+                     collect=lambda: [((), gemini_latency.value)]),
+        ]
+
+    def render(self) -> str:
+        metrics = [self.requests, self.errors, self.latency, self.in_flight, self.rate_limited,
+                   self.upstream_latency, self.upstream_errors] + self.snapshots
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def _on_request(http_request):
+    http_request.extensions['metrics_start'] = time.perf_counter()
+
+
+def _on_response(http_response):
+    start = http_response.request.extensions.get('metrics_start')
+    if start is None or not metrics.enabled:
+        return
+    # Read the body here so the latency includes its transfer
+    http_response.read()
+    service, operation = upstream_labels(http_response.request.method, http_response.request.url.path)
+    error_status = str(http_response.status_code) if http_response.status_code >= 400 else None
+    metrics.observe_upstream(service, operation, time.perf_counter() - start, error_status)
+
+
+def observe_http_client(client):
+    """Record the latency and errors of each call of an httpx client"""
+    client.event_hooks['request'].append(_on_request)
+    client.event_hooks['response'].append(_on_response)
+
+    # Response hooks do not run when a call fails without a response, so
+    # connection errors and timeouts are counted around send
+    send = client.send
+
+    @wraps(send)
+    def observed_send(http_request, **kwargs):
+        try:
+            return send(http_request, **kwargs)
+        except Exception:
+            start = http_request.extensions.get('metrics_start')
+            if start is not None and metrics.enabled:
+                service, operation = upstream_labels(http_request.method, http_request.url.path)
+                metrics.observe_upstream(service, operation, time.perf_counter() - start, 'error')
+            raise
+
+    client.send = observed_send
+
+
+def requires_metrics_token(f):
+    """
+    Decorator for the operational endpoints (metrics, pool stats).
+
+    They reveal traffic and capacity, so they are not served at all
+    without METRICS_TOKEN and otherwise require it as a bearer token.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not metrics.token:
+            return jsonify({'error': 'Not found'}), 404
+        expected = f"Bearer {metrics.token}".encode()
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected):
+            return jsonify({'error': 'Missing or invalid authorization header'}), 401
+        return f(*args, **kwargs)
+
+    return decorated_function
@@ -1,31 +1,64 @@
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
-from .prompt_generator import PromptGenerator
+import threading
+import time
+from .load_shedding import gemini_latency
+from .metrics import metrics
+from .timing import phase, server_timing
+
+DEFAULT_GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+
+# One client per process, so connections to Gemini are reused across requests
+_gemini_client = None
+_gemini_client_lock = threading.Lock()
+
+
+def get_shared_gemini_client():
+    """Get the process-wide Gemini client, creating it on first use"""
+    global _gemini_client
+    if _gemini_client is None:
+        with _gemini_client_lock:
+            if _gemini_client is None:
+                with phase('client-setup'):
+                    # Imported here, the openai package is slow to import
+                    from openai import OpenAI
+
+                    _gemini_client = OpenAI(
+                        api_key=os.getenv('GEMINI_API_KEY', ''),
+                        base_url=os.getenv('GEMINI_BASE_URL', DEFAULT_GEMINI_BASE_URL)
+                    )
+    return _gemini_client
 
-load_dotenv() 
 
 class Model:
     def __init__(self):
-        self.gemini_api_key = os.getenv('GEMINI_API_KEY', '')
         self.gemini_client = self.get_gemini_client()
 
     def get_gemini_client(self):
-        return OpenAI(
-            api_key=self.gemini_api_key,
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-        )
+        return get_shared_gemini_client()
     
     def gemini_chat_completion(self, messages):
         
         # ===== Generate Response =====
-        response = self.gemini_client.chat.completions.create(
-            model="gemini-2.0-flash",
-            messages=messages,
-            temperature=0.0,
-            stream=False,
-            response_format={"type": "json_object"}
-        )
+        # Failed and timed out calls count too, they held a slot as long
+        start = time.monotonic()
+        error_status = None
+        try:
+            response = self.gemini_client.chat.completions.create(
+                model="gemini-2.0-flash",
+                messages=messages,
+                temperature=0.0,
+                stream=False,
+                response_format={"type": "json_object"}
+            )
+        except Exception as e:
+            # API errors carry their HTTP status, connection errors and timeouts do not
+            error_status = str(getattr(e, 'status_code', None) or 'error')
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            gemini_latency.observe(elapsed)
+            server_timing.record('gemini', elapsed)
+            metrics.observe_upstream('gemini', 'chat.completions', elapsed, error_status)
 
         return response.choices[0].message.content
     
\ No newline at end of file
@@ -6,9 +6,13 @@ Uses the Mifflin-St Jeor equation for BMR calculation.
 """
 
 from datetime import date
-from typing import Dict, Tuple, Optional
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple, Optional
 from dataclasses import dataclass
 
+# NumPy is imported on first use, only the batch and projection paths need it
+if TYPE_CHECKING:
+    import numpy as np
+
 
 @dataclass
 class DailyTargets:
@@ -45,6 +49,9 @@ class NutritionCalculator:
         'gain_weight': 1.6,      # Standard for weight gain
     }
     
+    # Energy content of one kg of body weight change (kcal)
+    ENERGY_PER_KG = 7700
+    
     # Macronutrient ratios by dietary preference
     MACRO_RATIOS = {
         'no_restrictions': {'protein': 0.25, 'fat': 0.25, 'carb': 0.50},
@@ -227,6 +234,242 @@ class NutritionCalculator:
             dietary_preference=profile_data['dietary_preference']
         )
 
+    
+    @staticmethod
+    def _lookup(values: Sequence[str], mapping: Dict[str, float], default: float) -> 'np.ndarray':
+        """Map an array of category names to their values (unknown names get the default)"""
+        import numpy as np
+
+        categories, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        table = np.array([mapping.get(category, default) for category in categories], dtype=float)
+        return table[inverse.reshape(-1)]
+    
+    @staticmethod
+    def _round(values: 'np.ndarray', ndigits: int) -> 'np.ndarray':
+        """
+        Round like the built-in round()
+
+        np.round scales by 10**ndigits first, which can resolve values next
+        to a .5 tie differently, so those few values are rounded one by one.
+        """
+        import numpy as np
+
+        rounded = np.round(values, ndigits)
+        scaled = values * 10 ** ndigits
+        near_tie = np.flatnonzero(np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6)
+        for index in near_tie:
+            rounded[index] = round(float(values[index]), ndigits)
+        return rounded
+    
+    @staticmethod
+    def calculate_ages(dates_of_birth: Sequence, as_of: date) -> 'np.ndarray':
+        """Calculate the ages of an array of dates of birth (dates or ISO strings)"""
+        import numpy as np
+
+        birth_days = np.asarray(dates_of_birth, dtype='datetime64[D]')
+        birth_months = birth_days.astype('datetime64[M]')
+        
+        birth_year = birth_days.astype('datetime64[Y]').astype(int) + 1970
+        birth_month = birth_months.astype(int) % 12 + 1
+        birth_day = (birth_days - birth_months).astype(int) + 1
+        
+        before_birthday = (birth_month > as_of.month) | ((birth_month == as_of.month) & (birth_day > as_of.day))
+        return as_of.year - birth_year - before_birthday.astype(int)
+    
+    @classmethod
+    def calculate_daily_targets_batch(
+        cls,
+        columns: Dict[str, Sequence],
+        as_of: Optional[date] = None
+    ) -> Dict[str, 'np.ndarray']:
+        """
+        Calculate daily nutrition targets for many profiles at once
+        
+        Vectorized version of calculate_daily_targets with the same formulas
+        and rounding.
+        
+        Args:
+            columns: Dictionary of equal length sequences, keyed by the
+                argument names of calculate_daily_targets
+            as_of: Date the ages are calculated for (defaults to today)
+        
+        Returns:
+            Dictionary with 'calories', 'protein_g', 'carbs_g' and 'fats_g' arrays
+        """
+        import numpy as np
+
+        as_of = as_of or date.today()
+        
+        # Calculate ages
+        age = cls.calculate_ages(columns['date_of_birth'], as_of)
+        
+        # Convert measurements to metric
+        height_value = np.asarray(columns['height_value'], dtype=float)
+        height_inches = np.array([inches or 0 for inches in columns['height_inches']], dtype=float)
+        imperial_height = np.asarray(columns['height_unit'], dtype=str) == 'imperial'
+        height_cm = np.where(imperial_height, (height_value * 12 + height_inches) * 2.54, height_value)
+        
+        weight_value = np.asarray(columns['weight_value'], dtype=float)
+        imperial_weight = np.asarray(columns['weight_unit'], dtype=str) == 'imperial'
+        weight_kg = np.where(imperial_weight, weight_value * 0.453592, weight_value)
+        
+        # Calculate BMR (Mifflin-St Jeor)
+        male = np.asarray(columns['gender'], dtype=str) == 'male'
+        bmr = 10 * weight_kg + 6.25 * height_cm - 5 * age + np.where(male, 5, -161)
+        
+        # Maintenance calories adjusted for goal
+        activity_multiplier = cls._lookup(columns['activity_level'], cls.ACTIVITY_MULTIPLIERS, 1.2)
+        goal_adjustment = cls._lookup(columns['main_goal'], cls.GOAL_ADJUSTMENTS, 1.0)
+        daily_calories = bmr * activity_multiplier * goal_adjustment
+        
+        # Calculate macronutrient targets
+        default_ratios = cls.MACRO_RATIOS['no_restrictions']
+        protein_ratio, fat_ratio = (
+            cls._lookup(
+                columns['dietary_preference'],
+                {preference: ratios[macro] for preference, ratios in cls.MACRO_RATIOS.items()},
+                default_ratios[macro]
+            )
+            for macro in ('protein', 'fat')
+        )
+        min_protein_g = weight_kg * cls._lookup(columns['main_goal'], cls.PROTEIN_REQUIREMENTS, 1.6)
+        
+        protein_g = np.maximum(min_protein_g, daily_calories * protein_ratio / 4)
+        fats_g = daily_calories * fat_ratio / 9
+        carbs_g = np.maximum(0, (daily_calories - protein_g * 4 - fats_g * 9) / 4)
+        
+        return {
+            'calories': cls._round(daily_calories, 0).astype(int),
+            'protein_g': cls._round(protein_g, 1),
+            'carbs_g': cls._round(carbs_g, 1),
+            'fats_g': cls._round(fats_g, 1)
+        }
+    
+    @classmethod
+    def calculate_from_profiles(cls, profiles: List[Dict], as_of: Optional[date] = None) -> Dict[str, 'np.ndarray']:
+        """
+        Calculate daily targets for a list of user profile dictionaries
+        
+        Returns:
+            Dictionary of target arrays, in the order of the profiles
+        """
+        columns = {
+            column: [profile.get(column) for profile in profiles]
+            for column in PROFILE_TARGET_COLUMNS
+        }
+        return cls.calculate_daily_targets_batch(columns, as_of)
+
+    
+    @classmethod
+    def project_from_profile(
+        cls,
+        profile_data: Dict,
+        goals: Sequence[str],
+        weeks: int,
+        as_of: Optional[date] = None
+    ) -> Dict[str, 'np.ndarray']:
+        """
+        Project weight and daily targets week by week for several goals
+        
+        Each week the user eats the daily target calculated from their
+        weight at the start of the week. The energy gap to maintenance
+        changes their weight by gap / ENERGY_PER_KG, which in turn moves
+        BMR and the next week's target. Age is held constant.
+        
+        With Mifflin-St Jeor this is the linear recurrence
+            W[w+1] = W[w] + k * (10 * W[w] + c)
+        with k = 7 * (goal_adjustment - 1) * activity_multiplier / ENERGY_PER_KG
+        and c the non-weight part of BMR, solved in closed form for all
+        goals and weeks at once.
+        
+        Args:
+            profile_data: Dictionary with the profile's target columns
+            goals: Main goals to compare
+            weeks: Number of weeks to project
+            as_of: Date the age is calculated for (defaults to today)
+        
+        Returns:
+            Dictionary with 'weight_kg' (goals x weeks + 1, week 0 is now)
+            and 'calories', 'protein_g', 'carbs_g', 'fats_g' (goals x weeks)
+        """
+        import numpy as np
+
+        as_of = as_of or date.today()
+        
+        age = int(cls.calculate_ages([profile_data['date_of_birth']], as_of)[0])
+        height_cm, weight_kg = cls.convert_to_metric(
+            profile_data['height_unit'],
+            float(profile_data['height_value']),
+            profile_data.get('height_inches'),
+            profile_data['weight_unit'],
+            float(profile_data['weight_value'])
+        )
+        
+        # BMR = 10 * weight + c
+        c = cls.calculate_bmr(profile_data['gender'], 0, height_cm, age)
+        activity_multiplier = cls.ACTIVITY_MULTIPLIERS.get(profile_data['activity_level'], 1.2)
+        goal_adjustment = np.array([cls.GOAL_ADJUSTMENTS.get(goal, 1.0) for goal in goals])
+        
+        # W[w] = W* + (W[0] - W*) * r ** w with fixed point W* = -c / 10
+        k = 7 * (goal_adjustment - 1) * activity_multiplier / cls.ENERGY_PER_KG
+        r = 1 + 10 * k
+        fixed_point = -c / 10
+        week_index = np.arange(weeks + 1)
+        weights = fixed_point + (weight_kg - fixed_point) * r[:, np.newaxis] ** week_index[np.newaxis, :]
+        
+        # Targets of every goal and week, from the weight at the start of the week
+        cells = len(goals) * weeks
+        targets = cls.calculate_daily_targets_batch({
+            'gender': [profile_data['gender']] * cells,
+            'activity_level': [profile_data['activity_level']] * cells,
+            'height_unit': ['metric'] * cells,
+            'height_value': np.full(cells, height_cm),
+            'height_inches': [0] * cells,
+            'weight_unit': ['metric'] * cells,
+            'weight_value': weights[:, :-1].ravel(),
+            'date_of_birth': [profile_data['date_of_birth']] * cells,
+            'main_goal': np.repeat(np.asarray(goals, dtype=str), weeks),
+            'dietary_preference': [profile_data['dietary_preference']] * cells
+        }, as_of)
+        
+        projection = {name: values.reshape(len(goals), weeks) for name, values in targets.items()}
+        projection['weight_kg'] = weights
+        return projection
+
+
+# Profile columns the daily targets are calculated from
+PROFILE_TARGET_COLUMNS = (
+    'gender', 'activity_level', 'height_unit', 'height_value', 'height_inches',
+    'weight_unit', 'weight_value', 'date_of_birth', 'main_goal', 'dietary_preference'
+)
+
+# Target columns without a default; main_goal, dietary_preference and
+# height_inches fall back to defaults like in the scalar path
+REQUIRED_TARGET_COLUMNS = (
+    'gender', 'activity_level', 'height_unit', 'height_value',
+    'weight_unit', 'weight_value', 'date_of_birth'
+)
+
+
+def has_target_inputs(profile: Dict) -> bool:
+    """
+    Check whether targets can be calculated from a profile
+
+    Incomplete profiles (e.g. onboarding not finished) would turn into NaN
+    in the batch calculation.
+    """
+    if profile.get('onboarding_completed') is False:
+        return False
+    if any(profile.get(column) in (None, '') for column in REQUIRED_TARGET_COLUMNS):
+        return False
+    try:
+        if float(profile['height_value']) <= 0 or float(profile['weight_value']) <= 0:
+            return False
+        date.fromisoformat(str(profile['date_of_birth'])[:10])
+    except ValueError:
+        return False
+    return True
+
 
 # Example usage and helper functions
 def example_calculation():
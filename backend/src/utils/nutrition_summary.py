@@ -0,0 +1,128 @@
+"""
+Nutrition Summary Helpers
+
+Shared food formatting and daily aggregation used by the history, summary
+and dashboard endpoints, so every endpoint returns the same shapes.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+# Signed photo URLs expire after 1 hour
+SIGNED_URL_EXPIRY_SECONDS = 3600
+
+
+def signed_photo_url(supabase, photo_path: str) -> Optional[str]:
+    """Create a signed URL for a single food photo"""
+    try:
+        photo_url_response = supabase.storage.from_('food-images').create_signed_url(photo_path, SIGNED_URL_EXPIRY_SECONDS)
+
+        # Handle different possible response structures
+        if isinstance(photo_url_response, dict):
+            return photo_url_response.get('signedURL') or photo_url_response.get('signedUrl')
+        elif isinstance(photo_url_response, str):
+            return photo_url_response
+        return None
+
+    except Exception as e:
+        print(f"Warning: Could not generate signed URL for photo {photo_path}: {str(e)}")
+        return None
+
+
+def signed_photo_urls(supabase, photo_paths: Iterable[str]) -> Dict[str, Optional[str]]:
+    """
+    Create signed URLs for many food photos in a single Storage call
+
+    Falls back to signing each photo separately if the batch call fails
+    (e.g. one of the objects no longer exists).
+
+    Returns:
+        Dictionary mapping photo path to signed URL
+    """
+    paths = [path for path in dict.fromkeys(photo_paths) if path]
+    if not paths:
+        return {}
+
+    try:
+        responses = supabase.storage.from_('food-images').create_signed_urls(paths, SIGNED_URL_EXPIRY_SECONDS)
+        return {
+            item['path']: item.get('signedURL') or item.get('signedUrl')
+            for item in responses
+        }
+    except Exception as e:
+        print(f"Warning: Batch photo signing failed, signing individually: {str(e)}")
+        return {path: signed_photo_url(supabase, path) for path in paths}
+
+
+def format_food(food: Dict, photo_url: Optional[str] = None) -> Dict:
+    """Format a foods_consumed record for API responses"""
+    # Use stored nutritional values (do not multiply by portion)
+    base_protein = float(food['protein']) if food['protein'] else 0
+    base_carbs = float(food['carbs']) if food['carbs'] else 0
+    base_fats = float(food['fats']) if food['fats'] else 0
+    base_calories = float(food['calories']) if food['calories'] else 0
+
+    return {
+        'id': food['id'],
+        'name': food['name'],
+        'emoji': food['emoji'],
+        'protein': round(base_protein, 2),
+        'carbs': round(base_carbs, 2),
+        'fats': round(base_fats, 2),
+        'calories': round(base_calories, 2),
+        'portion': float(food.get('portion')),
+        'photo_url': photo_url,
+        'created_at': food['created_at']
+    }
+
+
+def format_foods(supabase, foods: List[Dict]) -> List[Dict]:
+    """Format foods_consumed records, signing all of their photos in one call"""
+    photo_urls = signed_photo_urls(supabase, (food.get('photo_path') for food in foods))
+    return [format_food(food, photo_urls.get(food.get('photo_path'))) for food in foods]
+
+
+def goal_values(user_goals: Dict) -> Dict[str, float]:
+    """Read daily goals from a user_profiles record (handle None values)"""
+    return {
+        'calories': float(user_goals['daily_calories']) if user_goals['daily_calories'] else 0,
+        'protein': float(user_goals['daily_protein_g']) if user_goals['daily_protein_g'] else 0,
+        'carbs': float(user_goals['daily_carbs_g']) if user_goals['daily_carbs_g'] else 0,
+        'fats': float(user_goals['daily_fats_g']) if user_goals['daily_fats_g'] else 0
+    }
+
+
+def summarize_day(foods: List[Dict], user_goals: Dict) -> Dict:
+    """
+    Summarize consumed foods of one day against the user's daily goals
+
+    Returns:
+        Dictionary with consumed, goal, remaining and percentage values
+    """
+    goals = goal_values(user_goals)
+    consumed = {'calories': 0, 'protein': 0, 'carbs': 0, 'fats': 0}
+
+    for food in foods:
+        # Do NOT multiply by portion; just sum the stored values
+        for nutrient in consumed:
+            consumed[nutrient] += float(food[nutrient]) if food[nutrient] else 0
+
+    return {
+        'consumed_today': {
+            nutrient: round(value, 2) for nutrient, value in consumed.items()
+        },
+        'daily_goals': {
+            nutrient: round(value, 2) for nutrient, value in goals.items()
+        },
+        # Remaining amounts can be negative if exceeded
+        'remaining_to_goal': {
+            nutrient: round(goals[nutrient] - consumed[nutrient], 2) for nutrient in consumed
+        },
+        'progress_percentage': {
+            nutrient: round((consumed[nutrient] / goals[nutrient] * 100) if goals[nutrient] > 0 else 0, 1)
+            for nutrient in consumed
+        },
+        'foods_consumed_count': len(foods),
+        'goals_status': {
+            f'{nutrient}_exceeded': consumed[nutrient] > goals[nutrient] for nutrient in consumed
+        }
+    }
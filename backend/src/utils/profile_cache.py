@@ -0,0 +1,112 @@
+"""
+Per-Process Profile Cache
+
+Short-lived cache of user_profiles rows, shared by every endpoint that
+needs a user's goals or streak fields. Write endpoints that change the
+profile invalidate the entry; other processes see the change once their
+own entry expires (PROFILE_CACHE_TTL_SECONDS).
+
+Entries also carry the response cache generation of the request that
+stored them. Read endpoints skip entries from another generation, so a
+body built from a stale profile never gets the ETag of newer data.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Optional
+
+from flask import g, has_request_context
+
+
+class ProfileCache:
+    """Thread-safe LRU of profile rows with a short per-entry TTL"""
+
+    def __init__(self, max_entries: int = 4096, ttl: int = 30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('PROFILE_CACHE_MAX_ENTRIES', 4096)
+        self.ttl = app.config.get('PROFILE_CACHE_TTL_SECONDS', 30)
+        app.extensions['profile_cache'] = self
+
+    def get(self, user_id: str, generation: Optional[str] = None) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            profile, expires_at, stored_generation = entry
+            if expires_at < time.monotonic() or (generation is not None and stored_generation != generation):
+                del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(profile)
+
+    def set(self, user_id: str, profile: Dict, generation: Optional[str] = None):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (dict(profile), time.monotonic() + self.ttl, generation)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+profile_cache = ProfileCache()
+
+
+def get_profile(supabase, user_id: str, generation: Optional[str] = None) -> Optional[Dict]:
+    """
+    Get a user's profile row, from the cache when possible
+
+    Args:
+        generation: Response cache generation of the request, read from the
+            request when not given (pass it from executor threads)
+
+    Returns:
+        The full user_profiles row, or None if the user has no profile
+    """
+    if generation is None and has_request_context():
+        generation = g.get('cache_generation')
+
+    profile = profile_cache.get(user_id, generation)
+    if profile is not None:
+        return profile
+
+    result = supabase.table('user_profiles') \
+        .select('*') \
+        .eq('user_id', user_id) \
+        .execute()
+
+    # Missing profiles are not cached, onboarding creates them right away
+    if not result.data:
+        return None
+
+    profile_cache.set(user_id, result.data[0], generation)
+    return dict(result.data[0])
+
+
+def invalidates_profile_cache(f):
+    """Decorator for endpoints that write the user's profile row"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            return f(*args, **kwargs)
+        finally:
+            if getattr(g, 'current_user', None):
+                profile_cache.invalidate(g.current_user['id'])
+
+    return decorated_function
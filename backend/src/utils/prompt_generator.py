@@ -1,18 +1,12 @@
 import base64
-import io
 
 class PromptGenerator:
     def __init__(self):
         pass
 
-    def consumed_food_prompt(self, image):
-        buffered = io.BytesIO()
-        # Convert to RGB if needed (WEBP does not support P or RGBA in some cases for encoding without alpha)
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
-        # Save as WEBP with moderate compression to make payload smaller
-        image.save(buffered, format="WEBP", quality=80)
-        img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+    def consumed_food_prompt(self, image_webp: bytes):
+        # image_webp is encoded off the request thread, see image_pool.py
+        img_base64 = base64.b64encode(image_webp).decode('utf-8')
 
         # ===== Create User Prompt =====
         current_user_prompt = [
@@ -56,14 +50,9 @@ class PromptGenerator:
 
         return messages
     
-    def consumed_food_prompt_with_description(self, image, text_description):
-        buffered = io.BytesIO()
-        # Convert to RGB if needed (WEBP does not support P or RGBA in some cases for encoding without alpha)
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
-        # Save as WEBP with moderate compression to make payload smaller
-        image.save(buffered, format="WEBP", quality=80)
-        img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+    def consumed_food_prompt_with_description(self, image_webp: bytes, text_description):
+        # image_webp is encoded off the request thread, see image_pool.py
+        img_base64 = base64.b64encode(image_webp).decode('utf-8')
 
         # ===== Create User Prompt =====
         current_user_prompt = [
@@ -0,0 +1,163 @@
+"""
+Hybrid Rate Limit Storage
+
+Two-tier storage for Flask-Limiter. Each process counts hits locally and
+adds them to the shared store (Redis) in the background every
+sync_interval seconds, so most rate-limited requests never wait for a
+network round trip.
+
+Accuracy bound: a process holds at most max_unsynced_hits unsynced hits
+per key. Once a key reaches it, the next hit syncs inline. With N
+processes the shared count lags the true count by at most
+N * max_unsynced_hits per key, so a client can exceed a limit by at most
+that much. max_unsynced_hits=0 makes every hit synchronous.
+
+Keys containing STRICT_KEY_MARKER are always checked against the shared
+store (see get_strict_user_id in rate_limiter.py).
+
+Enabled with a storage URI of the form hybrid+<shared storage URI>, e.g.
+hybrid+redis://localhost:6379.
+"""
+
+import math
+import threading
+import time
+
+from limits.storage import Storage, storage_from_string
+
+# Marker in rate limit keys that must bypass the local tier
+STRICT_KEY_MARKER = 'strict:'
+
+
+class _LocalCounter:
+    """Shared count of a key as of the last sync, plus local unsynced hits"""
+
+    __slots__ = ('count', 'pending', 'reset_at')
+
+    def __init__(self, count: int, reset_at: float):
+        self.count = count
+        self.pending = 0
+        self.reset_at = reset_at
+
+
+class HybridStorage(Storage):
+    """Local counters in front of a shared limits storage"""
+
+    STORAGE_SCHEME = ['hybrid+redis', 'hybrid+rediss', 'hybrid+redis+unix', 'hybrid+memory']
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False,
+                 sync_interval: float = 1.0, max_unsynced_hits: int = 5, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions)
+        self.shared = storage_from_string(uri.split('+', 1)[1], wrap_exceptions=wrap_exceptions, **options)
+        self.sync_interval = float(sync_interval)
+        self.max_unsynced_hits = int(max_unsynced_hits)
+
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._sync_thread = None
+
+    @property
+    def base_exceptions(self):
+        return self.shared.base_exceptions
+
+    def _start_sync_thread(self):
+        # Started on first use rather than at import, so it runs in each
+        # forked worker process
+        with self._lock:
+            if self._sync_thread is None:
+                self._sync_thread = threading.Thread(
+                    target=self._sync_loop, name='rate-limit-sync', daemon=True
+                )
+                self._sync_thread.start()
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Warning: Rate limit sync failed: {str(e)}")
+
+    def sync(self):
+        """Add all unsynced local hits to the shared store, one call per key"""
+        now = time.time()
+        batch = []
+        with self._lock:
+            for key, counter in list(self._counters.items()):
+                if counter.reset_at <= now:
+                    # Window is over; its unsynced hits no longer matter
+                    del self._counters[key]
+                elif counter.pending:
+                    batch.append((key, counter.pending, counter.reset_at))
+                    counter.pending = 0
+
+        for key, pending, reset_at in batch:
+            count = self.shared.incr(key, max(1, math.ceil(reset_at - now)), amount=pending)
+            with self._lock:
+                counter = self._counters.get(key)
+                if counter is not None:
+                    counter.count = count
+
+    def _is_strict(self, key: str) -> bool:
+        return STRICT_KEY_MARKER in key
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        if self._is_strict(key):
+            return self.shared.incr(key, expiry, amount=amount)
+
+        if self._sync_thread is None:
+            self._start_sync_thread()
+
+        now = time.time()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is not None and counter.reset_at > now:
+                # Count locally while within the accuracy bound
+                if counter.pending + amount <= self.max_unsynced_hits:
+                    counter.pending += amount
+                    return counter.count + counter.pending
+                amount += counter.pending
+                counter.pending = 0
+            else:
+                counter = None
+
+        # First hit of the window in this process, or bound reached: sync inline
+        count = self.shared.incr(key, expiry, amount=amount)
+        reset_at = counter.reset_at if counter is not None else self.shared.get_expiry(key)
+
+        with self._lock:
+            local = self._counters.get(key)
+            if local is None or local.reset_at <= now:
+                local = self._counters[key] = _LocalCounter(count, reset_at)
+            else:
+                local.count = max(local.count, count)
+            return local.count + local.pending
+
+    def get(self, key: str) -> int:
+        if not self._is_strict(key):
+            with self._lock:
+                counter = self._counters.get(key)
+                if counter is not None and counter.reset_at > time.time():
+                    return counter.count + counter.pending
+        return self.shared.get(key)
+
+    def get_expiry(self, key: str) -> float:
+        if not self._is_strict(key):
+            with self._lock:
+                counter = self._counters.get(key)
+                if counter is not None and counter.reset_at > time.time():
+                    return counter.reset_at
+        return self.shared.get_expiry(key)
+
+    def check(self) -> bool:
+        return self.shared.check()
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+        return self.shared.reset()
+
+    def clear(self, key: str):
+        with self._lock:
+            self._counters.pop(key, None)
+        self.shared.clear(key)
@@ -3,14 +3,19 @@ Rate Limiting Configuration for API Endpoints
 
 This module provides rate limiting functionality using Flask-Limiter.
 Different endpoints have different rate limits based on their resource intensity.
+
+With Redis, limits are counted by the hybrid storage in rate_limit_storage.py:
+cheap limits are counted locally and synced in the background, while
+limits keyed with get_strict_user_id are always checked against Redis.
 """
 
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask import g
-from dotenv import load_dotenv
 
-load_dotenv()
+# Registers the hybrid+ storage schemes
+from .rate_limit_storage import STRICT_KEY_MARKER
+from .timing import phase
 
 def get_user_id():
     """
@@ -21,8 +26,22 @@ def get_user_id():
         return f"user:{g.current_user['id']}"
     return f"ip:{get_remote_address()}"
 
+def get_strict_user_id():
+    """
+    Get user ID for limits that must be exact across processes.
+    Used for the expensive AI endpoints.
+    """
+    return f"{STRICT_KEY_MARKER}{get_user_id()}"
+
+class TimedLimiter(Limiter):
+    """Limiter whose checks show up as the rate-limit phase in Server-Timing"""
+
+    def _check_request_limit(self, *args, **kwargs):
+        with phase('rate-limit'):
+            return super()._check_request_limit(*args, **kwargs)
+
 # Create the limiter instance without an app object.
-limiter = Limiter(
+limiter = TimedLimiter(
     key_func=get_user_id,
     headers_enabled=True,  # Include rate limit info in response headers
 )
@@ -41,6 +60,9 @@ RATE_LIMITS = {
     # Database read operations (least resource intensive)
     'DB_READ': '500 per hour',  # Most lenient for read operations
     
+    # Full data exports (stream the whole history)
+    'DATA_EXPORT': '20 per hour',
+    
     # User profile operations (moderate)
     'USER_PROFILE': '100 per hour',
     
@@ -0,0 +1,149 @@
+"""
+Warm-Up and Readiness
+
+When a worker boots, a background warm-up opens the pooled connections to
+Supabase and Gemini, imports numpy (deferred at startup, used by the
+analytics and profile endpoints) and loads the JWKS signing keys into the
+token verifier. The first user requests then do not pay for DNS, TLS,
+imports and the key download. The per-user response and profile caches
+are not primed; they fill on first use.
+
+/ready reports whether the warm-up finished, plus a latency probe of
+each dependency. Probe results are reused for READY_PROBE_INTERVAL
+seconds, so frequent polling by a load balancer does not turn into load
+on Supabase and Gemini. Probes run in parallel and a probe that takes
+longer than READY_PROBE_TIMEOUT seconds counts as failed. Only required
+dependencies decide readiness: the read endpoints keep working while
+Gemini is down. /health stays a cheap liveness check.
+"""
+
+import threading
+import time
+from typing import Dict
+
+from .auth import token_verifier
+from .cache import user_cache, RedisCacheBackend
+from .models import get_shared_gemini_client
+from .supabase_client import get_supabase_client
+
+
+def probe_supabase():
+    get_supabase_client().table('user_profiles').select('user_id').limit(1).execute()
+
+
+def probe_gemini():
+    # Listing models is free and goes through the same connection pool
+    get_shared_gemini_client().models.list()
+
+
+def probe_redis():
+    user_cache.backend.ping()
+
+
+class Readiness:
+    """Runs the warm-up and the dependency probes of a worker"""
+
+    def __init__(self):
+        self.app = None
+        self.warm = False
+        self.warmup_seconds = None
+        self.probe_interval = 10
+        self.probe_timeout = 5
+        self.probes = {}
+        self._results = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.probe_interval = app.config.get('READY_PROBE_INTERVAL', 10)
+        self.probe_timeout = app.config.get('READY_PROBE_TIMEOUT', 5)
+
+        self.probes = {'supabase': (probe_supabase, True), 'gemini': (probe_gemini, False)}
+        if isinstance(user_cache.backend, RedisCacheBackend):
+            self.probes['redis'] = (probe_redis, True)
+
+        app.extensions['readiness'] = self
+
+    def start_warmup(self):
+        """Warm the worker up in a background thread"""
+        threading.Thread(target=self._warm_up, name='warm-up', daemon=True).start()
+
+    def _warm_up(self):
+        start = time.monotonic()
+        with self.app.app_context():
+            # Opens the pooled connections as a side effect
+            self.check(force=True)
+
+            # Deferred at startup to keep boot fast, see benchmarks/import_budget.py
+            import numpy  # noqa: F401
+
+            if token_verifier.jwks is not None:
+                try:
+                    token_verifier.jwks.refresh()
+                except Exception as e:
+                    print(f"Warning: Could not load JWKS during warm-up: {str(e)}")
+
+        self.warmup_seconds = time.monotonic() - start
+        self.warm = True
+        print(f"Warm-up finished in {self.warmup_seconds:.2f}s")
+
+    def _run_probes(self) -> Dict:
+        results = {}
+
+        def run(name, probe, required):
+            start = time.monotonic()
+            result = {'status': 'ok', 'required': required}
+            try:
+                with self.app.app_context():
+                    probe()
+            except Exception as e:
+                result.update(status='error', error=str(e))
+            result['latency_ms'] = round((time.monotonic() - start) * 1000, 1)
+            results[name] = result
+
+        # Daemon threads, so a hung dependency cannot block /ready or shutdown
+        threads = [
+            threading.Thread(target=run, args=(name, probe, required), daemon=True)
+            for name, (probe, required) in self.probes.items()
+        ]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + self.probe_timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+        return {
+            name: results.get(name) or {
+                'status': 'error',
+                'required': required,
+                'latency_ms': round(self.probe_timeout * 1000, 1),
+                'error': 'Timed out'
+            }
+            for name, (_, required) in self.probes.items()
+        }
+
+    def check(self, force: bool = False) -> Dict:
+        """Get the probe results, probing again once they are older than probe_interval"""
+        with self._lock:
+            if not force and self._checked_at is not None \
+                    and time.monotonic() - self._checked_at < self.probe_interval:
+                return self._results
+
+            self._results = self._run_probes()
+            self._checked_at = time.monotonic()
+            return self._results
+
+    def status(self) -> Dict:
+        dependencies = self.check() if self.warm else {}
+        ready = self.warm and all(
+            result['status'] == 'ok' for result in dependencies.values() if result['required']
+        )
+        return {
+            'status': 'ready' if ready else ('unavailable' if self.warm else 'warming_up'),
+            'warmup_seconds': round(self.warmup_seconds, 2) if self.warmup_seconds is not None else None,
+            'dependencies': dependencies
+        }
+
+
+readiness = Readiness()
@@ -0,0 +1,123 @@
+"""
+Response Serialization and Compression
+
+App-wide response layer:
+- JSON is encoded with orjson (falls back to the standard library)
+- Clients sending Accept: application/msgpack get MessagePack bodies
+- Bodies above a size threshold are compressed with brotli or gzip,
+  depending on the client's Accept-Encoding
+"""
+
+import gzip
+
+from flask import request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/msgpack', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain'}
+
+# Suffixes appended to ETags of compressed representations
+ENCODING_ETAG_SUFFIXES = ('-br', '-gzip')
+
+
+def wants_msgpack() -> bool:
+    """Check whether the client prefers MessagePack over JSON"""
+    if msgpack is None or not has_request_context():
+        return False
+    accept = request.accept_mimetypes
+    best = accept.best_match(MSGPACK_MIMETYPES + ('application/json',))
+    return best in MSGPACK_MIMETYPES and accept[best] > accept['application/json']
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider using orjson, with MessagePack content negotiation"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+
+        if wants_msgpack():
+            return self._app.response_class(
+                msgpack.packb(obj, default=self.default, use_bin_type=True),
+                mimetype='application/msgpack'
+            )
+
+        if orjson is None:
+            return super().response(obj)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS),
+            mimetype=self.mimetype
+        )
+
+
+def compress_response(response, min_size: int, gzip_level: int, brotli_quality: int):
+    """Compress a response body with brotli or gzip if the client accepts it"""
+    if msgpack is not None and response.mimetype in ('application/json', 'application/msgpack'):
+        response.vary.add('Accept')
+
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if response.content_length is not None and response.content_length < min_size:
+        return response
+
+    accept_encoding = request.accept_encodings
+    if brotli is not None and accept_encoding['br']:
+        encoding = 'br'
+        body = brotli.compress(response.get_data(), quality=brotli_quality)
+    elif accept_encoding['gzip']:
+        encoding = 'gzip'
+        body = gzip.compress(response.get_data(), compresslevel=gzip_level)
+    else:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+
+    # A compressed representation needs its own strong ETag
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f"{etag}-{encoding}")
+
+    return response
+
+
+def init_response_layer(app):
+    """Install the fast JSON provider and response compression on the app"""
+    app.json = FastJSONProvider(app)
+
+    min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+    gzip_level = app.config.get('COMPRESSION_GZIP_LEVEL', 6)
+    brotli_quality = app.config.get('COMPRESSION_BROTLI_QUALITY', 5)
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response, min_size, gzip_level, brotli_quality)
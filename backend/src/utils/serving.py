@@ -0,0 +1,40 @@
+"""
+Serving Mode Helpers
+
+In the async serving mode (gevent workers, see gunicorn.conf.py) network
+I/O is cooperative, so a worker keeps hundreds of requests in flight while
+they wait on Gemini and Supabase. CPU-bound work such as image encoding
+would still block all of them, so run_cpu_bound moves it to the hub's
+bounded pool of real OS threads (CPU_WORKERS).
+"""
+
+import os
+
+
+def serving_mode() -> str:
+    """Get the configured serving mode, 'threads' or 'async'"""
+    return os.getenv('SERVING_MODE', 'threads')
+
+
+def serving_capacity() -> int:
+    """Get the number of requests a worker serves at once"""
+    if serving_mode() == 'async':
+        return int(os.getenv('WORKER_CONNECTIONS', 500))
+    return int(os.getenv('GUNICORN_THREADS', 12))
+
+
+def is_async_mode() -> bool:
+    """Check whether the process runs under gevent with patched sockets"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+def run_cpu_bound(fn, *args, **kwargs):
+    """Run CPU-bound work off the event loop in async mode, inline otherwise"""
+    if is_async_mode():
+        from gevent import get_hub
+        return get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
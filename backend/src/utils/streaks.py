@@ -0,0 +1,195 @@
+"""
+Streak Helpers
+
+Shared streak logic for the streak, profile and dashboard endpoints.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+
+# Number of past days returned as streak history
+STREAK_HISTORY_DAYS = 31
+
+# Days covered by the streak_bitmap column (a BIGINT without its sign bit)
+STREAK_BITMAP_DAYS = 62
+
+# Formats of the streak history in responses
+HISTORY_FORMATS = ('dates', 'bitmap')
+
+
+def parse_streak_date(streak_update_date: Optional[str]) -> Optional[date]:
+    """Parse the stored streak_update_date timestamp into a date"""
+    if not streak_update_date:
+        return None
+    return datetime.fromisoformat(streak_update_date.replace('Z', '+00:00')).date()
+
+
+def effective_streak(streak: Optional[int], streak_update_date: Optional[str], today: date) -> int:
+    """
+    Get the streak as of today without writing anything
+
+    A streak that was last updated before yesterday has lapsed and counts as 0.
+    """
+    current_streak = int(streak) if streak else 0
+    stored_date = parse_streak_date(streak_update_date)
+
+    if stored_date and (today - stored_date).days > 1:
+        return 0
+    return current_streak
+
+
+def fetch_streak_history(supabase, user_id: str, today: date) -> List[str]:
+    """Get the dates of the last 31 days on which the user hit their goal (newest first)"""
+    start_date = (today - timedelta(days=STREAK_HISTORY_DAYS)).isoformat()
+
+    streak_history_result = supabase.table('user_streaks') \
+        .select('streak_date') \
+        .eq('user_id', user_id) \
+        .gte('streak_date', start_date) \
+        .lte('streak_date', today.isoformat()) \
+        .order('streak_date', desc=True) \
+        .execute()
+
+    if not streak_history_result.data:
+        return []
+    return [record['streak_date'] for record in streak_history_result.data]
+
+
+def bitmap_as_of(bitmap: Optional[int], streak_update_date: Optional[str], today: date) -> int:
+    """
+    Re-anchor a stored streak bitmap on today
+
+    The stored bitmap has bit 0 on the day of streak_update_date. The result
+    has bit 0 on today and bit i on the day i days before today.
+    """
+    stored_date = parse_streak_date(streak_update_date)
+    if not bitmap or stored_date is None:
+        return 0
+
+    shift = (today - stored_date).days
+    if shift >= STREAK_BITMAP_DAYS:
+        return 0
+    if shift < 0:
+        return int(bitmap) >> -shift
+    return (int(bitmap) << shift) & ((1 << STREAK_BITMAP_DAYS) - 1)
+
+
+def dates_to_bitmap(streak_dates: List[str], today: date) -> int:
+    """Build a bitmap anchored on today from a list of ISO dates"""
+    bitmap = 0
+    for streak_date in streak_dates:
+        offset = (today - date.fromisoformat(streak_date)).days
+        if 0 <= offset < STREAK_BITMAP_DAYS:
+            bitmap |= 1 << offset
+    return bitmap
+
+
+def bitmap_to_dates(bitmap: int, today: date) -> List[str]:
+    """List the hit days of a bitmap anchored on today (newest first)"""
+    streak_dates = []
+    while bitmap:
+        offset = (bitmap & -bitmap).bit_length() - 1
+        streak_dates.append((today - timedelta(days=offset)).isoformat())
+        bitmap &= bitmap - 1
+    return streak_dates
+
+
+def longest_run(bitmap: int) -> int:
+    """Length of the longest run of consecutive hit days in a bitmap"""
+    length = 0
+    while bitmap:
+        bitmap &= bitmap << 1
+        length += 1
+    return length
+
+
+def streak_stats(bitmap: int, days: int = STREAK_HISTORY_DAYS) -> Dict:
+    """Summarize the last days of a bitmap anchored on today"""
+    window = bitmap & ((1 << days) - 1)
+    hit_days = bin(window).count('1')
+    return {
+        'days': days,
+        'hit_days': hit_days,
+        'longest_streak': longest_run(window),
+        'adherence_percentage': round(hit_days / days * 100, 1)
+    }
+
+
+def load_streak_bitmap(supabase, user_id: str, profile: Dict, today: date) -> int:
+    """
+    Get the user's streak bitmap anchored on today
+
+    Reads the streak_bitmap column of an already fetched profile, and only
+    falls back to querying user_streaks for profiles that have not been
+    backfilled yet (see sql/streaks.sql).
+    """
+    if profile.get('streak_bitmap') is not None:
+        return bitmap_as_of(profile['streak_bitmap'], profile.get('streak_update_date'), today)
+    if not profile.get('streak_update_date'):
+        return 0
+    return dates_to_bitmap(fetch_streak_history(supabase, user_id, today), today)
+
+
+def streak_history_fields(bitmap: int, today: date, history_format: str = 'dates') -> Dict:
+    """
+    Build the streak history fields of a response
+
+    'streak_bitmap' covers the same days as the history (today and the 31
+    days before it), bit 0 being today. The date strings are only included
+    for the 'dates' format.
+    """
+    window = bitmap & ((1 << (STREAK_HISTORY_DAYS + 1)) - 1)
+    fields = {
+        'streak_bitmap': window,
+        'streak_stats': streak_stats(window)
+    }
+    if history_format == 'dates':
+        fields['streak_history'] = bitmap_to_dates(window, today)
+    return fields
+
+
+def apply_streak_update(supabase, user_id: str, now: datetime) -> dict:
+    """
+    Record today's goal hit and update the streak in one atomic database call
+
+    Uses the update_streak function from sql/streaks.sql, which serializes
+    concurrent updates of the same user.
+
+    Returns:
+        Dictionary with 'status' ('updated', 'already_updated' or
+        'profile_not_found') and the streak values
+    """
+    result = supabase.rpc('update_streak', {
+        'p_user_id': user_id,
+        'p_today': now.date().isoformat(),
+        'p_now': now.isoformat()
+    }).execute()
+
+    if not result.data:
+        raise Exception("No data returned from update_streak")
+    return result.data
+
+
+def reset_stale_streaks(supabase, today: date) -> List[str]:
+    """
+    Reset the lapsed streaks of all users in one set-based update
+
+    Returns:
+        User IDs of the profiles whose streak was reset
+    """
+    from postgrest.types import ReturnMethod
+
+    # Streaks last updated before yesterday have lapsed
+    cutoff = (today - timedelta(days=1)).isoformat()
+
+    result = supabase.table('user_profiles') \
+        .update({
+            'streak': 0,
+            'updated_at': datetime.now().isoformat()
+        }, returning=ReturnMethod.representation) \
+        .gt('streak', 0) \
+        .lt('streak_update_date', cutoff) \
+        .execute()
+
+    return [profile['user_id'] for profile in result.data or []]
@@ -0,0 +1,48 @@
+"""
+Supabase Client
+
+The supabase package pulls in httpx, gotrue, postgrest and storage3,
+which together take about half a second to import. create_client imports
+it on first use, so workers start without it and only the first request
+that touches the database pays for it.
+
+Endpoints share one client per process (get_supabase_client), so the
+HTTP connections to Supabase are pooled and reused instead of paying
+DNS and TLS setup on every request.
+"""
+
+import os
+import threading
+
+from flask import current_app
+
+from .metrics import observe_http_client
+from .timing import instrument_http_client, phase
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def create_client(supabase_url: str, supabase_key: str):
+    """Create a Supabase client, importing the supabase package on first use"""
+    from supabase import create_client as _create_client
+
+    client = _create_client(supabase_url, supabase_key)
+    # Database and Storage calls show up in Server-Timing and /metrics
+    for session in (client.postgrest.session, client.storage.session):
+        instrument_http_client(session)
+        observe_http_client(session)
+    return client
+
+
+def get_supabase_client():
+    """Get the process-wide Supabase client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                supabase_url = current_app.config['SUPABASE_URL']
+                supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
+                with phase('client-setup'):
+                    _client = create_client(supabase_url, supabase_key)
+    return _client
@@ -0,0 +1,166 @@
+"""
+Server-Timing Instrumentation
+
+Each request records how long its phases took: auth, rate-limit, client
+setup, every Supabase table or function call, Storage, image transforms
+and Gemini. They are returned in a Server-Timing header, which browser
+dev tools show next to the request, and logged as one JSON line:
+
+    {"event": "request_timing", "method": "POST", "path": "/consumed",
+     "status": 200, "total_ms": 2415.2, "phases": {"auth": {"ms": 0.3, "count": 1}, ...}}
+
+Phases with the same name add up. Supabase calls are timed by hooks on
+the shared client's HTTP sessions, so routes do not mark them by hand;
+work handed to an executor is counted when wrapped in with_request_timing.
+Off by default, since the header shows every client which tables and
+services a request touched; SERVER_TIMING_ENABLED turns it on (while off
+each phase costs one attribute check) and SERVER_TIMING_LOG turns off
+just the log line.
+"""
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional
+
+from flask import g, request
+
+# Phases of the request being served, None outside of requests
+_phases: ContextVar[Optional[Dict]] = ContextVar('timing_phases', default=None)
+
+
+def upstream_phase(method: str, path: str) -> str:
+    """Phase name of a Supabase HTTP call, e.g. db.foods_consumed or storage.upload"""
+    if path.startswith('/rest/v1/rpc/'):
+        return f"db.rpc.{path[len('/rest/v1/rpc/'):]}"
+    if path.startswith('/rest/v1/'):
+        return f"db.{path[len('/rest/v1/'):].split('/')[0]}"
+    if path.startswith('/storage/v1/object/sign/'):
+        return 'storage.sign'
+    if path.startswith('/storage/v1/'):
+        return {'GET': 'storage.download', 'DELETE': 'storage.remove'}.get(method, 'storage.upload')
+    return 'http.other'
+
+
+class ServerTiming:
+    """Collects the phases of each request and reports them"""
+
+    def __init__(self):
+        self.enabled = False
+        self.log = False
+        # Executor threads may record into the same request
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SERVER_TIMING_ENABLED', False)
+        self.log = app.config.get('SERVER_TIMING_LOG', True)
+        if self.enabled:
+            # Registered before the other extensions: starts first, finishes last
+            app.before_request(self._start)
+            app.after_request(self._finish)
+        app.extensions['server_timing'] = self
+
+    def record(self, name: str, seconds: float):
+        """Add a phase to the current request, if there is one"""
+        phases = _phases.get()
+        if phases is None:
+            return
+        with self._lock:
+            total, count = phases.get(name, (0.0, 0))
+            phases[name] = (total + seconds, count + 1)
+
+    def _start(self):
+        g.timing_start = time.perf_counter()
+        _phases.set({})
+
+    def _finish(self, response):
+        phases = _phases.get()
+        if phases is None:
+            return response
+        _phases.set(None)
+        total_ms = (time.perf_counter() - g.timing_start) * 1000
+
+        entries = [
+            f'{name};dur={seconds * 1000:.1f}' + (f';desc="{count} calls"' if count > 1 else '')
+            for name, (seconds, count) in phases.items()
+        ]
+        entries.append(f'total;dur={total_ms:.1f}')
+        response.headers['Server-Timing'] = ', '.join(entries)
+
+        if self.log:
+            # One write per record: print writes the newline separately, and
+            # records from other threads could land in between
+            sys.stdout.write(json.dumps({
+                'event': 'request_timing',
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 1),
+                'phases': self._phases_dict(phases)
+            }) + '\n')
+        return response
+
+    @staticmethod
+    def _phases_dict(phases) -> Dict:
+        return {
+            name: {'ms': round(seconds * 1000, 1), 'count': count}
+            for name, (seconds, count) in phases.items()
+        }
+
+
+server_timing = ServerTiming()
+
+
+@contextmanager
+def phase(name: str):
+    """Time a block as a phase of the current request"""
+    if not server_timing.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        server_timing.record(name, time.perf_counter() - start)
+
+
+def with_request_timing(fn):
+    """Wrap fn so the phases it records in another thread count for the current request"""
+    phases = _phases.get()
+    if phases is None:
+        return fn
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _phases.set(phases)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _phases.reset(token)
+    return wrapper
+
+
+def _on_request(http_request):
+    http_request.extensions['timing_start'] = time.perf_counter()
+
+
+def _on_response(http_response):
+    start = http_response.request.extensions.get('timing_start')
+    if start is None or not server_timing.enabled:
+        return
+    # Read the body here so the phase includes its transfer
+    http_response.read()
+    server_timing.record(
+        upstream_phase(http_response.request.method, http_response.request.url.path),
+        time.perf_counter() - start
+    )
+
+
+def instrument_http_client(client):
+    """Time each call of an httpx client as a phase of the current request"""
+    client.event_hooks['request'].append(_on_request)
+    client.event_hooks['response'].append(_on_response)
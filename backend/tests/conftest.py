@@ -0,0 +1,67 @@
+"""
+Test Fixtures
+
+Tests run against the local Supabase and Gemini stand-ins of
+benchmarks/fake_services.py, so they need no network or credentials.
+
+Run from the backend directory:
+
+    python -m pytest -q
+"""
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+
+
+@pytest.fixture(scope='session')
+def fake_services():
+    from fake_services import FakeServices, GeminiSettings
+
+    services = FakeServices(db_latency_ms=0, storage_latency_ms=0,
+                            gemini=GeminiSettings(latency_ms=0, jitter_ms=0)).start()
+    yield services
+    services.stop()
+
+
+@pytest.fixture(scope='session')
+def service_key():
+    from load_test import make_token
+
+    return make_token('service', 'service_role')
+
+
+@pytest.fixture(scope='session')
+def app(fake_services, service_key):
+    """The app, configured against the stand-ins"""
+    from load_test import JWT_SECRET
+
+    os.environ.update(
+        SUPABASE_URL=fake_services.url,
+        SUPABASE_SERVICE_ROLE_KEY=service_key,
+        SUPABASE_JWT_SECRET=JWT_SECRET,
+        GEMINI_API_KEY='test',
+        GEMINI_BASE_URL=f"{fake_services.url}/v1/",
+        IMAGE_WORKERS='0',
+    )
+    os.environ.pop('REDIS_URL', None)
+
+    from app import app as flask_app
+    return flask_app
+
+
+@pytest.fixture
+def rest(fake_services, service_key):
+    """HTTP client for the stand-in PostgREST API"""
+    import httpx
+
+    with httpx.Client(
+        base_url=f"{fake_services.url}/rest/v1",
+        headers={'apikey': service_key, 'Authorization': f"Bearer {service_key}"}
+    ) as client:
+        yield client
@@ -0,0 +1,60 @@
+import pytest
+
+from src.utils.bulkhead import Bulkhead, BulkheadFull, ThreadBudget, default_bulkhead_sizes
+
+
+def test_shared_budget_keeps_a_read_reserve_at_small_capacities():
+    # Capacity 2 with a reserve of 1: the non-read pools share one slot
+    budget = ThreadBudget(1)
+    sizes = default_bulkhead_sizes(2)
+    ai = Bulkhead('AI_ANALYSIS', *sizes['AI_ANALYSIS'], queue_timeout=0.1, budget=budget)
+    write = Bulkhead('DB_WRITE', *sizes['DB_WRITE'], queue_timeout=0.1, budget=budget)
+
+    ai.acquire()
+    with pytest.raises(BulkheadFull):
+        write.acquire()
+    assert budget.held == 1
+
+    ai.release()
+    with write.slot():
+        assert budget.held == 1
+    assert budget.held == 0
+
+
+def test_rejected_requests_give_back_the_budget():
+    budget = ThreadBudget(4)
+    pool = Bulkhead('DB_WRITE', 1, 0, queue_timeout=0.1, budget=budget)
+
+    pool.acquire()
+    with pytest.raises(BulkheadFull):
+        pool.acquire()
+    assert budget.held == 1
+
+
+def test_shedder_rejects_when_the_pool_is_full(monkeypatch):
+    from src.utils import load_shedding
+
+    pool = Bulkhead('AI_ANALYSIS', 2, 1, queue_timeout=10.0)
+    monkeypatch.setattr(load_shedding.bulkheads, 'pools', {'AI_ANALYSIS': pool})
+    shedder = load_shedding.LoadShedder('AI_ANALYSIS', load_shedding.LatencyTracker(initial=4.0))
+
+    pool.in_flight = 2
+    assert shedder.check() is None
+
+    # Queue full: 3 requests ahead, 2 slots, 4s each
+    pool.queued = 1
+    assert shedder.check() == 6
+    assert shedder.shed == 1
+
+
+def test_shedder_rejects_waits_longer_than_the_queue_timeout(monkeypatch):
+    from src.utils import load_shedding
+
+    pool = Bulkhead('AI_ANALYSIS', 1, 10, queue_timeout=10.0)
+    monkeypatch.setattr(load_shedding.bulkheads, 'pools', {'AI_ANALYSIS': pool})
+    shedder = load_shedding.LoadShedder('AI_ANALYSIS', load_shedding.LatencyTracker(initial=4.0))
+
+    pool.in_flight, pool.queued = 1, 1
+    assert shedder.check() is None
+    pool.queued = 2
+    assert shedder.check() == 12
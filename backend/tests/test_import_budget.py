@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+from import_budget import BACKEND_DIR, DEFAULT_BUDGET_MS, DEFERRED_MODULES, parse_importtime
+
+
+def import_app_rows():
+    env = dict(os.environ)
+    env.setdefault('SUPABASE_URL', 'http://localhost:54321')
+    env.setdefault('SUPABASE_JWT_SECRET', 'import-budget')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def test_import_app_defers_heavy_modules():
+    loaded = {name.split('.')[0] for name, _, _ in import_app_rows()}
+
+    assert 'numpy' not in loaded
+    assert [module for module in DEFERRED_MODULES if module in loaded] == []
+
+
+def test_import_app_within_budget():
+    # Best of three, like benchmarks/import_budget.py
+    import_ms = min(
+        next(cumulative for name, _, cumulative in import_app_rows() if name == 'app') / 1000
+        for _ in range(3)
+    )
+
+    assert import_ms <= DEFAULT_BUDGET_MS
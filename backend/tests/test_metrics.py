@@ -0,0 +1,20 @@
+import pytest
+
+from src.utils.metrics import metrics
+
+
+@pytest.mark.parametrize('path', ['/metrics', '/bulkhead-info'])
+def test_operational_endpoints_are_hidden_without_a_token(app, monkeypatch, path):
+    monkeypatch.setattr(metrics, 'token', None)
+
+    assert app.test_client().get(path).status_code == 404
+
+
+@pytest.mark.parametrize('path', ['/metrics', '/bulkhead-info'])
+def test_operational_endpoints_require_the_token(app, monkeypatch, path):
+    monkeypatch.setattr(metrics, 'token', 'scrape-secret')
+    client = app.test_client()
+
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
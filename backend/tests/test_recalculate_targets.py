@@ -0,0 +1,61 @@
+import uuid
+
+import pytest
+
+from src.utils.nutrition_calculator import has_target_inputs
+
+COMPLETE_PROFILE = {
+    'gender': 'female',
+    'activity_level': 'moderately_active',
+    'height_unit': 'metric',
+    'height_value': 168,
+    'height_inches': None,
+    'weight_unit': 'metric',
+    'weight_value': 64,
+    'date_of_birth': '1994-05-12',
+    'main_goal': 'maintain_weight',
+    'dietary_preference': 'classic',
+    'onboarding_completed': True,
+}
+
+
+@pytest.mark.parametrize('changes', [
+    {'weight_value': None},
+    {'height_value': None},
+    {'date_of_birth': None},
+    {'gender': None},
+    {'activity_level': ''},
+    {'weight_value': 0},
+    {'date_of_birth': 'not a date'},
+    {'onboarding_completed': False},
+])
+def test_incomplete_profiles_have_no_target_inputs(changes):
+    assert has_target_inputs(COMPLETE_PROFILE)
+    assert not has_target_inputs({**COMPLETE_PROFILE, **changes})
+
+
+def test_recalculate_targets_skips_incomplete_profiles(app, rest):
+    complete_user, incomplete_user = str(uuid.uuid4()), str(uuid.uuid4())
+    rest.post('/user_profiles', json=[
+        {**COMPLETE_PROFILE, 'id': str(uuid.uuid4()), 'user_id': complete_user,
+         'daily_calories': 1, 'daily_protein_g': 1, 'daily_carbs_g': 1, 'daily_fats_g': 1,
+         'updated_at': '2026-01-01T00:00:00'},
+        {**COMPLETE_PROFILE, 'id': str(uuid.uuid4()), 'user_id': incomplete_user,
+         'weight_value': None, 'date_of_birth': None, 'onboarding_completed': False,
+         'daily_calories': None, 'daily_protein_g': None, 'daily_carbs_g': None, 'daily_fats_g': None,
+         'updated_at': '2026-01-01T00:00:00'},
+    ]).raise_for_status()
+
+    result = app.test_cli_runner().invoke(args=['recalculate-targets'])
+
+    assert result.exit_code == 0, result.output
+    assert '1 updated' in result.output
+    assert '1 incomplete' in result.output
+
+    profiles = {
+        profile['user_id']: profile
+        for profile in rest.get('/user_profiles', params={'select': 'user_id,daily_calories,daily_protein_g'}).json()
+    }
+    assert 1000 < profiles[complete_user]['daily_calories'] < 4000
+    assert profiles[incomplete_user]['daily_calories'] is None
+    assert profiles[incomplete_user]['daily_protein_g'] is None